@@ -0,0 +1,8 @@
+""" Allows running the html2image CLI with `python -m html2image`.
+"""
+
+import sys
+
+from html2image.cli import main
+
+sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Adaptive concurrency of the html2image package.
+
+An `AdaptiveConcurrency` controller periodically adjusts the concurrency
+of a `Scheduler` with an AIMD (additive increase, multiplicative
+decrease) policy:
+- the concurrency is decreased by `decrease_factor` as soon as the host
+  is overloaded: CPU usage above `max_cpu`, available memory under
+  `min_available_memory`, or job latency above its target;
+- otherwise, it is increased by one while jobs are waiting for a slot.
+
+Without an explicit `target_latency`, the target is `latency_tolerance`
+times the lowest average latency observed, i.e. about the latency of a
+job on an idle host: running more jobs at once than the host can handle
+makes each of them slower before it makes the whole slower.
+"""
+
+import os
+import threading
+
+
+def read_cpu_times():
+    """ Returns the (busy, total) CPU times of the host since boot, or None
+        if they are not available (`/proc/stat` only exists on Linux).
+    """
+    try:
+        with open('/proc/stat') as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+
+    # user nice system idle iowait irq softirq steal ...
+    idle = values[3] + (values[4] if len(values) > 4 else 0)
+    return sum(values) - idle, sum(values)
+
+
+def read_available_memory():
+    """ Returns the memory available on the host in bytes, or None if it is
+        not known (`/proc/meminfo` only exists on Linux).
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_load_per_cpu():
+    """ Returns the 1-minute load average divided by the number of CPUs,
+        or None if it is not available (e.g. on Windows).
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class AdaptiveConcurrency():
+    """
+        Adjusts the concurrency of a `Scheduler` to the capacity of the
+        host, every `interval` seconds.
+
+        Parameters
+        ----------
+        - `scheduler` : Scheduler
+        - `min_concurrency` : int, optional
+        - `max_concurrency` : int, optional
+            + Default is the number of CPUs of the host.
+            + For CDP browsers, `max_tabs` should be at least as large.
+        - `interval` : float, optional
+            + Number of seconds between two adjustments.
+        - `max_cpu` : float, optional
+            + CPU usage (between 0 and 1) above which the host is
+            + considered overloaded. Where CPU times are not available,
+            + the load average per CPU is used instead.
+        - `min_available_memory` : int, optional
+            + Available memory (in bytes) under which the host is
+            + considered overloaded.
+        - `target_latency` : float, optional
+            + Average job duration (in seconds) above which the host is
+            + considered overloaded. By default, it is derived from the
+            + lowest average duration observed, see `latency_tolerance`.
+        - `latency_tolerance` : float, optional
+        - `decrease_factor` : float, optional
+            + Factor applied to the concurrency when the host is overloaded.
+        - `on_change` : callable, optional
+            + Called with the new concurrency each time it is changed,
+            + e.g. to adjust the limits of the queues of the scheduler.
+    """
+
+    def __init__(self, scheduler, min_concurrency=1, max_concurrency=None,
+                 interval=2.0, max_cpu=0.9,
+                 min_available_memory=512 * 1024 * 1024,
+                 target_latency=None, latency_tolerance=2.0,
+                 decrease_factor=0.75, on_change=None):
+        if max_concurrency is None:
+            max_concurrency = max(os.cpu_count() or 1, min_concurrency)
+
+        if not 1 <= min_concurrency <= max_concurrency:
+            raise ValueError(
+                '`min_concurrency` should be greater than 0 and not greater '
+                'than `max_concurrency`.'
+            )
+        if not 0 < decrease_factor < 1:
+            raise ValueError('`decrease_factor` should be between 0 and 1.')
+
+        self.scheduler = scheduler
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.max_cpu = max_cpu
+        self.min_available_memory = min_available_memory
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.on_change = on_change
+
+        self.baseline_latency = None
+        self.last_reason = None
+
+        self._latencies = []
+        self._lock = threading.Lock()
+        self._cpu_times = read_cpu_times()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self._set_concurrency(min(
+            max(scheduler.concurrency, min_concurrency), max_concurrency
+        ))
+        scheduler.add_done_callback(self._job_done)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """ Starts adjusting the concurrency in a background thread.
+        """
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def adjust(self):
+        """ Adjusts the concurrency once, based on the signals gathered
+            since the previous adjustment.
+
+            Returns
+            -------
+            - int
+                + The new concurrency.
+        """
+        with self._lock:
+            latencies, self._latencies = self._latencies, []
+
+        concurrency = self.scheduler.concurrency
+        reason = self._overload_reason(latencies)
+
+        if reason is not None:
+            concurrency = max(
+                int(concurrency * self.decrease_factor), self.min_concurrency
+            )
+        elif self._is_saturated():
+            concurrency = min(concurrency + 1, self.max_concurrency)
+
+        self.last_reason = reason
+        if concurrency != self.scheduler.concurrency:
+            self._set_concurrency(concurrency)
+        return concurrency
+
+    def _set_concurrency(self, concurrency):
+        self.scheduler.set_concurrency(concurrency)
+        if self.on_change is not None:
+            self.on_change(concurrency)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.adjust()
+
+    def _job_done(self, queue_name, elapsed, error):
+        if error is None:
+            with self._lock:
+                self._latencies.append(elapsed)
+
+    def _is_saturated(self):
+        stats = self.scheduler.stats().values()
+        return any(queue['queued'] for queue in stats) and (
+            sum(queue['active'] for queue in stats)
+            >= self.scheduler.concurrency
+        )
+
+    def _overload_reason(self, latencies):
+        """ Returns why the host is overloaded, or None if it is not.
+        """
+        cpu_times = read_cpu_times()
+        if cpu_times is not None and self._cpu_times is not None:
+            busy = cpu_times[0] - self._cpu_times[0]
+            total = cpu_times[1] - self._cpu_times[1]
+            cpu = busy / total if total else 0
+        else:
+            cpu = read_load_per_cpu()
+        self._cpu_times = cpu_times
+
+        if cpu is not None and cpu > self.max_cpu:
+            return f'cpu usage {cpu:.0%}'
+
+        memory = read_available_memory()
+        if memory is not None and memory < self.min_available_memory:
+            return f'available memory {memory // (1024 * 1024)} MiB'
+
+        if latencies:
+            latency = sum(latencies) / len(latencies)
+            if self.target_latency is not None:
+                target = self.target_latency
+            else:
+                # the baseline slowly drifts up to follow workload changes
+                self.baseline_latency = min(
+                    self.baseline_latency * 1.01, latency
+                ) if self.baseline_latency is not None else latency
+                target = self.baseline_latency * self.latency_tolerance
+
+            if latency > target:
+                return f'latency {latency:.3f}s'
+
+        return None
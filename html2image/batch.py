@@ -0,0 +1,198 @@
+"""
+Batch mode of the html2image package.
+
+Jobs are streamed from a JSON Lines manifest (one JSON object per line,
+holding the parameters of one screenshot), run with a configurable
+parallelism, and one JSON result line is written per job:
+
+    {"url": "https://www.python.org", "size": [800, 600], "save_as": "py.png"}
+    {"html_str": "<h1>Hi</h1>", "css_str": "h1 {color: red;}", "id": "hi"}
+
+gives, in completion order:
+
+    {"index": 1, "id": "hi", "path": "/out/screenshot_1.png", "elapsed": 0.41, "error": null}
+    {"index": 0, "id": null, "path": "/out/py.png", "elapsed": 0.87, "error": null}
+
+`index` is the position of the job in the manifest (blank lines are not
+counted), and `id` echoes the optional `id` of the job.
+
+Jobs are read lazily and only a bounded number of them are in flight at
+any time, so the size of a batch is not limited by the memory available.
+With a `plan_window`, jobs are read that many at a time and each window
+is reordered by `html2image.planner.plan_jobs()`, so that jobs sharing a
+viewport size, origin and stylesheets run one after the other.
+"""
+
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from html2image.planner import plan_jobs
+from html2image.server import screenshot_kwargs, staged_sources
+
+JOB_EXTRA_PARAMETERS = ('save_as', 'id')
+
+
+def read_jobs(lines):
+    """ Yields the jobs of a JSON Lines manifest, skipping blank lines.
+
+    Parameters
+    ----------
+    - `lines`: iterable of str
+        + E.g. an opened file, or `sys.stdin`.
+
+    Yields
+    ------
+    - dict or Exception
+        + The decoded job, or the error raised while decoding it, so that
+        + a malformed line only fails its own job.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+def plan_windows(jobs, window):
+    """ Yields (index, job) pairs, reordering jobs by windows of `window`
+        jobs with `html2image.planner.plan_jobs()`.
+
+    Parameters
+    ----------
+    - `jobs`: iterable of dict
+        + Jobs, as yielded by `read_jobs()`. Consumed lazily.
+    - `window`: int
+        + Number of jobs read and reordered at once.
+    """
+    if window < 1:
+        raise ValueError('`window` should be greater than 0.')
+
+    pending = []
+    for index, job in enumerate(jobs):
+        pending.append((index, job))
+        if len(pending) == window:
+            yield from _planned(pending)
+            pending = []
+    yield from _planned(pending)
+
+
+def _planned(pending):
+    order = plan_jobs([job for _, job in pending])
+    return [pending[index] for index in order]
+
+
+def run_job(hti, index, job):
+    """ Takes the screenshot described by a job.
+
+    Returns
+    -------
+    - dict
+        + JSON serializable result of the job.
+    """
+    start = time.monotonic()
+    result = {
+        'index': index,
+        'id': job.get('id') if isinstance(job, dict) else None,
+        'path': None,
+        'elapsed': None,
+        'error': None,
+    }
+
+    try:
+        if isinstance(job, Exception):
+            raise ValueError(f'Invalid JSON: {job}')
+
+        kwargs = screenshot_kwargs(job, extra_parameters=JOB_EXTRA_PARAMETERS)
+        kwargs.pop('id', None)
+        kwargs.setdefault('save_as', f'screenshot_{index}.png')
+
+        if hasattr(hti, 'temp_path'):
+            # jobs run at the same time may be given the same files
+            with staged_sources(hti, kwargs) as staged_kwargs:
+                paths = hti.screenshot(**staged_kwargs)
+        else:
+            # a `Coordinator`, whose workers read the files themselves
+            paths = hti.screenshot(**kwargs)
+        # an image the browser did not write is an error result, not raised
+        results = getattr(paths, 'results', None)
+        if results and results[0].error is not None:
+            raise results[0].error
+        result['path'] = paths[0]
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+
+    result['elapsed'] = round(time.monotonic() - start, 6)
+    return result
+
+
+def run_batch(hti, jobs, output, parallelism=1, plan_window=None):
+    """ Runs jobs and writes one JSON result line per job to `output`.
+
+    Parameters
+    ----------
+    - `hti`: Html2Image
+        + Instance used to take the screenshots.
+    - `jobs`: iterable of dict
+        + Jobs, as yielded by `read_jobs()`. Consumed lazily.
+    - `output`: file-like object
+        + Where result lines are written, in completion order.
+    - `parallelism`: int, optional
+        + Number of jobs run at the same time.
+    - `plan_window`: int, optional
+        + If given, jobs are reordered by windows of this number of
+        + jobs, see `plan_windows()`. Result lines keep the `index` of
+        + their job in the manifest.
+
+    Returns
+    -------
+    - (int, int)
+        + Number of jobs that succeeded, and that failed.
+
+    Raises
+    ------
+    - `OSError`
+        + If a result line could not be written. No more jobs are
+        + started, and the running ones are waited for.
+    """
+    if parallelism < 1:
+        raise ValueError('`parallelism` should be greater than 0.')
+
+    # bounds the number of jobs read ahead of the running ones
+    in_flight = threading.BoundedSemaphore(parallelism * 2)
+    output_lock = threading.Lock()
+    counts = {'succeeded': 0, 'failed': 0}
+    errors = []
+
+    def done(future):
+        try:
+            result = future.result()
+            with output_lock:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+                counts['failed' if result['error'] else 'succeeded'] += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # the main thread would wait forever for this slot
+            in_flight.release()
+
+    if plan_window is not None:
+        jobs = plan_windows(jobs, plan_window)
+    else:
+        jobs = enumerate(jobs)
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        for index, job in jobs:
+            in_flight.acquire()
+            if errors:
+                break
+            executor.submit(run_job, hti, index, job).add_done_callback(done)
+
+    if errors:
+        raise errors[0]
+    return counts['succeeded'], counts['failed']
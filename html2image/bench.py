@@ -0,0 +1,455 @@
+"""
+Benchmarks of the html2image package.
+
+`run_benchmarks()` measures the render engine on pages served by a local
+HTTP fixture server, so that results depend neither on the network nor
+on remote sites. The scenarios are:
+
+- `cold_start`: creating an instance, starting its browser and taking
+  a first screenshot,
+- `warm_single`: taking one screenshot at a time with a started browser,
+- `batch_c<N>`: rendering a batch N screenshots at a time,
+- `big_page`: capturing a tall page with thousands of elements,
+- `css_heavy`: rendering an HTML string styled by a large stylesheet.
+
+Results are JSON serializable, and `compare()` returns the metrics which
+regressed from a baseline saved by a previous run. `html2image bench`
+runs the benchmarks from the command line.
+"""
+
+import io
+import logging
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from html2image import Html2Image
+from html2image.batch import run_batch
+from html2image.browsers.browser import CDPBrowser
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FORMAT = 1
+
+SCENARIOS = ('cold_start', 'warm_single', 'batch', 'big_page', 'css_heavy')
+
+SIMPLE_PAGE_SIZE = (800, 600)
+BIG_PAGE_SIZE = (1280, 8000)
+
+# metrics compared with the baseline, and whether higher values are better
+COMPARED_METRICS = (('median', False), ('throughput', True))
+
+
+def _simple_page_html():
+    return (
+        '<!DOCTYPE html><html><head><title>html2image benchmark</title>'
+        '<link rel="stylesheet" href="/style.css"></head><body>'
+        '<h1>html2image</h1><p>A small page, with a stylesheet.</p>'
+        '</body></html>'
+    )
+
+
+def _stylesheet():
+    return (
+        'body { margin: 0; font-family: sans-serif; background: #f4f4f8; }\n'
+        'h1 { color: #335; padding: 32px; }\n'
+        'p { color: #555; padding: 0 32px; }\n'
+    )
+
+
+def _big_page_html(rows=4000):
+    cells = ''.join(
+        f'<tr><td>{row}</td><td>Item {row}</td>'
+        f'<td style="width: {row % 100}%">{"#" * (row % 40)}</td></tr>'
+        for row in range(rows)
+    )
+    return (
+        '<!DOCTYPE html><html><head><link rel="stylesheet" href="/style.css">'
+        '</head><body><h1>Big page</h1>'
+        f'<table>{cells}</table></body></html>'
+    )
+
+
+def css_heavy_source(rules=3000):
+    """ Returns the HTML and CSS strings of the `css_heavy` scenario:
+        a few hundred elements, each matched by several rules with
+        gradients, shadows, transforms and filters.
+    """
+    html = ''.join(
+        f'<div class="box b{index} c{index % 7}">{index}</div>'
+        for index in range(300)
+    )
+    css = '\n'.join(
+        f'.b{index % 300}.c{index % 7}, body .b{index % 300} {{ '
+        f'background: linear-gradient({index % 360}deg, '
+        f'hsl({index % 360}, 70%, 60%), hsl({(index * 7) % 360}, 70%, 40%)); '
+        f'box-shadow: 0 {index % 9}px {index % 13}px rgba(0, 0, 0, 0.3); '
+        f'transform: rotate({index % 11}deg); '
+        f'filter: blur({index % 2}px) saturate(1.{index % 9}); '
+        f'border-radius: {index % 17}px; }}'
+        for index in range(rules)
+    )
+    css += '\n.box { display: inline-block; width: 40px; height: 40px; margin: 4px; }'
+    return html, css
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        page = self.server.pages.get(self.path.split('?', 1)[0])
+        if page is None:
+            self.send_error(404)
+            return
+
+        content_type, body = page
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer():
+    """
+        Local HTTP server of the benchmark pages, listening on a free port
+        of the loopback interface. Used as a context manager, or started
+        with `start()` and stopped with `stop()`.
+
+        Pages
+        -----
+        - `/simple.html`, a small page using `/style.css`.
+        - `/big.html`, a table of a few thousand rows.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _FixtureHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.pages = {
+            '/simple.html': ('text/html; charset=utf-8', _simple_page_html().encode()),
+            '/style.css': ('text/css; charset=utf-8', _stylesheet().encode()),
+            '/big.html': ('text/html; charset=utf-8', _big_page_html().encode()),
+        }
+        self._thread = None
+
+    def url(self, path):
+        """ Returns the url of a page of the server, e.g. `/big.html`. """
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def summarize(samples):
+    """ Returns the statistics of a list of durations, in seconds.
+
+        Returns
+        -------
+        - dict
+            + `samples`, `min`, `median`, `p95` (nearest rank) and `max`.
+    """
+    ordered = sorted(samples)
+    return {
+        'samples': [round(sample, 6) for sample in samples],
+        'min': round(ordered[0], 6),
+        'median': round(statistics.median(ordered), 6),
+        'p95': round(ordered[math.ceil(0.95 * len(ordered)) - 1], 6),
+        'max': round(ordered[-1], 6),
+    }
+
+
+def _timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+class _Session():
+    """ Started Html2Image instance, shared by the warm scenarios. """
+
+    def __init__(self, make_hti, concurrency):
+        self.hti = make_hti()
+        # CDP browsers can take as many screenshots at once as they have tabs
+        if hasattr(self.hti.browser, 'max_tabs'):
+            self.hti.browser.max_tabs = max(self.hti.browser.max_tabs, concurrency)
+        self.started = False
+
+    def __enter__(self):
+        if isinstance(self.hti.browser, CDPBrowser):
+            self.hti.__enter__()
+            self.started = True
+        return self.hti
+
+    def __exit__(self, *exc):
+        if self.started:
+            self.hti.__exit__(None, None, None)
+
+
+def _cold_start(make_hti, server, repeat, **_):
+    samples = []
+    for index in range(repeat):
+        session = None
+        start = time.perf_counter()
+        try:
+            session = _Session(make_hti, 1)
+            hti = session.__enter__()
+            hti.screenshot(
+                url=server.url('/simple.html'), size=SIMPLE_PAGE_SIZE,
+                save_as=f'cold_start_{index}.png',
+            )
+            samples.append(time.perf_counter() - start)
+        finally:
+            if session is not None:
+                session.__exit__(None, None, None)
+    return {'cold_start': summarize(samples)}
+
+
+def _warm_single(hti, server, repeat, **_):
+    def render(index):
+        hti.screenshot(
+            url=server.url('/simple.html'), size=SIMPLE_PAGE_SIZE,
+            save_as=f'warm_single_{index}.png',
+        )
+
+    render('warmup')
+    return {'warm_single': summarize([
+        _timed(lambda: render(index)) for index in range(repeat)
+    ])}
+
+
+def _batch(hti, server, repeat, concurrency, batch_size, **_):
+    results = {}
+    for level in concurrency:
+        def render_batch():
+            jobs = [
+                {'url': server.url('/simple.html'), 'size': list(SIMPLE_PAGE_SIZE),
+                 'save_as': f'batch_c{level}_{index}.png'}
+                for index in range(batch_size)
+            ]
+            _, failed = run_batch(hti, jobs, io.StringIO(), parallelism=level)
+            if failed:
+                raise RuntimeError(f'{failed} screenshot(s) of the batch failed.')
+
+        render_batch()  # warms up the tabs of the pool
+        stats = summarize([_timed(render_batch) for _ in range(repeat)])
+        stats['throughput'] = round(batch_size / stats['median'], 3)
+        results[f'batch_c{level}'] = stats
+    return results
+
+
+def _big_page(hti, server, repeat, **_):
+    def render(index):
+        hti.screenshot(
+            url=server.url('/big.html'), size=BIG_PAGE_SIZE,
+            save_as=f'big_page_{index}.png',
+        )
+
+    render('warmup')
+    return {'big_page': summarize([
+        _timed(lambda: render(index)) for index in range(repeat)
+    ])}
+
+
+def _css_heavy(hti, server, repeat, **_):
+    html, css = css_heavy_source()
+
+    def render(index):
+        hti.screenshot(
+            html_str=html, css_str=css, size=SIMPLE_PAGE_SIZE,
+            save_as=f'css_heavy_{index}.png',
+        )
+
+    render('warmup')
+    return {'css_heavy': summarize([
+        _timed(lambda: render(index)) for index in range(repeat)
+    ])}
+
+
+_WARM_SCENARIOS = {
+    'warm_single': _warm_single,
+    'batch': _batch,
+    'big_page': _big_page,
+    'css_heavy': _css_heavy,
+}
+
+
+def run_benchmarks(hti_kwargs=None, scenarios=SCENARIOS, repeat=5,
+                   concurrency=(1, 2, 4), batch_size=16):
+    """ Runs benchmark scenarios and returns their results.
+
+    Parameters
+    ----------
+    - `hti_kwargs`: dict, optional
+        + `Html2Image()` keyword arguments, e.g. the browser to measure.
+        + Screenshots are saved in a temporary directory, removed
+        + afterwards.
+    - `scenarios`: iterable of str, optional
+        + Names of the scenarios to run, among `SCENARIOS`.
+    - `repeat`: int, optional
+        + Number of measurements of each scenario, after a warm-up
+        + render for the warm scenarios.
+    - `concurrency`: iterable of int, optional
+        + Numbers of screenshots taken at the same time by the `batch`
+        + scenario, one `batch_c<N>` result each.
+    - `batch_size`: int, optional
+        + Number of screenshots of each batch.
+
+    Returns
+    -------
+    - dict
+        + JSON serializable results: the `environment` and `settings` of
+        + the run, and the statistics (see `summarize()`) of each
+        + scenario in `scenarios`. Durations are in seconds, and batch
+        + scenarios add a `throughput` in screenshots per second.
+
+    Raises
+    ------
+    - `ValueError`
+        + If a scenario is unknown, or `repeat` is lower than 1.
+    """
+    scenarios = list(scenarios)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(
+            f'Unknown scenario(s) {unknown}, expected some of {list(SCENARIOS)}.'
+        )
+    if repeat < 1:
+        raise ValueError('`repeat` should be greater than 0.')
+    concurrency = sorted(set(concurrency))
+
+    output_path = tempfile.mkdtemp(prefix='html2image-bench-')
+    hti_kwargs = dict(hti_kwargs or {}, output_path=output_path)
+
+    def make_hti():
+        return Html2Image(**hti_kwargs)
+
+    settings = {
+        'repeat': repeat,
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+    }
+    results = {
+        'format': RESULTS_FORMAT,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'browser': hti_kwargs.get('browser', 'chrome'),
+        },
+        'settings': settings,
+        'scenarios': {},
+    }
+
+    try:
+        with FixtureServer() as server:
+            if 'cold_start' in scenarios:
+                logger.info('Running the cold_start scenario')
+                results['scenarios'].update(
+                    _cold_start(make_hti, server, repeat)
+                )
+
+            warm = [name for name in scenarios if name in _WARM_SCENARIOS]
+            if warm:
+                with _Session(make_hti, max(concurrency, default=1)) as hti:
+                    for name in warm:
+                        logger.info('Running the %s scenario', name)
+                        results['scenarios'].update(_WARM_SCENARIOS[name](
+                            hti=hti, server=server, **settings,
+                        ))
+    finally:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """ Returns the metrics of `results` which regressed from `baseline`.
+
+    The median duration of each scenario, and the throughput of batch
+    scenarios, are compared. Scenarios missing from either results are
+    ignored.
+
+    Parameters
+    ----------
+    - `results`, `baseline`: dict
+        + Results returned by `run_benchmarks()`.
+    - `tolerance`: float, optional
+        + Relative change tolerated before a metric counts as a
+        + regression, e.g. 0.1 for 10%.
+
+    Returns
+    -------
+    - list of dict
+        + `{'scenario', 'metric', 'baseline', 'current', 'change'}`,
+        + `change` being relative to the baseline value.
+    """
+    regressions = []
+    for name, current in results.get('scenarios', {}).items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            continue
+
+        for metric, higher_is_better in COMPARED_METRICS:
+            if not previous.get(metric) or metric not in current:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    'scenario': name,
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': current[metric],
+                    'change': round(change, 4),
+                })
+    return regressions
+
+
+def format_results(results, regressions=(), file=sys.stdout):
+    """ Writes a table of the results, and the regressions if any. """
+    print(
+        f'{"scenario":<14}{"median (s)":>12}{"p95 (s)":>12}'
+        f'{"throughput (/s)":>18}',
+        file=file,
+    )
+    for name, stats in results['scenarios'].items():
+        throughput = stats.get('throughput')
+        print(
+            f'{name:<14}{stats["median"]:>12.4f}{stats["p95"]:>12.4f}'
+            f'{"" if throughput is None else f"{throughput:.2f}":>18}',
+            file=file,
+        )
+
+    for regression in regressions:
+        print(
+            f'Regression: {regression["scenario"]} {regression["metric"]} '
+            f'{regression["baseline"]} -> {regression["current"]} '
+            f'({regression["change"]:+.1%})',
+            file=file,
+        )
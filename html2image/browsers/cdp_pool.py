@@ -0,0 +1,417 @@
+"""
+Connections to Chrome DevTools Protocol targets, and a pool of
+reusable tabs (page targets) for CDP browsers.
+"""
+
+import itertools
+import json
+import socket
+import threading
+
+from websocket import (
+    WebSocketConnectionClosedException, WebSocketTimeoutException,
+    create_connection,
+)
+
+from .errors import BrowserCrashedError, CDPTimeoutError
+
+
+class CDPConnection():
+    """
+        WebSocket connection to a CDP target (the browser itself or a page).
+
+        Parameters
+        ----------
+        - `ws_url` : str
+            + `webSocketDebuggerUrl` of the target.
+        - `timeout` : float, optional
+            + Number of seconds to wait for each message from the target.
+            + None to wait as long as needed.
+
+        Raises
+        ------
+        - `BrowserCrashedError`
+            + If the connection is lost, by any method.
+        - `CDPTimeoutError`
+            + If the target stays silent for `timeout` seconds, by any
+            + method waiting for a message.
+    """
+
+    def __init__(self, ws_url, timeout=None):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        try:
+            self.ws = create_connection(ws_url, timeout=timeout)
+        except (WebSocketConnectionClosedException, OSError) as e:
+            raise BrowserCrashedError(f'Could not connect to {ws_url}: {e}')
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()  # one command/response at a time
+
+    def send(self, method, **params):
+        """ Sends a CDP command without waiting for its response.
+
+            Returns
+            -------
+            - int
+                + The id of the message.
+        """
+        message_id = next(self._ids)
+        try:
+            self.ws.send(
+                json.dumps({
+                    'id': message_id,
+                    'method': method,
+                    'params': params,
+                })
+            )
+        except (WebSocketConnectionClosedException, OSError) as e:
+            raise BrowserCrashedError(f'Could not send {method}: {e}')
+        return message_id
+
+    def call(self, method, **params):
+        """ Sends a CDP command and waits for its response.
+
+            Events and responses to other commands received in
+            the meantime are skipped.
+
+            Returns
+            -------
+            - dict
+                + The `result` member of the response.
+
+            Raises
+            ------
+            - `RuntimeError`
+                + If the browser responded with an error.
+        """
+        with self._lock:
+            message_id = self.send(method, **params)
+
+            while True:
+                message = self._receive(method)
+                if message.get('id') != message_id:
+                    continue
+                if 'error' in message:
+                    raise RuntimeError(f'{method} failed: {message["error"]}')
+                return message.get('result', {})
+
+    def wait_for_events(self, *methods):
+        """ Reads incoming messages until every given event has been received.
+
+            Parameters
+            ----------
+            - `methods`: str
+                + Names of the awaited CDP events, e.g. `Page.loadEventFired`.
+                + Events can be received in any order.
+
+            Returns
+            -------
+            - dict
+                + The `params` of each awaited event, by name.
+        """
+        pending = set(methods)
+        received = {}
+        with self._lock:
+            while pending:
+                message = self._receive(', '.join(sorted(pending)))
+                method = message.get('method')
+                if method in pending:
+                    pending.discard(method)
+                    received[method] = message.get('params', {})
+        return received
+
+    def _receive(self, awaited):
+        """ Receives the next message, `awaited` describing what is
+            waited for in errors.
+        """
+        try:
+            return json.loads(self.ws.recv())
+        except (WebSocketTimeoutException, socket.timeout):
+            raise CDPTimeoutError(
+                f'No answer to {awaited} after {self.timeout} seconds.'
+            )
+        except (WebSocketConnectionClosedException, OSError) as e:
+            raise BrowserCrashedError(
+                f'Connection lost while waiting for {awaited}: {e}'
+            )
+
+    def close(self):
+        self.ws.close()
+
+
+class CDPTab(CDPConnection):
+    """
+        Connection to a page target, as handed out by a `TabPool`.
+
+        Parameters
+        ----------
+        - `ws_url` : str
+            + `webSocketDebuggerUrl` of the page.
+        - `target_id` : str
+            + Id of the page target.
+        - `browser_context_id` : str, optional
+            + Id of the browser context the page belongs to.
+            + None for the default browser context.
+        - `own_context_id` : str, optional
+            + Id of the browser context created for this page alone,
+            + in which pages of the default browser context live.
+        - `timeout` : float, optional
+    """
+
+    def __init__(self, ws_url, target_id, browser_context_id=None,
+                 own_context_id=None, timeout=None):
+        super().__init__(ws_url, timeout=timeout)
+        self.target_id = target_id
+        self.browser_context_id = browser_context_id
+        self.own_context_id = own_context_id
+        self.uses = 0
+        # (width, height) of the device metrics override of the tab, kept
+        # between uses as consecutive screenshots often share their size
+        self.device_metrics = None
+
+
+class TabPool():
+    """
+        Pool of tabs (page targets) reused across screenshots.
+
+        Creating a page target for every screenshot costs a renderer
+        startup each time. Tabs of the pool are instead reset between
+        uses: storage and cookies are wiped and the tab goes back to
+        `about:blank`. Its device metrics override is kept, as the next
+        screenshot often has the same size, see `CDPTab.device_metrics`. A tab is closed
+        and replaced after `max_uses` uses to keep memory bounded.
+
+        Cookies and storage belong to a whole browser context. Tabs asked
+        for in the default browser context hence each get a browser
+        context of their own, so that resetting one of them does not
+        wipe the cookies of the others while they render. Tabs of a named
+        browser context share it: it is only wiped once none of its other
+        tabs are in use.
+
+        Parameters
+        ----------
+        - `connection` : CDPConnection
+            + Connection to the browser target, used to create and
+            + close page targets.
+        - `cdp_port` : int
+            + Remote debugging port of the browser.
+        - `max_tabs` : int, optional
+            + Maximum number of simultaneously open tabs.
+            + `acquire()` blocks when they are all in use.
+        - `max_uses` : int, optional
+            + Number of screenshots taken with a tab before it is recycled.
+        - `timeout` : float, optional
+            + Timeout of the connections to the tabs, see `CDPConnection`.
+        - `counters` : dict, optional
+            + Dict in which the numbers of tabs handed out by `acquire()`
+            + are counted, under the `reused` and `opened` keys. It can be
+            + shared by successive pools.
+    """
+
+    def __init__(self, connection, cdp_port, max_tabs=1, max_uses=100,
+                 timeout=None, counters=None):
+        if max_tabs < 1 or max_uses < 1:
+            raise ValueError(
+                '`max_tabs` and `max_uses` should be greater than 0.'
+            )
+
+        self.connection = connection
+        self.cdp_port = cdp_port
+        self.max_tabs = max_tabs
+        self.max_uses = max_uses
+        self.timeout = timeout
+        self.counters = counters if counters is not None else {}
+        self.counters.setdefault('reused', 0)
+        self.counters.setdefault('opened', 0)
+
+        self._idle_tabs = []
+        self._open_tab_count = 0
+        self._in_use = {}  # number of tabs in use, by browser context id
+        self._condition = threading.Condition()
+
+    def acquire(self, browser_context_id=None):
+        """ Gets a tab from the pool, opening a new one if needed.
+
+            Blocks until a tab is available if `max_tabs` tabs are in use.
+
+            Parameters
+            ----------
+            - `browser_context_id` : str, optional
+                + Browser context in which the tab should be.
+                + None for the default browser context.
+
+            Returns
+            -------
+            - CDPTab
+        """
+        with self._condition:
+            while True:
+                for tab in reversed(self._idle_tabs):
+                    if tab.browser_context_id == browser_context_id:
+                        self._idle_tabs.remove(tab)
+                        self.counters['reused'] += 1
+                        self._count_use(browser_context_id, 1)
+                        return tab
+
+                if self._open_tab_count < self.max_tabs:
+                    self._open_tab_count += 1
+                    self.counters['opened'] += 1
+                    self._count_use(browser_context_id, 1)
+                    break
+
+                if self._idle_tabs:
+                    # only tabs of other browser contexts are
+                    # idle, close the oldest one to make room
+                    self._close_tab(self._idle_tabs.pop(0))
+                    continue
+
+                self._condition.wait()
+
+        try:
+            return self._open_tab(browser_context_id)
+        except Exception:
+            with self._condition:
+                self._open_tab_count -= 1
+                self._count_use(browser_context_id, -1)
+                self._condition.notify()
+            raise
+
+    def release(self, tab, reusable=True):
+        """ Gives a tab back to the pool.
+
+            The tab is reset, or closed if it reached `max_uses` uses.
+
+            Parameters
+            ----------
+            - `tab` : CDPTab
+            - `reusable` : bool, optional
+                + False if the tab is in an unknown state (e.g. after an
+                + error) and should be closed rather than reused.
+        """
+        tab.uses += 1
+
+        with self._condition:
+            self._count_use(tab.browser_context_id, -1)
+            # the cookies and storage of a named browser context are only
+            # wiped once none of its tabs are rendering
+            shared = (
+                tab.own_context_id is None
+                and self._in_use.get(tab.browser_context_id, 0) > 0
+            )
+
+        if reusable and tab.uses < self.max_uses:
+            try:
+                self._reset_tab(tab, clear_storage=not shared)
+            except Exception:
+                reusable = False
+        else:
+            reusable = False
+
+        with self._condition:
+            if reusable:
+                self._idle_tabs.append(tab)
+            else:
+                self._close_tab(tab)
+            self._condition.notify()
+
+    def discard_context(self, browser_context_id):
+        """ Closes the idle tabs of a browser context.
+        """
+        with self._condition:
+            for tab in [
+                tab for tab in self._idle_tabs
+                if tab.browser_context_id == browser_context_id
+            ]:
+                self._idle_tabs.remove(tab)
+                self._close_tab(tab)
+            self._condition.notify_all()
+
+    def close(self):
+        """ Closes every idle tab of the pool.
+        """
+        with self._condition:
+            while self._idle_tabs:
+                self._close_tab(self._idle_tabs.pop())
+            self._condition.notify_all()
+
+    def _count_use(self, browser_context_id, delta):
+        """ Counts the tabs of a browser context in use, `self._condition`
+            must be held by the caller.
+        """
+        count = self._in_use.get(browser_context_id, 0) + delta
+        if count > 0:
+            self._in_use[browser_context_id] = count
+        else:
+            self._in_use.pop(browser_context_id, None)
+
+    def _open_tab(self, browser_context_id):
+        own_context_id = None
+        if browser_context_id is None:
+            own_context_id = self.connection.call(
+                'Target.createBrowserContext',
+            )['browserContextId']
+
+        try:
+            target_id = self.connection.call(
+                'Target.createTarget', url='about:blank',
+                browserContextId=own_context_id or browser_context_id,
+            )['targetId']
+
+            return CDPTab(
+                f'ws://localhost:{self.cdp_port}/devtools/page/{target_id}',
+                target_id=target_id,
+                browser_context_id=browser_context_id,
+                own_context_id=own_context_id,
+                timeout=self.timeout,
+            )
+        except Exception:
+            if own_context_id is not None:
+                self._dispose_context(own_context_id)
+            raise
+
+    def _reset_tab(self, tab, clear_storage=True):
+        if clear_storage:
+            origin = tab.call(
+                'Runtime.evaluate', expression='location.origin',
+                returnByValue=True,
+            ).get('result', {}).get('value')
+
+            if origin and origin != 'null':
+                tab.call(
+                    'Storage.clearDataForOrigin',
+                    origin=origin, storageTypes='all',
+                )
+
+            self.connection.call(
+                'Storage.clearCookies',
+                browserContextId=tab.own_context_id or tab.browser_context_id,
+            )
+
+        # the navigation is over once the load event of the blank page is
+        # received, which may come before the response to Page.navigate
+        tab.send('Page.enable')
+        tab.send('Page.navigate', url='about:blank')
+        tab.wait_for_events('Page.loadEventFired')
+
+    def _close_tab(self, tab):
+        """ Closes a tab, `self._condition` must be held by the caller.
+        """
+        self._open_tab_count -= 1
+        try:
+            tab.close()
+            self.connection.call('Target.closeTarget', targetId=tab.target_id)
+        except Exception:
+            # the tab or the browser may already be gone
+            pass
+        if tab.own_context_id is not None:
+            self._dispose_context(tab.own_context_id)
+
+    def _dispose_context(self, browser_context_id):
+        try:
+            self.connection.call(
+                'Target.disposeBrowserContext',
+                browserContextId=browser_context_id,
+            )
+        except Exception:
+            pass  # the browser may already be gone
@@ -1,24 +1,170 @@
 from .browser import CDPBrowser
 from .search_utils import find_chrome
 
+import logging
 import os
+import pathlib
 import subprocess
 
 import requests
 import json
-from websocket import create_connection
 import base64
-
-import websocket
-# websocket.enableTrace(True) 
+import threading
+import time
+
+from contextlib import contextmanager
+
+from .cdp_pool import CDPConnection, TabPool
+from .errors import BrowserCrashedError, CDPTimeoutError, ResourceLimitError
+from .process_utils import process_tree_rss
+from .timings import RenderTimings, call_timing_hooks
+from .trace_capture import trace_file_name
+from html2image.results import describe_image
+
+logger = logging.getLogger(__name__)
+
+# image formats of Page.captureScreenshot, by extension of the output
+# file, other extensions are written as PNG
+CAPTURE_FORMATS = {
+    '.png': 'png',
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.webp': 'webp',
+}
+
+# Default update function used by `ChromeCDP.screenshot_template`:
+# the value of each key of a record is set as the text content of the
+# elements having a matching `data-hti-field` attribute, e.g.
+# {"title": "Hello"} fills <h1 data-hti-field="title"></h1>
+DEFAULT_TEMPLATE_UPDATE_SCRIPT = """(data) => {
+    for (const [field, value] of Object.entries(data)) {
+        document.querySelectorAll(`[data-hti-field="${field}"]`)
+            .forEach(element => { element.textContent = value; });
+    }
+}"""
+
+
+class RetryBudget():
+    """
+        Limits retries to a fraction of the attempts, so that a browser
+        crashing on every page cannot make every job run several times.
+
+        Each attempt adds `ratio` token to the budget, up to `reserve`
+        tokens, and each retry takes one token.
+
+        Parameters
+        ----------
+        - `ratio` : float, optional
+            + Long-term maximum number of retries per attempt.
+        - `reserve` : int, optional
+            + Number of retries allowed in a burst, e.g. after a crash
+            + which failed every screenshot in progress.
+    """
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self._tokens = reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.ratio, self.reserve)
+
+    def withdraw(self):
+        """ Takes a token and returns True if a retry is allowed.
+        """
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
 
 
 class ChromeCDP(CDPBrowser):
+    """
+        Chrome/Chromium browser driven through the Chrome DevTools Protocol.
+
+        The browser is started once when entering a `with` block, and
+        screenshots are taken in tabs that are reused across screenshots.
+
+        Parameters
+        ----------
+        - `executable` : str, optional
+            + Path to a chrome executable.
+        - `flags` : list of str
+            + Flags to be used by the headless browser.
+        - `print_command` : bool
+            + Whether or not to print the command used to start the browser.
+        - `cdp_port` : int, optional
+            + Remote debugging port of the browser, default is 9222.
+        - `disable_logging` : bool
+            + Whether or not to disable Chrome's output.
+        - `max_tabs` : int, optional
+            + Maximum number of tabs open at the same time, which is the
+            + number of screenshots that can be taken concurrently.
+        - `max_tab_uses` : int, optional
+            + Number of screenshots taken with a tab before it is closed
+            + and replaced by a new one.
+        - `cdp_timeout` : float, optional
+            + Number of seconds after which a silent browser is considered
+            + hung (`CDPTimeoutError`). None to wait as long as needed.
+        - `max_retries` : int, optional
+            + Number of times a screenshot is retried when the browser
+            + crashes or hangs, within the limits of `retry_budget`.
+        - `max_pages` : int, optional
+            + Number of screenshots after which the browser process is
+            + replaced by a new one. None for no limit.
+        - `max_rss` : int, optional
+            + Resident memory, in bytes, of the browser and its child
+            + processes above which the browser process is replaced by a
+            + new one. None for no limit. Only checked on Linux, every
+            + `rss_check_interval` screenshots.
+
+        Browsers leak memory over time. When `max_pages` or `max_rss` is
+        crossed, the browser is drained: new screenshots wait while the
+        ones in progress (including those waiting for a free tab) finish,
+        then the browser process is replaced and the waiting screenshots
+        proceed.
+
+        The browser and its children can be run under memory, CPU and
+        process limits (Linux only) by setting `resource_limits` to a
+        `html2image.browsers.limits.ResourceLimits` before starting it.
+        A screenshot failing because a limit was exceeded (e.g. its
+        renderer was killed for using too much memory) raises
+        `ResourceLimitError` and is not retried.
+
+        Screenshots return the `RenderTimings` of their phases (waiting
+        for a tab, navigation, load, capture, decoding, writing...), which
+        are also given to the hooks of the `timing_hooks` list, and traced
+        as spans by the `tracer`, if any (see `html2image.tracing`).
+
+        With a `html2image.browsers.trace_capture.TraceCapture` in
+        `trace_capture`, a sample of the screenshots is recorded in Chrome
+        performance traces, written next to their images.
+
+        Images are encoded after the extension of their file: `.jpg` and
+        `.jpeg` files are JPEG, `.webp` files are WebP, others are PNG
+        (see `CAPTURE_FORMATS`). The quality of JPEG and WebP images, from
+        0 to 100, can be set with `image_quality`, Chrome's default is 80.
+
+        Crashes are detected through lost connections and timeouts. The
+        screenshots in progress are then retried: in a new tab if the
+        browser is still healthy (see `is_alive()`), or once a new browser
+        process has been started otherwise (see `restart()`).
+
+        Screenshots can be isolated from each other (cookies, storage,
+        cache) without starting other browser processes, by giving them
+        a `browser_context`: each browser context is an incognito-like
+        profile living inside of the shared browser process.
+    """
 
     def __init__(
         self, executable=None, flags=None,
         print_command=False, cdp_port=9222,
-        disable_logging=False,
+        disable_logging=False, max_tabs=1, max_tab_uses=100,
+        cdp_timeout=30, max_retries=2,
+        max_pages=None, max_rss=None, rss_check_interval=10,
     ):
         self.executable = executable
         if not flags:
@@ -33,11 +179,41 @@ class ChromeCDP(CDPBrowser):
         self.print_command = print_command
         self.cdp_port = cdp_port
         self._disable_logging = disable_logging
-
-        self._ws = None  # Websocket connection
+        self.max_tabs = max_tabs
+        self.max_tab_uses = max_tab_uses
+        self.cdp_timeout = cdp_timeout
+        self.max_retries = max_retries
+        self.retry_budget = RetryBudget()
+        self.restarts = 0  # number of browser processes replaced
+        self.max_pages = max_pages
+        self.max_rss = max_rss
+        self.rss_check_interval = rss_check_interval
+        self.pages_rendered = 0  # by the current browser process
+        self.resource_limits = None
+        self.trace_capture = None
+        self.image_quality = None
+        self.timing_hooks = []
+        self.tracer = None
+        # tabs reused from the pool or opened, across browser processes
+        self.tab_counters = {'reused': 0, 'opened': 0}
+
+        self._connection = None  # Connection to the browser target
+        self._tabs = None  # Pool of page targets
         self.proc = None  # Headless browser Popen object
 
-        self.__id = 0
+        # browser context names and their browserContextId
+        self._browser_contexts = {}
+        self._browser_contexts_lock = threading.Lock()
+
+        # incremented on each restart, so that the threads that saw the
+        # same crash only restart the browser once
+        self._generation = 0
+        self._restart_lock = threading.Lock()
+
+        # screenshots in progress, and whether the browser is being drained
+        self._in_progress = 0
+        self._draining = False
+        self._drain_condition = threading.Condition()
 
     @property
     def executable(self):
@@ -56,32 +232,105 @@ class ChromeCDP(CDPBrowser):
         self._disable_logging = value
 
     @property
-    def ws(self):
+    def connection(self):
+        """ Connection to the browser target.
+        """
+        if not self._connection:
+            logger.debug('Fetching http://localhost:%d/json/version', self.cdp_port)
+            try:
+                r = requests.get(
+                    f'http://localhost:{self.cdp_port}/json/version',
+                    timeout=self.cdp_timeout,
+                )
+            except requests.exceptions.RequestException as e:
+                raise BrowserCrashedError(
+                    f'Could not reach the browser on port {self.cdp_port}: {e}'
+                )
+            ws_url = r.json()['webSocketDebuggerUrl']
+            logger.debug('Connecting to %s', ws_url)
+            self._connection = CDPConnection(ws_url, timeout=self.cdp_timeout)
+            logger.debug('Connected to %s', ws_url)
+        return self._connection
 
-        if not self._ws:
-            print(f'----------- http://localhost:{self.cdp_port}/json/version')
-            r = requests.get(f'http://localhost:{self.cdp_port}/json')  # TODO use page websocket instead of browser one
-            print(f'{r.json()}')
-            print(f'Using ws url= {r.json()[0]["webSocketDebuggerUrl"]}')
-            self._ws = create_connection(r.json()[0]['webSocketDebuggerUrl'])
-            print('Successfully connected to ws.')
-        return self._ws
+    @property
+    def ws(self):
+        """ Websocket connected to the browser target.
+        """
+        return self.connection.ws
 
     @property
-    def _id(self):
-        self.__id += 1
-        return self.__id
+    def tabs(self):
+        """ Pool of tabs in which screenshots are taken.
+        """
+        if not self._tabs:
+            self._tabs = TabPool(
+                self.connection,
+                self.cdp_port,
+                max_tabs=self.max_tabs,
+                max_uses=self.max_tab_uses,
+                timeout=self.cdp_timeout,
+                counters=self.tab_counters,
+            )
+        return self._tabs
 
     def cdp_send(self, method, **params):
+        """ Sends a CDP command to the browser target,
+            without waiting for its response.
+        """
+        logger.debug('cdp_send: %s %s', method, params)
+        return self.connection.send(method, **params)
+
+    def cdp_call(self, method, **params):
+        """ Sends a CDP command to the browser target and
+            returns the `result` member of its response.
+        """
+        logger.debug('cdp_call: %s %s', method, params)
+        return self.connection.call(method, **params)
+
+    def get_browser_context_id(self, browser_context):
+        """ Returns the id of a browser context, creating it if needed.
+
+            Parameters
+            ----------
+            - `browser_context`: str or None
+                + Name of the browser context, e.g. the name of a tenant.
+                + None for the default browser context.
+
+            Returns
+            -------
+            - str or None
+                + The `browserContextId` of the browser context.
         """
+        if browser_context is None:
+            return None
+
+        with self._browser_contexts_lock:
+            if browser_context not in self._browser_contexts:
+                self._browser_contexts[browser_context] = self.cdp_call(
+                    'Target.createBrowserContext',
+                )['browserContextId']
+            return self._browser_contexts[browser_context]
+
+    def dispose_browser_context(self, browser_context):
+        """ Closes a browser context and deletes all of its data.
+
+            Parameters
+            ----------
+            - `browser_context`: str
+                + Name of the browser context.
         """
-        print(f'cdp_send: {method} {params}')
-        return self.ws.send(
-            json.dumps({
-                'id': self._id,
-                'method': method,
-                'params': params,
-            })
+        with self._browser_contexts_lock:
+            browser_context_id = self._browser_contexts.pop(
+                browser_context, None,
+            )
+
+        if browser_context_id is None:
+            return
+
+        self.tabs.discard_context(browser_context_id)
+        self.cdp_call(
+            'Target.disposeBrowserContext',
+            browserContextId=browser_context_id,
         )
 
     def screenshot(
@@ -90,93 +339,498 @@ class ChromeCDP(CDPBrowser):
         output_path,
         output_file='screenshot.png',
         size=(1920, 1080),
+        virtual_time_budget=None,
+        browser_context=None,
     ):
-        """
+        """ Takes a screenshot through the Chrome DevTools Protocol.
+
+            Parameters
+            ----------
+            - `input`: str
+                + File or url that will be screenshotted.
+            - `output_path`: str
+                + Directory in which the screenshot will be saved.
+            - `output_file`: str
+                + Name as which the screenshot will be saved.
+            - `size`: (int, int), optional
+                + Size of the screenshot.
+            - `virtual_time_budget`: int, optional
+                + Amount of virtual time, in milliseconds, the page is
+                + allowed to run before the screenshot is taken.
+                + Uses `Emulation.setVirtualTimePolicy`, timers and
+                + animations are fast-forwarded instead of being waited for.
+            - `browser_context`: str, optional
+                + Name of the browser context in which the screenshot is
+                + taken, created if needed. Cookies and storage are not
+                + shared between browser contexts.
+
+            Returns
+            -------
+            - `RenderTimings`
+
+            Raises
+            ------
+            - `ValueError`
+                + If `virtual_time_budget` is negative.
         """
         # Useful documentation about the Chrome DevTools Protocol:
         # https://chromedevtools.github.io/devtools-protocol/
 
-        # "Enabling" the page allows to receive the Page.loadEventFired event
-        self.cdp_send('Page.enable')
+        if virtual_time_budget is not None and virtual_time_budget < 0:
+            raise ValueError(
+                'The `virtual_time_budget` parameter should be a positive '
+                f'amount of milliseconds, instead got {virtual_time_budget}.'
+            )
 
-        self.cdp_send('Page.navigate', url=input)
+        timings = RenderTimings(output_file, tracer=self.tracer)
 
-        print('wait for page to load')
+        def render(tab):
+            with self._traced(tab, output_path, output_file, timings):
+                self._navigate(tab, input, virtual_time_budget, timings)
+                self._capture(tab, output_path, output_file, size, timings)
 
-        # Wait for page to load entirely
-        while True:
-            message = json.loads(self.ws.recv())
-            method = message.get('method')
-            print(f'{method}')
-            if method == 'Page.loadEventFired':
-                break
-        
-        print('page disable')
-        self.cdp_send('Page.disable')
-
-        self.cdp_send(
-            'Emulation.setDeviceMetricsOverride',
-            width=size[0],
-            height=size[1],
-            deviceScaleFactor=0,  # 0 disables the override
-            mobile=False,
-        )
+        return self._timed_run_in_tab(render, browser_context, timings)
 
-        print('send Page.captureScreenshot')
-
-        self.cdp_send(
-            'Page.captureScreenshot',
-            # captureBeyondViewport=True,
-            # clip={
-            #     'width': size[0],
-            #     'height': size[1],
-            #     'x': 500,
-            #     'y': 200,
-            #     'scale': 4
-            # }
-        )
+    def screenshot_template(
+        self,
+        template,
+        records,
+        output_path,
+        output_files,
+        size=(1920, 1080),
+        update_script=None,
+        browser_context=None,
+    ):
+        """ Takes one screenshot per data record of a single loaded template.
+
+            The template is loaded only once. For every record, the page is
+            then updated in place through `Runtime.evaluate`, and the
+            screenshot is taken as soon as the update has been painted.
+
+            Parameters
+            ----------
+            - `template`: str
+                + File or url of the template page.
+            - `records`: iterable of dict
+                + JSON serializable data, one record per screenshot.
+            - `output_path`: str
+                + Directory in which the screenshots will be saved.
+            - `output_files`: iterable of str
+                + Names as which the screenshots will be saved, in the
+                + same order as `records`.
+            - `size`: (int, int), optional
+                + Size of the screenshots.
+            - `update_script`: str, optional
+                + Source of a JavaScript function that receives a record and
+                + updates the page accordingly. It may return a Promise.
+                + Default is `DEFAULT_TEMPLATE_UPDATE_SCRIPT`.
+            - `browser_context`: str, optional
+                + Name of the browser context in which the template is
+                + loaded, created if needed.
+
+            Returns
+            -------
+            - `RenderTimings`
+                + Timings of the whole template, the durations of the
+                + `update` and capture phases of each record are added up.
+                + A traced template has a single trace, named after its
+                + first image.
+
+            Raises
+            ------
+            - `RuntimeError`
+                + If the update script throws an exception.
+        """
+        if update_script is None:
+            update_script = DEFAULT_TEMPLATE_UPDATE_SCRIPT
+
+        # records and names are consumed again if the template is retried
+        records, output_files = list(records), list(output_files)
+        timings = RenderTimings(template, tracer=self.tracer)
+
+        # a template is traced as a whole, after its first image
+        trace_name = output_files[0] if output_files else None
+
+        def render(tab):
+            with self._traced(tab, output_path, trace_name, timings):
+                self._navigate(tab, template, timings=timings)
+
+                for record, output_file in zip(records, output_files):
+                    # apply the update, then wait for two animation frames
+                    # so that the updated DOM has been painted
+                    with timings.phase('update'):
+                        result = tab.call(
+                            'Runtime.evaluate',
+                            expression=(
+                                f'Promise.resolve(({update_script})({json.dumps(record)}))'
+                                '.then(() => new Promise(resolve => '
+                                'requestAnimationFrame(() => requestAnimationFrame(resolve))))'
+                            ),
+                            awaitPromise=True,
+                        )
+
+                    if 'exceptionDetails' in result:
+                        raise RuntimeError(
+                            f'Could not apply {record} to the template:\n'
+                            f'{result["exceptionDetails"]}'
+                        )
+
+                    self._capture(tab, output_path, output_file, size, timings)
+
+        return self._timed_run_in_tab(render, browser_context, timings)
+
+    @contextmanager
+    def _traced(self, tab, output_path, output_file, timings):
+        """ Records a Chrome trace of the block, next to the image, if
+            `trace_capture` samples it.
+        """
+        if self.trace_capture is None or output_file is None:
+            yield
+            return
+
+        with self.trace_capture.record(
+            tab, os.path.join(output_path, trace_file_name(output_file)), timings,
+        ):
+            yield
+
+    def _timed_run_in_tab(self, render, browser_context, timings):
+        """ Runs `render` with `_run_in_tab()`, then gives its timings to
+            the timing hooks, whether it succeeded or not.
+        """
+        try:
+            self._run_in_tab(render, browser_context, timings)
+        except Exception as e:
+            timings.error = e
+            raise
+        finally:
+            call_timing_hooks(self.timing_hooks, timings)
+        return timings
+
+    def _run_in_tab(self, render, browser_context=None, timings=None):
+        """ Calls `render` with a tab of the pool, and retries it if the
+            browser crashes or hangs.
+
+            Returns
+            -------
+            - The return value of `render`.
+
+            Raises
+            ------
+            - `BrowserCrashedError` or `CDPTimeoutError`
+                + If the retries, or the retry budget, are exhausted.
+        """
+        if timings is None:
+            timings = RenderTimings()
+
+        with timings.phase('drain'), self._drain_condition:
+            while self._draining:
+                self._drain_condition.wait()
+            self._in_progress += 1
+
+        try:
+            return self._run_with_retries(render, browser_context, timings)
+        finally:
+            self._page_done()
 
-        print('writing to file..')
+    def _run_with_retries(self, render, browser_context, timings):
+        self.retry_budget.deposit()
+        retries = 0
 
-        # get screenshot data when ready,
-        # while potentially skipping unneeded messages
         while True:
-            message = json.loads(self.ws.recv())
-            # todo capture and display errors ?
-            if 'result' in message and 'data' in message['result']:
-                # retrive base64 encoded image data
-                img_data = message['result']['data']
-                break
+            timings.attempts = retries + 1
+            generation = self._generation
+            try:
+                if self.proc is not None and self.proc.poll() is not None:
+                    raise BrowserCrashedError(
+                        f'The browser exited with code {self.proc.returncode}.'
+                    )
+
+                with timings.phase('acquire_tab'):
+                    tabs = self.tabs
+                    tab = tabs.acquire(self.get_browser_context_id(browser_context))
+                try:
+                    result = render(tab)
+                except Exception:
+                    tabs.release(tab, reusable=False)
+                    raise
+                with timings.phase('release_tab'):  # resets the tab
+                    tabs.release(tab)
+                return result
+            except (BrowserCrashedError, CDPTimeoutError) as e:
+                if self.resource_limits is not None and self.proc is not None:
+                    # a page exceeding a limit would do so again if retried
+                    limit = self.resource_limits.exceeded(self.proc)
+                    if limit is not None:
+                        self._recover(generation)
+                        raise ResourceLimitError(
+                            limit, getattr(self.resource_limits, limit),
+                        ) from e
+
+                if (
+                    self.proc is None  # not started by this instance
+                    or retries >= self.max_retries
+                    or not self.retry_budget.withdraw()
+                ):
+                    raise
+                retries += 1
+                logger.warning(
+                    'Retrying a screenshot (%d/%d) after: %s',
+                    retries, self.max_retries, e,
+                )
+                with timings.phase('recover'):
+                    self._recover(generation)
+
+    def _page_done(self):
+        """ Counts a finished screenshot, and recycles the browser if
+            a threshold was crossed and no other screenshot is in progress.
+        """
+        with self._drain_condition:
+            self._in_progress -= 1
+            self.pages_rendered += 1
+
+            if not self._draining and self._should_recycle():
+                self._draining = True
+
+            if not self._draining or self._in_progress:
+                return  # the last screenshot in progress recycles
+
+        try:
+            with self._restart_lock:
+                logger.info(
+                    'Recycling headless Chrome after %d pages.',
+                    self.pages_rendered,
+                )
+                self.restart()
+        except Exception as e:
+            # the screenshot itself succeeded, the next ones will
+            # report that the browser is unavailable
+            logger.error('Could not recycle headless Chrome: %s', e)
+        finally:
+            with self._drain_condition:
+                self._draining = False
+                self._drain_condition.notify_all()
+
+    def _should_recycle(self):
+        if self.proc is None:
+            return False  # not started by this instance
+
+        if self.max_pages is not None and self.pages_rendered >= self.max_pages:
+            return True
+
+        if (
+            self.max_rss is not None
+            and self.pages_rendered % self.rss_check_interval == 0
+        ):
+            rss = self.memory_usage()
+            return rss is not None and rss > self.max_rss
+
+        return False
+
+    def memory_usage(self):
+        """ Returns the resident memory (RSS), in bytes, of the browser
+            and its child processes, or None if it is not known (the
+            browser is not running, or `/proc` is not available).
+        """
+        if self.proc is None:
+            return None
+        return process_tree_rss(self.proc.pid)
 
-        # Decode and write image data to file
-        with open(os.path.join(output_path, output_file), 'wb') as f:
-            f.write(base64.b64decode(img_data))
+    def _recover(self, generation):
+        """ Restarts the browser after a failure seen during `generation`,
+            unless it was restarted since or is still healthy.
+        """
+        with self._restart_lock:
+            if generation == self._generation and not self.is_alive():
+                self.restart()
 
-    def get_page_infos(self):
+    def is_alive(self):
+        """ Health check: returns whether the browser process is running
+            and answers CDP commands (within `cdp_timeout` seconds).
         """
+        if self.proc is None or self.proc.poll() is not None:
+            return False
+        try:
+            self.cdp_call('Browser.getVersion')
+            return True
+        except (BrowserCrashedError, CDPTimeoutError):
+            return False
+
+    def restart(self):
+        """ Replaces the browser process by a new one.
+
+            Tabs and browser contexts of the previous process are lost,
+            browser contexts are created again when next used.
         """
-        self.cdp_send('Page.getLayoutMetrics')
+        logger.info('Restarting headless Chrome on port %d.', self.cdp_port)
 
-        while True:
-            message = json.loads(self.ws.recv())
-            print(f'{message}')
-            if 'result' in message and 'layoutViewport' in message['result']:
-                return message['result']
+        self.stop()
+        self.start()
+        self._generation += 1
+        self.restarts += 1
+
+    def _navigate(self, tab, input, virtual_time_budget=None, timings=None):
+        """ Navigates a tab to a file or url and waits for the page to load.
+        """
+        if timings is None:
+            timings = RenderTimings()
+
+        # "Enabling" the page allows to receive the Page.loadEventFired event
+        tab.send('Page.enable')
+
+        awaited_events = ['Page.loadEventFired']
+
+        if virtual_time_budget is not None:
+            # Pause virtual time while resources are being fetched, and
+            # fast-forward it otherwise, until the budget is exhausted
+            tab.send(
+                'Emulation.setVirtualTimePolicy',
+                policy='pauseIfNetworkFetchesPending',
+                budget=int(virtual_time_budget),
+            )
+            awaited_events.append('Emulation.virtualTimeBudgetExpired')
+
+        with timings.phase('navigate'):
+            tab.send('Page.navigate', url=self._to_url(input))
+
+        logger.debug('Waiting for %s to load', input)
+
+        # Wait for page to load entirely (and for the virtual
+        # time budget to expire, if one was given)
+        with timings.phase('load'):
+            tab.wait_for_events(*awaited_events)
+
+        if virtual_time_budget is not None:
+            # Once expired, the budget leaves virtual time paused,
+            # let it run normally again for the following pages
+            tab.send('Emulation.setVirtualTimePolicy', policy='advance')
+
+        tab.send('Page.disable')
+
+    def _capture(self, tab, output_path, output_file, size, timings=None):
+        """ Screenshots the current page of a tab and writes the image to a file.
+        """
+        if timings is None:
+            timings = RenderTimings()
+
+        # a viewport change costs a relayout, skip it when the tab already
+        # has the right size (e.g. consecutive screenshots of a plan)
+        if tab.device_metrics != tuple(size):
+            tab.send(
+                'Emulation.setDeviceMetricsOverride',
+                width=size[0],
+                height=size[1],
+                deviceScaleFactor=0,  # 0 disables the override
+                mobile=False,
+            )
+            tab.device_metrics = tuple(size)
+
+        image_format = CAPTURE_FORMATS.get(
+            os.path.splitext(output_file)[1].lower(), 'png',
+        )
+        params = {'format': image_format}
+        if image_format != 'png' and self.image_quality is not None:
+            params['quality'] = int(self.image_quality)
+
+        # get base64 encoded image data when ready, while potentially
+        # skipping unneeded messages (includes the relayout caused
+        # by a new device metrics override)
+        with timings.phase('capture'):
+            img_data = tab.call(
+                'Page.captureScreenshot',
+                **params,
+                # captureBeyondViewport=True,
+                # clip={
+                #     'width': size[0],
+                #     'height': size[1],
+                #     'x': 500,
+                #     'y': 200,
+                #     'scale': 4
+                # }
+            )['data']
+
+        with timings.phase('decode'):
+            image = base64.b64decode(img_data)
+
+        # Write image data to file
+        path = os.path.join(output_path, output_file)
+        with timings.phase('write'):
+            with open(path, 'wb') as f:
+                f.write(image)
+        timings.bytes_written += len(image)
+        # spares callers a read of the file to learn its dimensions, its
+        # hash is only computed by the results asked for it
+        timings.images[path] = describe_image(image, content_hash=False)
+
+    @staticmethod
+    def _to_url(input):
+        """ Converts a filepath into a file:// URL, as CDP only navigates
+            to URLs. Anything else is returned untouched.
+        """
+        if os.path.isfile(input):
+            return pathlib.Path(input).absolute().as_uri()
+        return input
+
+    def get_page_infos(self, input):
+        """ Returns the layout metrics of a page (`Page.getLayoutMetrics`).
+        """
+        def render(tab):
+            if tab.device_metrics is not None:
+                # measures the page with the default viewport
+                tab.send('Emulation.clearDeviceMetricsOverride')
+                tab.device_metrics = None
+            self._navigate(tab, input)
+            return tab.call('Page.getLayoutMetrics')
+
+        return self._run_in_tab(render)
 
     def print_pdf(self):
         # TODO : Page.printToPDF
         pass
 
+    def _wait_for_devtools(self, timeout=10):
+        """ Waits for the DevTools HTTP endpoint of the browser to be up.
+
+            Raises
+            ------
+            - `TimeoutError`
+                + If the endpoint is not up after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                requests.get(
+                    f'http://localhost:{self.cdp_port}/json/version',
+                    timeout=1,
+                )
+                return
+            except requests.exceptions.ConnectionError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(
+                        'Could not reach the headless Chrome instance on port '
+                        f'{self.cdp_port} after {timeout} seconds.'
+                    )
+                time.sleep(0.05)
+
     def __enter__(self):
         """
         """
-        if not self.disable_logging:
-            print(
-                'Starting headless Chrome with '
-                f'--remote-debugging-port={self.cdp_port}.'
-            )
+        self.start()
+
+    def __exit__(self, *exc):
+        """
+        """
+        self.stop()
+
+    def start(self):
+        """ Starts the headless browser and waits for it to be reachable.
+        """
+        logger.info(
+            'Starting headless Chrome with --remote-debugging-port=%d.',
+            self.cdp_port,
+        )
 
-        self.flags.append('--remote-allow-origins=*')
+        if '--remote-allow-origins=*' not in self.flags:
+            self.flags.append('--remote-allow-origins=*')
 
         command = [
             f'{self.executable}',
@@ -188,30 +842,65 @@ class ChromeCDP(CDPBrowser):
             *self.flags,
         ]
 
-        # if self.print_command:
-        if True:
+        if self.print_command:
             print(' '.join(command))
+        else:
+            logger.debug('Running %s', command)
 
-        self.proc = subprocess.Popen(command, shell=True)
+        # Chrome's own output
+        output_kwargs = {
+            'stdout': subprocess.DEVNULL,
+            'stderr': subprocess.DEVNULL,
+        } if self.disable_logging else {}
 
-    def __exit__(self, *exc):
-        """
+        if self.resource_limits is None:
+            self.proc = subprocess.Popen(command, **output_kwargs)
+        else:
+            self.proc = self.resource_limits.popen(command, **output_kwargs)
+        self.pages_rendered = 0
+        self._wait_for_devtools()
+
+    def stop(self):
+        """ Closes the headless browser, killing it if it does not exit.
         """
-        if self.disable_logging:
-            print(f'Closing headless Chrome instance on port {self.cdp_port}.')
+        logger.info('Closing headless Chrome instance on port %d.', self.cdp_port)
 
         # check if the process is still running
-        if self.proc.poll() is None:
+        if self.proc is not None and self.proc.poll() is None:
             # ensure that it is properly killed
             try:
+                if self._tabs:
+                    self._tabs.close()
                 self.cdp_send('Browser.close')
-                self.ws.close()
-                print('(TODO) Closed CDP and WebSocket connections properly.')
-            except Exception:
-                print('Could not properly close the CDP and WebSocket connections.')
+                self.connection.close()
+                logger.debug('Closed the CDP and WebSocket connections.')
+            except Exception as e:
+                logger.warning(
+                    'Could not properly close the CDP and WebSocket '
+                    'connections: %s', e,
+                )
             
             try:
                 self.proc.terminate()
-                print('Closed Chrome properly.')
+                # wait for the process, which frees the debugging port
+                self.proc.wait(timeout=10)
+                logger.debug('Closed Chrome properly.')
+            except subprocess.TimeoutExpired:
+                logger.warning('Chrome did not exit in time, killing it.')
+                self.proc.kill()
+                self.proc.wait()
+            except Exception as e:
+                logger.warning('Could not properly kill Chrome: %s', e)
+        elif self._connection:
+            try:
+                self._connection.close()
             except Exception:
-                print('Could not properly kill Chrome.')
+                pass  # the browser is already gone
+
+        if self.proc is not None and self.resource_limits is not None:
+            self.resource_limits.cleanup(self.proc)
+
+        self._tabs = None
+        self._connection = None
+        self._browser_contexts = {}
+        self.proc = None
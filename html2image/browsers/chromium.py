@@ -1,8 +1,12 @@
 from .browser import Browser
+from .timings import RenderTimings, call_timing_hooks
 
+import logging
 import os
 import subprocess
 
+logger = logging.getLogger(__name__)
+
 class ChromiumHeadless(Browser):
     """
         Chrome/Chromium browser wrapper.
@@ -24,6 +28,18 @@ class ChromiumHeadless(Browser):
             + Whether or not to use the new headless mode.
             + By default, the old headless mode is used.
             + You can also keep the original behavior to backward compatibility by setting this to `None`.
+
+        Attributes
+        ----------
+        - `resource_limits` : ResourceLimits or None
+            + Limits applied to each browser process (Linux only),
+            + see `html2image.browsers.limits`.
+        - `timing_hooks` : list of callable
+            + Called with the `RenderTimings` of every screenshot,
+            + see `html2image.browsers.timings`.
+        - `tracer` : Tracer or None
+            + Tracer emitting a span for each phase of the screenshots,
+            + see `html2image.tracing`.
     """
 
     def __init__(self, executable=None, flags=None, print_command=False, disable_logging=False, use_new_headless=None,):
@@ -39,6 +55,9 @@ class ChromiumHeadless(Browser):
         self.print_command = print_command
         self.disable_logging = disable_logging
         self.use_new_headless = use_new_headless
+        self.resource_limits = None
+        self.timing_hooks = []
+        self.tracer = None
 
     def screenshot(
         self,
@@ -46,6 +65,8 @@ class ChromiumHeadless(Browser):
         output_path,
         output_file='screenshot.png',
         size=(1920, 1080),
+        virtual_time_budget=None,
+        browser_context=None,
     ):
         """ Calls Chrome or Chromium headless to take a screenshot.
 
@@ -62,11 +83,31 @@ class ChromiumHeadless(Browser):
                 + Two values representing the window size of the headless
                 + browser and by extention, the screenshot size.
                 + These two values must be greater than 0.
+            - `virtual_time_budget`: int, optional
+                + Amount of virtual time, in milliseconds, the page is
+                + allowed to run before the screenshot is taken.
+                + Timers and animations are fast-forwarded instead of
+                + being waited for in real time.
+            - `browser_context`: str, optional
+                + Ignored: every screenshot already runs in its own
+                + browser process with a temporary profile, so
+                + screenshots never share cookies or storage.
+
+            Returns
+            -------
+            - `RenderTimings`
+                + Durations of the `launch` of the browser process and of
+                + the `render` (navigation, load, capture and write, which
+                + all happen inside of the browser process).
+
             Raises
             ------
             - `ValueError`
                 + If the value of `size` is incorrect.
                 + If `input` is empty.
+                + If `virtual_time_budget` is negative.
+            - `ResourceLimitError`
+                + If `resource_limits` are set and the browser exceeded one.
         """
 
         if not input:
@@ -79,6 +120,12 @@ class ChromiumHeadless(Browser):
                 'A valid size consists of two integers greater than 0.'
             )
 
+        if virtual_time_budget is not None and virtual_time_budget < 0:
+            raise ValueError(
+                'The `virtual_time_budget` parameter should be a positive '
+                f'amount of milliseconds, instead got {virtual_time_budget}.'
+            )
+
         # command used to launch chrome in
         # headless mode and take a screenshot
         headless_mode = '--headless'
@@ -91,13 +138,56 @@ class ChromiumHeadless(Browser):
             f'--screenshot={os.path.join(output_path, output_file)}',
             f'--window-size={size[0]},{size[1]}',
             *self.flags,
-            f'{input}',
         ]
 
+        if virtual_time_budget is not None:
+            command.append(f'--virtual-time-budget={int(virtual_time_budget)}')
+
+        command.append(f'{input}')
+
         if self.print_command:
             print(' '.join(command))
+        else:
+            logger.debug('Running %s', command)
+
+        timings = RenderTimings(output_file, tracer=self.tracer)
+        try:
+            self._run(command, timings)
+            output = os.path.join(output_path, output_file)
+            if os.path.isfile(output):
+                timings.bytes_written = os.path.getsize(output)
+        except Exception as e:
+            timings.error = e
+            raise
+        finally:
+            call_timing_hooks(self.timing_hooks, timings)
+        return timings
+
+    def _run(self, command, timings):
+        """ Runs a screenshot command, timing its phases.
+        """
+        if self.resource_limits is None:
+            popen = subprocess.Popen
+        else:
+            popen = self.resource_limits.popen
+
+        with timings.phase('launch'):
+            proc = popen(command, **self._subprocess_run_kwargs)
 
-        subprocess.run(command, **self._subprocess_run_kwargs)
+        try:
+            with timings.phase('render'):
+                try:
+                    proc.wait()
+                except BaseException:  # e.g. KeyboardInterrupt
+                    proc.kill()
+                    proc.wait()
+                    raise
+            if self.resource_limits is not None:
+                # e.g. raises if a renderer was killed for using too much memory
+                self.resource_limits.check(proc)
+        finally:
+            if self.resource_limits is not None:
+                self.resource_limits.cleanup(proc)
     
     @property
     def disable_logging(self):
@@ -115,9 +205,9 @@ class ChromiumHeadless(Browser):
         } if value else {}
     
     def __enter__(self):
-        print(
-            'Context manager (with ... as:) is',
-            f'not supported for {__class__.__name__}.'
+        logger.info(
+            'Context manager (with ... as:) is not supported for %s.',
+            __class__.__name__,
         )
 
     def __exit__(self, *exc):
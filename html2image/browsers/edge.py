@@ -1,11 +1,14 @@
 from .chromium import ChromiumHeadless
 from .search_utils import get_command_origin, find_first_defined_env_var
 
+import logging
 import subprocess
 import platform
 import os
 import shutil
 
+logger = logging.getLogger(__name__)
+
 ENV_VAR_LOOKUP_TOGGLE = 'HTML2IMAGE_TOGGLE_ENV_VAR_LOOKUP'
 
 EDGE_EXECUTABLE_ENV_VAR_CANDIDATES = [
@@ -48,9 +51,9 @@ def _find_edge(user_given_executable=None):
     )
 
     if path_from_env:
-        print(
-            f'Found a potential edge executable in the {path_from_env} '
-            f'environment variable:\n{path_from_env}\n'
+        logger.info(
+            'Found a potential edge executable in an environment '
+            'variable: %s', path_from_env,
         )
         return path_from_env
 
@@ -0,0 +1,48 @@
+"""
+Errors raised by the browsers of html2image.
+"""
+
+
+class BrowserError(RuntimeError):
+    """
+        Base class of the errors raised when a browser misbehaves.
+    """
+
+
+class BrowserCrashedError(BrowserError):
+    """
+        The browser process, or the connection to it, is gone.
+    """
+
+
+class CDPTimeoutError(BrowserError, TimeoutError):
+    """
+        The browser did not answer a Chrome DevTools Protocol command,
+        or did not send an awaited event, in time.
+    """
+
+
+class ResourceLimitError(BrowserError):
+    """
+        A browser process, or one of its children, exceeded one of the
+        limits of its `ResourceLimits`, and was killed or failed.
+
+        Attributes
+        ----------
+        - `limit` : str
+            + Name of the exceeded limit: `memory`, `processes` or `cpu_time`.
+        - `value`
+            + Value of the exceeded limit.
+    """
+
+    def __init__(self, limit, value):
+        super().__init__(f'The {limit} limit ({value}) of the browser was exceeded.')
+        self.limit = limit
+        self.value = value
+
+
+class ResourceLimitsUnavailableError(BrowserError):
+    """
+        Resource limits were requested but cannot be enforced on this
+        system, e.g. without a writable cgroup v2 sub-tree.
+    """
@@ -0,0 +1,692 @@
+"""
+Fake CDP browser, standing in for Chrome to measure and test the
+orchestration layer of html2image (dispatch, JSON, base64, file I/O,
+tab pooling, retries, scheduling) without a browser.
+
+`FakeCDPServer` speaks the subset of the Chrome DevTools Protocol used
+by `ChromeCDP`: the `/json/version` and `/json/list` HTTP endpoints, and
+the `Target`, `Page`, `Emulation`, `Runtime`, `Storage`, `Tracing`, `IO`
+and `Browser` commands it sends. Screenshots are synthetic PNG images of
+the size of the viewport, answered after configurable latencies, and
+traces hold one event per command received while tracing.
+
+`FakeCDP` is a `ChromeCDP` which runs such a server in the current
+process instead of starting Chrome:
+
+    hti = Html2Image(browser='fake-cdp')
+    hti.browser.load_latency = 0.05
+
+    with hti:
+        hti.screenshot(url='https://www.python.org')
+"""
+
+import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from .chrome_cdp import ChromeCDP
+from .errors import ResourceLimitsUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# RFC 6455, concatenated to Sec-WebSocket-Key to accept a handshake
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+_OPCODE_TEXT = 0x1
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+DEFAULT_VIEWPORT = (1920, 1080)
+
+
+@functools.lru_cache(maxsize=16)
+def synthetic_png(width, height):
+    """ Returns a white PNG image of the given size. """
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+        )
+
+    # each row starts with its filter type (0, none)
+    row = b'\x00' + b'\xff\xff\xff' * width
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(row * height, 1))
+        + chunk(b'IEND', b'')
+    )
+
+
+def _unmask(data, mask):
+    length = len(data)
+    key = (mask * (length // 4 + 1))[:length]
+    return (
+        int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')
+    ).to_bytes(length, 'big')
+
+
+class _CommandError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    if parts.scheme in ('http', 'https') and parts.netloc:
+        return f'{parts.scheme}://{parts.netloc}'
+    return 'null'
+
+
+class _PageState():
+    """ State of the page (or browser) target of a WebSocket connection. """
+
+    def __init__(self):
+        self.url = 'about:blank'
+        self.viewport = DEFAULT_VIEWPORT
+        self.page_enabled = False
+        self.virtual_time_budget = False
+        self.trace_events = None  # while tracing
+
+
+class _FakeCDPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # results and events are written separately, Nagle's algorithm
+    # would delay the events until the results are acknowledged
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self._websocket(path)
+        elif path == '/json/version':
+            self._send_json({
+                'Browser': 'FakeCDP/1.0',
+                'Protocol-Version': '1.3',
+                'webSocketDebuggerUrl': self.server.ws_url('browser', 'fake'),
+            })
+        elif path in ('/json', '/json/list'):
+            with self.server.lock:
+                targets = list(self.server.targets)
+            self._send_json([
+                {'id': target_id, 'type': 'page', 'url': 'about:blank',
+                 'webSocketDebuggerUrl': self.server.ws_url('page', target_id)}
+                for target_id in targets
+            ])
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # WebSocket
+
+    def _websocket(self, path):
+        kind, _, target_id = path[len('/devtools/'):].partition('/')
+        with self.server.lock:
+            known = kind == 'browser' or target_id in self.server.targets
+        if not path.startswith('/devtools/') or not known:
+            self.send_error(404)
+            return
+
+        key = self.headers['Sec-WebSocket-Key']
+        accept = base64.b64encode(
+            hashlib.sha1((key + _WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.close_connection = True
+
+        page = _PageState()
+        self.server.register(self.connection)
+        try:
+            self._serve_cdp(page)
+        except OSError:
+            pass  # the client or crash() closed the connection
+        finally:
+            self.server.unregister(self.connection)
+            if page.trace_events is not None:
+                self.server.end_tracing()  # tracing ends with its session
+
+    def _receive_frame(self):
+        """ Returns (opcode, payload) of the next frame, or None. """
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return None
+
+        opcode = header[0] & 0x0f
+        length = header[1] & 0x7f
+        if length == 126:
+            length, = struct.unpack('>H', self.rfile.read(2))
+        elif length == 127:
+            length, = struct.unpack('>Q', self.rfile.read(8))
+        # frames sent by clients are always masked
+        mask = self.rfile.read(4) if header[1] & 0x80 else None
+        payload = self.rfile.read(length)
+        if mask is not None:
+            payload = _unmask(payload, mask)
+        return opcode, payload
+
+    def _send_frame(self, payload, opcode=_OPCODE_TEXT):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+
+    def _send_message(self, message):
+        self._send_frame(json.dumps(message).encode())
+
+    def _serve_cdp(self, page):
+        while True:
+            frame = self._receive_frame()
+            if frame is None:
+                return
+            opcode, payload = frame
+            if opcode == _OPCODE_CLOSE:
+                self._send_frame(payload[:2], _OPCODE_CLOSE)
+                return
+            if opcode == _OPCODE_PING:
+                self._send_frame(payload, _OPCODE_PONG)
+            elif opcode == _OPCODE_TEXT:
+                if not self._answer(page, json.loads(payload)):
+                    return  # closes the connection, like a crashed renderer
+
+    def _answer(self, page, message):
+        """ Answers a CDP message, returns False if the connection
+            should be closed instead.
+        """
+        method = message['method']
+        self.server.count(method)
+
+        if method == 'Page.navigate' and self.server.take_fault('crash'):
+            return False
+        if method == 'Page.navigate' and self.server.take_fault('hang'):
+            return True  # never answers
+
+        start = time.perf_counter()
+        try:
+            result, events = self._command(page, method, message.get('params', {}))
+        except KeyError as e:
+            error = _CommandError(-32602, f'Invalid parameters: {e}')
+        except _CommandError as e:
+            error = e
+        else:
+            error = None
+
+        if page.trace_events is not None:
+            page.trace_events.append({
+                'name': method, 'cat': 'fake_cdp', 'ph': 'X',
+                'ts': int(start * 1e6),
+                'dur': int((time.perf_counter() - start) * 1e6),
+                'pid': os.getpid(), 'tid': threading.get_ident(),
+            })
+
+        if error is not None:
+            self._send_message({'id': message['id'], 'error': {
+                'code': error.code, 'message': str(error),
+            }})
+            return True
+
+        self._send_message({'id': message['id'], 'result': result})
+        for event, params in events:
+            self._send_message({'method': event, 'params': params})
+        return True
+
+    def _command(self, page, method, params):
+        """ Runs a CDP command on a page.
+
+            Returns
+            -------
+            - (dict, list of (str, dict))
+                + The result of the command, and the events sent after it.
+
+            Raises
+            ------
+            - `_CommandError`
+                + If the command is unknown or fails.
+        """
+        handler = self._COMMANDS.get(method)
+        if handler is None:
+            raise _CommandError(-32601, f"'{method}' wasn't found")
+        return handler(self, page, params)
+
+    def _page_navigate(self, page, params):
+        page.url = params['url']
+        if not page.page_enabled:
+            return {'frameId': 'fake', 'loaderId': 'fake'}, []
+        time.sleep(self.server.load_latency)
+        events = [('Page.loadEventFired', {})]
+        if page.virtual_time_budget:
+            page.virtual_time_budget = False
+            events.append(('Emulation.virtualTimeBudgetExpired', {}))
+        return {'frameId': 'fake', 'loaderId': 'fake'}, events
+
+    def _page_capture_screenshot(self, page, params):
+        # images are always PNG, whatever the format asked for
+        if params.get('format', 'png') not in ('png', 'jpeg', 'webp'):
+            raise _CommandError(-32602, 'Invalid image format')
+        time.sleep(self.server.capture_latency)
+        return {'data': base64.b64encode(
+            synthetic_png(*page.viewport)
+        ).decode()}, []
+
+    def _page_get_layout_metrics(self, page, params):
+        width, height = page.viewport
+        viewport = {
+            'pageX': 0, 'pageY': 0,
+            'clientWidth': width, 'clientHeight': height,
+        }
+        content = {'x': 0, 'y': 0, 'width': width, 'height': height}
+        return {
+            'layoutViewport': viewport, 'cssLayoutViewport': viewport,
+            'contentSize': content, 'cssContentSize': content,
+        }, []
+
+    def _page_enable(self, page, params):
+        page.page_enabled = True
+        return {}, []
+
+    def _page_disable(self, page, params):
+        page.page_enabled = False
+        return {}, []
+
+    def _set_device_metrics_override(self, page, params):
+        page.viewport = (params['width'], params['height'])
+        return {}, []
+
+    def _clear_device_metrics_override(self, page, params):
+        page.viewport = DEFAULT_VIEWPORT
+        return {}, []
+
+    def _set_virtual_time_policy(self, page, params):
+        page.virtual_time_budget = 'budget' in params
+        return {}, []
+
+    def _runtime_evaluate(self, page, params):
+        self.server.expressions.append(params['expression'])
+        if params['expression'] == 'location.origin':
+            return {'result': {'type': 'string', 'value': _origin(page.url)}}, []
+        return {'result': {'type': 'undefined'}}, []
+
+    def _set_cookies(self, page, params):
+        with self.server.lock:
+            self.server.cookies.setdefault(
+                params.get('browserContextId'), [],
+            ).extend(params['cookies'])
+        return {}, []
+
+    def _get_cookies(self, page, params):
+        with self.server.lock:
+            cookies = self.server.cookies.get(params.get('browserContextId'), [])
+            return {'cookies': list(cookies)}, []
+
+    def _clear_cookies(self, page, params):
+        with self.server.lock:
+            self.server.cookies.pop(params.get('browserContextId'), None)
+        return {}, []
+
+    def _create_target(self, page, params):
+        return {'targetId': self.server.create_target(
+            params.get('browserContextId'),
+        )}, []
+
+    def _close_target(self, page, params):
+        return {'success': self.server.close_target(params['targetId'])}, []
+
+    def _create_browser_context(self, page, params):
+        return {'browserContextId': uuid.uuid4().hex.upper()}, []
+
+    def _dispose_browser_context(self, page, params):
+        self.server.dispose_browser_context(params['browserContextId'])
+        return {}, []
+
+    def _browser_get_version(self, page, params):
+        return {
+            'protocolVersion': '1.3', 'product': 'FakeCDP/1.0',
+            'revision': '', 'userAgent': 'FakeCDP/1.0', 'jsVersion': '',
+        }, []
+
+    def _tracing_start(self, page, params):
+        if not self.server.start_tracing():
+            raise _CommandError(
+                -32000, 'Tracing has already been started (possibly in another tab).',
+            )
+        page.trace_events = []
+        return {}, []
+
+    def _tracing_end(self, page, params):
+        if page.trace_events is None:
+            raise _CommandError(-32000, 'Tracing is not started')
+        stream = self.server.open_stream(json.dumps(
+            {'traceEvents': page.trace_events},
+        ).encode())
+        page.trace_events = None
+        self.server.end_tracing()
+        return {}, [('Tracing.tracingComplete', {
+            'dataLossOccurred': False, 'stream': stream,
+        })]
+
+    def _io_read(self, page, params):
+        data, eof = self.server.read_stream(params['handle'], params.get('size'))
+        return {'data': data.decode(), 'eof': eof, 'base64Encoded': False}, []
+
+    def _io_close(self, page, params):
+        self.server.close_stream(params['handle'])
+        return {}, []
+
+    def _no_op(self, page, params):
+        return {}, []
+
+    # handlers of the supported CDP methods
+    _COMMANDS = {
+        'Page.navigate': _page_navigate,
+        'Page.captureScreenshot': _page_capture_screenshot,
+        'Page.getLayoutMetrics': _page_get_layout_metrics,
+        'Page.enable': _page_enable,
+        'Page.disable': _page_disable,
+        'Emulation.setDeviceMetricsOverride': _set_device_metrics_override,
+        'Emulation.clearDeviceMetricsOverride': _clear_device_metrics_override,
+        'Emulation.setVirtualTimePolicy': _set_virtual_time_policy,
+        'Runtime.evaluate': _runtime_evaluate,
+        'Storage.setCookies': _set_cookies,
+        'Storage.getCookies': _get_cookies,
+        'Storage.clearCookies': _clear_cookies,
+        'Storage.clearDataForOrigin': _no_op,
+        'Target.createTarget': _create_target,
+        'Target.closeTarget': _close_target,
+        'Target.createBrowserContext': _create_browser_context,
+        'Target.disposeBrowserContext': _dispose_browser_context,
+        'Browser.getVersion': _browser_get_version,
+        'Browser.close': _no_op,
+        'Tracing.start': _tracing_start,
+        'Tracing.end': _tracing_end,
+        'IO.read': _io_read,
+        'IO.close': _io_close,
+    }
+
+
+class FakeCDPServer(ThreadingHTTPServer):
+    """
+        Local server speaking the subset of the Chrome DevTools Protocol
+        used by `ChromeCDP`, answering screenshots with synthetic images.
+        Started with `start()`, and stopped with `stop()` or `crash()`.
+
+        Parameters
+        ----------
+        - `port` : int, optional
+            + Port on which the server listens, default is a free port.
+        - `host` : str, optional
+        - `load_latency` : float, optional
+            + Number of seconds between a navigation and its load event.
+        - `capture_latency` : float, optional
+            + Number of seconds taken by each `Page.captureScreenshot`.
+
+        Attributes
+        ----------
+        - `command_counts` : dict
+            + Number of commands received, by method.
+        - `expressions` : list of str
+            + Expressions of the `Runtime.evaluate` commands received,
+            + e.g. the updates of templates.
+        - `crash_next_navigations` : int
+            + Number of the next `Page.navigate` commands which close
+            + their connection instead of answering, like a crashed tab.
+        - `hang_next_navigations` : int
+            + Number of the next `Page.navigate` commands which are never
+            + answered, like a hung tab.
+        - `returncode` : int or None
+            + None while the server runs, 0 once stopped, and -9 once
+            + crashed, like the return code of a browser process.
+    """
+
+    def __init__(self, port=0, host='localhost', load_latency=0,
+                 capture_latency=0):
+        super().__init__((host, port), _FakeCDPHandler)
+        self.load_latency = load_latency
+        self.capture_latency = capture_latency
+        self.command_counts = {}
+        self.expressions = []
+        self.crash_next_navigations = 0
+        self.hang_next_navigations = 0
+        self.returncode = None
+        self.targets = {}  # target ids and their browser context ids
+        self.cookies = {}  # browser context ids and their cookies
+        self.tracing = False  # Chrome records one trace at a time
+        self.streams = {}  # handles of the IO streams and their data
+        self.lock = threading.Lock()
+        self._connections = set()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def ws_url(self, kind, target_id):
+        return f'ws://localhost:{self.port}/devtools/{kind}/{target_id}'
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, returncode=0):
+        """ Stops the server and closes every open connection. """
+        if self.returncode is not None:
+            return
+        self.returncode = returncode
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+        with self.lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def crash(self):
+        """ Stops the server abruptly, like a crashed browser. """
+        self.stop(returncode=-9)  # SIGKILL
+
+    def count(self, method):
+        with self.lock:
+            self.command_counts[method] = self.command_counts.get(method, 0) + 1
+
+    def take_fault(self, kind):
+        """ Returns whether the next navigation should `crash` or `hang`,
+            counting it down.
+        """
+        attribute = f'{kind}_next_navigations'
+        with self.lock:
+            if getattr(self, attribute) > 0:
+                setattr(self, attribute, getattr(self, attribute) - 1)
+                return True
+        return False
+
+    def start_tracing(self):
+        with self.lock:
+            if self.tracing:
+                return False
+            self.tracing = True
+            return True
+
+    def end_tracing(self):
+        with self.lock:
+            self.tracing = False
+
+    def open_stream(self, data):
+        handle = uuid.uuid4().hex
+        with self.lock:
+            self.streams[handle] = data
+        return handle
+
+    def read_stream(self, handle, size=None):
+        """ Returns the next bytes of a stream, and whether it is over. """
+        with self.lock:
+            if handle not in self.streams:
+                raise _CommandError(-32000, f'Invalid stream handle {handle}')
+            data = self.streams[handle]
+            size = len(data) if size is None else size
+            self.streams[handle] = data[size:]
+            return data[:size], len(data) <= size
+
+    def close_stream(self, handle):
+        with self.lock:
+            self.streams.pop(handle, None)
+
+    def register(self, connection):
+        with self.lock:
+            self._connections.add(connection)
+
+    def unregister(self, connection):
+        with self.lock:
+            self._connections.discard(connection)
+
+    def create_target(self, browser_context_id=None):
+        target_id = uuid.uuid4().hex.upper()
+        with self.lock:
+            self.targets[target_id] = browser_context_id
+        return target_id
+
+    def close_target(self, target_id):
+        with self.lock:
+            return self.targets.pop(target_id, False) is not False
+
+    def dispose_browser_context(self, browser_context_id):
+        with self.lock:
+            self.cookies.pop(browser_context_id, None)
+            self.targets = {
+                target_id: context_id
+                for target_id, context_id in self.targets.items()
+                if context_id != browser_context_id
+            }
+
+
+class _FakeProcess():
+    """ Stands for the browser process of a `FakeCDP`, with the subset of
+        the `subprocess.Popen` interface used by `ChromeCDP`.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.pid = os.getpid()
+
+    @property
+    def returncode(self):
+        return self.server.returncode
+
+    def poll(self):
+        return self.server.returncode
+
+    def terminate(self):
+        self.server.stop()
+
+    def kill(self):
+        self.server.crash()
+
+    def wait(self, timeout=None):
+        return self.server.returncode
+
+
+class FakeCDP(ChromeCDP):
+    """
+        `ChromeCDP` browser taking its screenshots from a `FakeCDPServer`
+        run in the current process, instead of starting Chrome. Measures
+        the overhead of html2image itself, and runs on hosts without a
+        browser.
+
+        Accepts the parameters of `ChromeCDP`, the executable and flags
+        being ignored, and:
+
+        Parameters
+        ----------
+        - `cdp_port` : int, optional
+            + Port of the fake server, default is a free port.
+        - `load_latency` : float, optional
+            + Number of seconds between a navigation and its load event.
+        - `capture_latency` : float, optional
+            + Number of seconds taken by each screenshot capture.
+
+        Attributes
+        ----------
+        - `server` : FakeCDPServer or None
+            + Server of the running fake browser, e.g. to inject faults
+            + (`crash_next_navigations`, `crash()`...) or to read the
+            + `command_counts`.
+    """
+
+    def __init__(self, executable=None, flags=None, print_command=False,
+                 cdp_port=0, disable_logging=False, load_latency=0,
+                 capture_latency=0, **kwargs):
+        super().__init__(
+            executable=executable, flags=flags, print_command=print_command,
+            cdp_port=cdp_port, disable_logging=disable_logging, **kwargs
+        )
+        self.load_latency = load_latency
+        self.capture_latency = capture_latency
+        self.server = None
+
+    @property
+    def executable(self):
+        return self._executable
+
+    @executable.setter
+    def executable(self, value):
+        self._executable = value  # no browser is needed
+
+    def start(self):
+        """ Starts the fake server, on a free port if `cdp_port` is 0.
+        """
+        if self.resource_limits is not None:
+            raise ResourceLimitsUnavailableError(
+                'The fake CDP browser does not start processes to limit.'
+            )
+
+        self.server = FakeCDPServer(
+            port=self.cdp_port,
+            load_latency=self.load_latency,
+            capture_latency=self.capture_latency,
+        ).start()
+        self.cdp_port = self.server.port
+        logger.info('Started a fake CDP browser on port %d.', self.cdp_port)
+
+        self.proc = _FakeProcess(self.server)
+        self.pages_rendered = 0
+
+    def memory_usage(self):
+        return None  # no browser process
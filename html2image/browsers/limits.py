@@ -0,0 +1,308 @@
+"""
+Resource limits of browser processes (Linux only).
+
+Memory, CPU and process count limits apply to a browser and all of its
+child processes (renderers, GPU process...), through a cgroup v2 created
+for each browser process. CPU time is limited per process, through
+`RLIMIT_CPU`.
+
+cgroups can only be created where the current user was delegated a
+cgroup v2 sub-tree, e.g. in a systemd unit with `Delegate=yes`, or in a
+container with a private cgroup namespace. cgroup v2 only enables
+controllers (e.g. `memory`) for the children of cgroups without processes:
+by default, the current process is first moved to a leaf of its own
+cgroup, which only works if no other process lives in that cgroup, e.g.
+in a container running Python as its only process. Otherwise, give an
+empty delegated cgroup as `cgroup_parent`.
+"""
+
+import os
+import signal
+import subprocess
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .errors import ResourceLimitError, ResourceLimitsUnavailableError
+
+CGROUP_MOUNT = '/sys/fs/cgroup'
+
+# leaf cgroup to which the current process moves out of its own cgroup
+LEAF_CGROUP = 'html2image-main'
+
+# moves the shell into the cgroup, waits for the rlimits to be set
+# by the parent, then becomes the browser: every process the browser
+# starts is hence created under the limits
+_WRAPPER_SCRIPT = (
+    'if [ -n "$0" ]; then echo $$ > "$0" || exit 125; fi; '
+    'read _ignored; exec "$@"'
+)
+
+
+def current_cgroup():
+    """ Returns the path of the cgroup v2 of the current process, or None
+        if cgroup v2 is not available.
+    """
+    try:
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    path = os.path.join(CGROUP_MOUNT, line[3:].strip().lstrip('/'))
+                    if os.path.exists(os.path.join(path, 'cgroup.controllers')):
+                        return path
+                    return None
+    except OSError:
+        pass
+    return None
+
+
+class ResourceLimits():
+    """
+        Limits the resources used by browser processes.
+
+        Parameters
+        ----------
+        - `memory` : int, optional
+            + Maximum memory, in bytes, of a browser and its children.
+            + Processes are killed by the kernel beyond this limit.
+        - `cpu` : float, optional
+            + Maximum number of CPUs used by a browser and its children,
+            + e.g. 0.5 for half of a CPU. Processes are throttled beyond.
+        - `processes` : int, optional
+            + Maximum number of processes and threads of a browser and
+            + its children. Process creation fails beyond this limit.
+        - `cpu_time` : int, optional
+            + Maximum CPU time, in seconds, of each process. Processes are
+            + killed beyond this limit. Better suited to browsers taking a
+            + single screenshot than to long-lived CDP browsers.
+        - `cgroup_parent` : str, optional
+            + Writable cgroup v2 directory without processes, in which a
+            + cgroup is created for each browser process. Default is the
+            + cgroup of the current process, once the current process is
+            + moved to a leaf of it, see the module documentation.
+
+        Raises
+        ------
+        - `ResourceLimitsUnavailableError`
+            + When starting a process, if the limits cannot be enforced
+            + on this system.
+    """
+
+    def __init__(self, memory=None, cpu=None, processes=None, cpu_time=None,
+                 cgroup_parent=None):
+        self.memory = memory
+        self.cpu = cpu
+        self.processes = processes
+        self.cpu_time = cpu_time
+        self.cgroup_parent = cgroup_parent
+
+    @property
+    def needs_cgroup(self):
+        return any(
+            limit is not None
+            for limit in (self.memory, self.cpu, self.processes)
+        )
+
+    def popen(self, command, **kwargs):
+        """ Starts a process under the limits, see `subprocess.Popen`.
+
+            The returned process has a `cgroup` attribute, the path of its
+            cgroup or None, which should be given back to `cleanup()` once
+            the process has exited.
+        """
+        if os.name != 'posix' or (self.cpu_time is not None and (
+            resource is None or not hasattr(resource, 'prlimit')
+        )):
+            raise ResourceLimitsUnavailableError(
+                'Resource limits are only supported on Linux.'
+            )
+
+        cgroup = self._create_cgroup() if self.needs_cgroup else None
+
+        kwargs['stdin'] = subprocess.PIPE
+        try:
+            proc = subprocess.Popen(
+                [
+                    '/bin/sh', '-c', _WRAPPER_SCRIPT,
+                    os.path.join(cgroup, 'cgroup.procs') if cgroup else '',
+                    *command,
+                ],
+                **kwargs,
+            )
+        except Exception:
+            self._remove_cgroup(cgroup)
+            raise
+
+        proc.cgroup = cgroup
+        proc.limit_events = {}
+        try:
+            if self.cpu_time is not None:
+                # SIGXCPU at the soft limit, SIGKILL a second later
+                resource.prlimit(
+                    proc.pid, resource.RLIMIT_CPU,
+                    (self.cpu_time, self.cpu_time + 1),
+                )
+            proc.stdin.write(b'\n')  # lets the wrapper exec the browser
+            proc.stdin.close()
+        except Exception as e:
+            proc.kill()
+            proc.wait()
+            self.cleanup(proc)
+            raise ResourceLimitsUnavailableError(
+                f'Could not apply the resource limits: {e}'
+            )
+
+        return proc
+
+    def exceeded(self, proc):
+        """ Returns which limit was exceeded by a process or its children
+            since the previous call, or None.
+
+            Returns
+            -------
+            - str or None
+                + `memory`, `processes` or `cpu_time`.
+        """
+        if proc.cgroup is not None:
+            for name, file_name, key in (
+                ('memory', 'memory.events', 'oom_kill'),
+                ('processes', 'pids.events', 'max'),
+            ):
+                count = self._read_event(proc.cgroup, file_name, key)
+                if count > proc.limit_events.get(name, 0):
+                    proc.limit_events[name] = count
+                    return name
+
+        if self.cpu_time is not None and proc.poll() == -signal.SIGXCPU:
+            return 'cpu_time'
+
+        return None
+
+    def check(self, proc):
+        """ Raises `ResourceLimitError` if a limit was exceeded by a process
+            or its children since the previous check.
+        """
+        limit = self.exceeded(proc)
+        if limit is not None:
+            raise ResourceLimitError(limit, getattr(self, limit))
+
+    def cleanup(self, proc):
+        """ Removes the cgroup of a process that has exited, killing
+            its remaining children (e.g. orphaned renderers) if needed.
+        """
+        if proc.cgroup is not None and os.path.exists(
+            os.path.join(proc.cgroup, 'cgroup.kill')  # Linux 5.14+
+        ):
+            try:
+                self._write(proc.cgroup, 'cgroup.kill', 1)
+            except OSError:
+                pass
+        self._remove_cgroup(proc.cgroup)
+        proc.cgroup = None
+
+    def _create_cgroup(self):
+        parent = self.cgroup_parent or current_cgroup()
+        if self.cgroup_parent is None and parent is not None and (
+            os.path.basename(parent) == LEAF_CGROUP
+        ):
+            parent = os.path.dirname(parent)  # moved there by a previous call
+        if parent is None:
+            raise ResourceLimitsUnavailableError(
+                'Memory, CPU and process limits require cgroup v2.'
+            )
+
+        controllers = []
+        if self.memory is not None:
+            controllers.append('memory')
+        if self.cpu is not None:
+            controllers.append('cpu')
+        if self.processes is not None:
+            controllers.append('pids')
+
+        cgroup = os.path.join(parent, f'html2image-{uuid.uuid4().hex[:12]}')
+        try:
+            subtree_control = os.path.join(parent, 'cgroup.subtree_control')
+            with open(subtree_control) as f:
+                enabled = f.read().split()
+            missing = [name for name in controllers if name not in enabled]
+            if missing:
+                if self.cgroup_parent is None:
+                    self._leave_cgroup(parent)
+                with open(subtree_control, 'w') as f:
+                    f.write(' '.join(f'+{name}' for name in missing))
+
+            os.mkdir(cgroup)
+
+            if self.memory is not None:
+                self._write(cgroup, 'memory.max', int(self.memory))
+                if os.path.exists(os.path.join(cgroup, 'memory.swap.max')):
+                    self._write(cgroup, 'memory.swap.max', 0)
+            if self.cpu is not None:
+                period = 100000
+                self._write(cgroup, 'cpu.max', f'{int(self.cpu * period)} {period}')
+            if self.processes is not None:
+                self._write(cgroup, 'pids.max', int(self.processes))
+        except OSError as e:
+            self._remove_cgroup(cgroup)
+            raise ResourceLimitsUnavailableError(
+                f'Could not create a cgroup in {parent}: {e}. A delegated '
+                'cgroup v2 sub-tree without processes is required, see '
+                '`cgroup_parent`.'
+            )
+
+        return cgroup
+
+    @staticmethod
+    def _leave_cgroup(cgroup):
+        """ Moves the current process from its cgroup to a leaf of it, so
+            that controllers can be enabled for the children of its cgroup.
+
+            Raises
+            ------
+            - `ResourceLimitsUnavailableError`
+                + If other processes live in the cgroup.
+        """
+        with open(os.path.join(cgroup, 'cgroup.procs')) as f:
+            pids = [int(pid) for pid in f.read().split()]
+
+        others = [pid for pid in pids if pid != os.getpid()]
+        if others:
+            raise ResourceLimitsUnavailableError(
+                f'The cgroup {cgroup} of the current process holds '
+                f'{len(others)} other process(es), so that no limit can be '
+                'enabled for its children. Give an empty delegated cgroup v2 '
+                'directory as `cgroup_parent`.'
+            )
+
+        if pids:
+            leaf = os.path.join(cgroup, LEAF_CGROUP)
+            os.makedirs(leaf, exist_ok=True)
+            ResourceLimits._write(leaf, 'cgroup.procs', os.getpid())
+
+    @staticmethod
+    def _write(cgroup, file_name, value):
+        with open(os.path.join(cgroup, file_name), 'w') as f:
+            f.write(str(value))
+
+    @staticmethod
+    def _read_event(cgroup, file_name, key):
+        try:
+            with open(os.path.join(cgroup, file_name)) as f:
+                for line in f:
+                    name, value = line.split()
+                    if name == key:
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    @staticmethod
+    def _remove_cgroup(cgroup):
+        if cgroup is not None and os.path.isdir(cgroup):
+            try:
+                os.rmdir(cgroup)
+            except OSError:
+                pass  # processes are still running in it
@@ -0,0 +1,69 @@
+"""
+Inspection of browser process trees, through `/proc` (Linux only).
+"""
+
+import os
+
+
+def process_tree_pids(root_pid):
+    """ Returns the pids of a process and of all of its descendants.
+
+    Parameters
+    ----------
+    - `root_pid`: int
+
+    Returns
+    -------
+    - list of int or None
+        + None if `/proc` is not available.
+    """
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the process name (2nd field) may contain spaces and
+                # parentheses, the parent pid is the 2nd field after it
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # the process exited in the meantime
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids = [root_pid]
+    for pid in pids:  # grows while iterating: breadth-first traversal
+        pids.extend(children.get(pid, []))
+    return pids
+
+
+def process_tree_rss(root_pid):
+    """ Returns the resident memory (RSS) of a process and of all of its
+        descendants, e.g. of a browser and its renderer processes.
+
+    Parameters
+    ----------
+    - `root_pid`: int
+
+    Returns
+    -------
+    - int or None
+        + Number of bytes, or None if `/proc` is not available.
+    """
+    pids = process_tree_pids(root_pid)
+    if pids is None:
+        return None
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    rss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                rss += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss
@@ -1,3 +1,4 @@
+import logging
 import os
 import platform
 import shutil
@@ -10,6 +11,8 @@ except ImportError:
     # os is not Windows, and there is no need for winreg
     pass
 
+logger = logging.getLogger(__name__)
+
 ENV_VAR_LOOKUP_TOGGLE = 'HTML2IMAGE_TOGGLE_ENV_VAR_LOOKUP'
 
 CHROME_EXECUTABLE_ENV_VAR_CANDIDATES = [
@@ -147,9 +150,9 @@ def find_chrome(user_given_executable=None):
     )
 
     if path_from_env:
-        print(
-            f'Found a potential chrome executable in the {path_from_env} '
-            f'environment variable:\n{path_from_env}\n'
+        logger.info(
+            'Found a potential chrome executable in an environment '
+            'variable: %s', path_from_env,
         )
         return path_from_env
 
@@ -293,9 +296,9 @@ def find_firefox(user_given_executable=None):
     )
 
     if path_from_env:
-        print(
-            f'Found a potential Firefox executable in the {path_from_env} '
-            f'environment variable:\n{path_from_env}\n'
+        logger.info(
+            'Found a potential Firefox executable in an environment '
+            'variable: %s', path_from_env,
         )
         return path_from_env
 
@@ -313,9 +316,10 @@ def find_firefox(user_given_executable=None):
             if 'Mozilla Firefox' in version_output:
                 return user_given_executable
             else:
-                print(
-                    'Could not validate Firefox executable',
-                    '(--version does not contains "Mozilla Firefox").'
+                logger.warning(
+                    'Could not validate the Firefox executable %s '
+                    '(--version does not contain "Mozilla Firefox").',
+                    user_given_executable,
                 )
         except Exception:
             pass
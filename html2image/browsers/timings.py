@@ -0,0 +1,104 @@
+"""
+Per-phase timings of the renders of html2image browsers.
+
+Each screenshot taken by a browser records how long each of its phases
+took (e.g. launching the browser, navigating, waiting for the page to
+load, capturing, decoding and writing the image) in a `RenderTimings`,
+which is returned by the `screenshot()` method of the browser and given
+to the hooks registered in its `timing_hooks` list. With a `tracer`,
+each phase is also a span, see `html2image.tracing`.
+"""
+
+import time
+
+from contextlib import contextmanager
+
+from html2image.tracing import span
+
+
+class RenderTimings():
+    """
+        Durations of the phases of one render, measured with the
+        monotonic `time.perf_counter()` clock.
+
+        Attributes
+        ----------
+        - `output_file` : str
+            + Name of the image being rendered.
+        - `phases` : dict
+            + Number of seconds spent in each phase, in the order in which
+            + the phases first ran. The durations of a phase run several
+            + times (e.g. when a screenshot is retried) are added up.
+        - `attempts` : int
+            + Number of times the render was attempted.
+        - `bytes_written` : int
+            + Size of the image(s) written.
+        - `images` : dict
+            + Description of each image written, by path, for browsers
+            + holding the images in memory (see
+            + `html2image.results.describe_image()`).
+        - `error` : Exception or None
+            + Error which made the render fail, if any.
+        - `trace_file` : str or None
+            + Path of the Chrome trace of the render, if it was traced
+            + (see `html2image.browsers.trace_capture`).
+        - `tracer` : Tracer or None
+            + Tracer emitting a span for each phase.
+    """
+
+    def __init__(self, output_file=None, tracer=None):
+        self.output_file = output_file
+        self.tracer = tracer
+        self.phases = {}
+        self.attempts = 1
+        self.bytes_written = 0
+        self.images = {}
+        self.error = None
+        self.trace_file = None
+
+    @property
+    def total(self):
+        """ Number of seconds spent in all of the phases. """
+        return sum(self.phases.values())
+
+    @contextmanager
+    def phase(self, name):
+        """ Context manager timing a phase, even if it fails.
+        """
+        start = time.perf_counter()
+        try:
+            with span(self.tracer, f'html2image.{name}'):
+                yield
+        finally:
+            self.phases[name] = (
+                self.phases.get(name, 0) + time.perf_counter() - start
+            )
+
+    def as_dict(self):
+        """ Returns the timings as a JSON serializable dict. """
+        return {
+            'output_file': self.output_file,
+            'phases': dict(self.phases),
+            'total': self.total,
+            'attempts': self.attempts,
+            'bytes_written': self.bytes_written,
+            'error': None if self.error is None else repr(self.error),
+            'trace_file': self.trace_file,
+        }
+
+    def __repr__(self):
+        phases = ', '.join(
+            f'{name}={seconds:.3f}s' for name, seconds in self.phases.items()
+        )
+        return f'RenderTimings({self.output_file!r}, {phases})'
+
+
+def call_timing_hooks(hooks, timings):
+    """ Calls each hook with the timings of a finished render. Errors
+        raised by hooks are ignored, so that they never fail a render.
+    """
+    for hook in hooks:
+        try:
+            hook(timings)
+        except Exception:
+            pass
@@ -0,0 +1,183 @@
+"""
+Chrome performance traces of sampled screenshots (CDP browsers only).
+
+With a `TraceCapture` in the `trace_capture` attribute of a CDP browser,
+a sample of the screenshots is recorded with the `Tracing` domain of the
+DevTools Protocol, and each trace is streamed to a JSON file next to its
+image (`page.png` is traced in `page.trace.json`), which can be opened
+in the Performance panel of Chrome DevTools or in https://ui.perfetto.dev.
+
+Chrome records one trace at a time: a screenshot sampled while another
+one is being traced is not traced. Traces are a diagnostic: failing to
+record or write one never fails the screenshot.
+"""
+
+import base64
+import logging
+import os
+import random
+import threading
+
+from contextlib import contextmanager
+
+from .errors import BrowserCrashedError, CDPTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# categories of the Performance panel of Chrome DevTools, without the
+# costly JavaScript sampling profiler
+DEFAULT_CATEGORIES = (
+    'devtools.timeline',
+    'disabled-by-default-devtools.timeline',
+    'disabled-by-default-devtools.timeline.frame',
+    'blink.user_timing',
+    'loading',
+    'latencyInfo',
+    'v8.execute',
+)
+
+# size of the chunks of the trace stream read at once
+READ_SIZE = 1024 * 1024
+
+
+def trace_file_name(output_file):
+    """ Returns the name of the trace of an image, e.g. `page.trace.json`
+        for `page.png`.
+    """
+    return os.path.splitext(output_file)[0] + '.trace.json'
+
+
+class TraceCapture():
+    """
+        Records Chrome performance traces of a sample of the screenshots.
+
+        Parameters
+        ----------
+        - `rate` : float, optional
+            + Probability of each screenshot to be traced, from 0 (none)
+            + to 1 (all of them, one at a time). Low rates, e.g. 0.01,
+            + can stay enabled in production.
+        - `categories` : iterable of str, optional
+            + Trace categories to record, default is `DEFAULT_CATEGORIES`.
+
+        Attributes
+        ----------
+        - `traces_written` : int
+            + Number of traces written.
+        - `skipped` : int
+            + Number of sampled screenshots which were not traced, as
+            + another trace was being recorded.
+        - `failed` : int
+            + Number of traces which could not be recorded or written.
+
+        Raises
+        ------
+        - `ValueError`
+            + If `rate` is not between 0 and 1.
+    """
+
+    def __init__(self, rate=1.0, categories=DEFAULT_CATEGORIES):
+        if not 0 <= rate <= 1:
+            raise ValueError('`rate` should be between 0 and 1.')
+
+        self.rate = rate
+        self.categories = list(categories)
+        self.traces_written = 0
+        self.skipped = 0
+        self.failed = 0
+        self._lock = threading.Lock()  # held while a trace is recorded
+        self._random = random.Random()
+
+    def sampled(self):
+        """ Returns whether the next screenshot should be traced. """
+        return self.rate > 0 and self._random.random() < self.rate
+
+    @contextmanager
+    def record(self, tab, path, timings=None):
+        """ Context manager recording a trace of the commands run on a
+            tab within the `with` block, if the block is sampled, and
+            writing it to `path`.
+
+            Parameters
+            ----------
+            - `tab` : CDPTab
+            - `path` : str
+            - `timings` : RenderTimings, optional
+                + Timings in which the `trace` phase (writing the trace)
+                + is recorded, and whose `trace_file` is set to `path`
+                + once the trace is written.
+        """
+        if not self.sampled():
+            yield
+            return
+
+        if not self._lock.acquire(blocking=False):
+            self.skipped += 1
+            yield
+            return
+
+        try:
+            try:
+                tab.call(
+                    'Tracing.start',
+                    traceConfig={
+                        'includedCategories': self.categories,
+                        'recordMode': 'recordUntilFull',
+                    },
+                    transferMode='ReturnAsStream',
+                    streamFormat='json',
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.warning('Could not start a Chrome trace: %s', e)
+                yield
+                return
+
+            try:
+                yield
+            except (BrowserCrashedError, CDPTimeoutError):
+                self.failed += 1  # the tab is gone or hung, so is its trace
+                raise
+            except BaseException:
+                self._finish(tab, path, timings)  # e.g. a script error
+                raise
+            self._finish(tab, path, timings)
+        finally:
+            self._lock.release()
+
+    def _finish(self, tab, path, timings):
+        try:
+            if timings is None:
+                self._write(tab, path)
+            else:
+                with timings.phase('trace'):
+                    self._write(tab, path)
+                timings.trace_file = path
+            self.traces_written += 1
+            logger.debug('Wrote the Chrome trace %s', path)
+        except Exception as e:
+            self.failed += 1
+            logger.warning('Could not write the Chrome trace %s: %s', path, e)
+
+    @staticmethod
+    def _write(tab, path):
+        """ Ends the trace of a tab, and streams it to a file. """
+        # the event may be received before the response to Tracing.end
+        tab.send('Tracing.end')
+        stream = tab.wait_for_events(
+            'Tracing.tracingComplete',
+        )['Tracing.tracingComplete']['stream']
+
+        try:
+            with open(path, 'wb') as f:
+                while True:
+                    chunk = tab.call('IO.read', handle=stream, size=READ_SIZE)
+                    data = chunk.get('data', '')
+                    f.write(
+                        base64.b64decode(data) if chunk.get('base64Encoded')
+                        else data.encode()
+                    )
+                    if chunk.get('eof'):
+                        break
+        finally:
+            tab.call('IO.close', handle=stream)
@@ -2,8 +2,20 @@
 """
 
 import argparse
+import contextlib
+import json
 import os
-from html2image import Html2Image
+import sys
+from html2image import Html2Image, daemon
+from html2image.batch import read_jobs, run_batch
+from html2image.bench import SCENARIOS, compare, format_results, run_benchmarks
+from html2image.browsers.browser import CDPBrowser
+from html2image.browsers.limits import ResourceLimits
+from html2image.browsers.trace_capture import DEFAULT_CATEGORIES, TraceCapture
+from html2image.distributed import (
+    TOKEN_ENV_VAR, Coordinator, Worker, screenshot_renderer,
+)
+from html2image.server import serve
 
 
 def size_type(string):
@@ -22,13 +34,30 @@ def size_type(string):
         raise argparse.ArgumentTypeError(f"Invalid size format '{string}': {e}")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Generate images from HTML/CSS or URLs using the html2image library.',
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter
-    )
+def concurrency_list_type(string):
+    try:
+        levels = [int(level) for level in string.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Concurrency levels should be N[,N...] (e.g., 1,2,4), instead got '{string}'"
+        )
+    if any(level < 1 for level in levels):
+        raise argparse.ArgumentTypeError('Concurrency levels must be positive integers.')
+    return levels
 
-    # Html2Image instantiation arguments
+
+def address_type(string):
+    host, _, port = string.rpartition(':')
+    try:
+        return host or '127.0.0.1', int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Address should be HOST:PORT (e.g., 127.0.0.1:9300), instead got '{string}'"
+        )
+
+
+def add_instance_arguments(parser, default_browser='chrome'):
+    """ Adds the arguments used to configure an Html2Image instance. """
     group_hti_init = parser.add_argument_group('Html2Image Instance Configuration')
     group_hti_init.add_argument(
         '--output-path', '-o',
@@ -39,11 +68,11 @@ def main():
     # TODO : this list is duplicated from browser_map in html2image.py
     browser_choices = [
         'chrome', 'chromium', 'google-chrome', 'google-chrome-stable',
-        'googlechrome', 'edge', 'chrome-cdp', 'chromium-cdp'
+        'googlechrome', 'edge', 'chrome-cdp', 'chromium-cdp', 'fake-cdp'
     ]
     group_hti_init.add_argument(
         '--browser',
-        default='chrome',
+        default=default_browser,
         choices=browser_choices,
         help='Browser to use for screenshots.'
     )
@@ -72,9 +101,492 @@ def main():
         '--custom-flags',
         nargs='*', 
         default=[],  # If not provided, defaults are used
-        help="Custom flags to pass to the browser (e.g., '--no-sandbox' '--disable-gpu'). If provided, these flags will be used."
+        help="Custom flags to pass to the browser (e.g., '--no-sandbox' '--disable-gpu'). If provided, these flags "
+             "will be used."
+    )
+    group_hti_init.add_argument(
+        '--memory-limit',
+        type=int, default=None,
+        metavar='MB',
+        help='Maximum memory of each browser and its child processes (Linux with cgroup v2 only).'
+    )
+    group_hti_init.add_argument(
+        '--cpu-limit',
+        type=float, default=None,
+        metavar='CPUS',
+        help='Maximum number of CPUs used by each browser and its child processes, e.g. 0.5 (Linux with cgroup v2 only).'
+    )
+    group_hti_init.add_argument(
+        '--process-limit',
+        type=int, default=None,
+        metavar='N',
+        help='Maximum number of processes and threads of each browser and its child processes (Linux with cgroup v2 only).'
+    )
+    group_hti_init.add_argument(
+        '--trace-rate',
+        type=float, default=None,
+        metavar='RATE',
+        help='Record a Chrome performance trace of this fraction of the screenshots (e.g. 0.01), next to their '
+             'images as NAME.trace.json (CDP browsers only).'
+    )
+    group_hti_init.add_argument(
+        '--trace-categories',
+        default=','.join(DEFAULT_CATEGORIES),
+        metavar='CATEGORIES',
+        help='Comma-separated Chrome trace categories recorded with --trace-rate.'
+    )
+    return group_hti_init
+
+
+def instance_kwargs(args):
+    """ Returns the Html2Image() keyword arguments matching parsed arguments.
+    """
+    hti_kwargs = {
+        'output_path': args.output_path,
+        'browser': args.browser,
+        'browser_executable': args.browser_executable,
+        'custom_flags': [cf.replace("'", '') for cf in args.custom_flags],
+        'disable_logging': args.quiet,
+        'temp_path': args.temp_path,
+        'keep_temp_files': args.keep_temp_files,
+    }
+
+    if args.memory_limit or args.cpu_limit or args.process_limit:
+        hti_kwargs['resource_limits'] = ResourceLimits(
+            memory=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+            cpu=args.cpu_limit,
+            processes=args.process_limit,
+        )
+
+    if args.trace_rate:
+        hti_kwargs['trace_capture'] = TraceCapture(
+            rate=args.trace_rate,
+            categories=[
+                category.strip() for category in args.trace_categories.split(',')
+                if category.strip()
+            ],
+        )
+
+    # Only pass cdp_port if a CDP browser is likely selected and port is given
+    if args.cdp_port and 'cdp' in args.browser.lower():
+        hti_kwargs['browser_cdp_port'] = args.cdp_port
+    elif args.cdp_port:
+        print(
+            f"Warning: --cdp-port ({args.cdp_port}) was specified, but the selected browser ('{args.browser}') "
+            "might not be a CDP browser."
+        )
+
+    # Filter out None values so defaults are used for those specific kwargs
+    # keep_temp_files and disable_logging are bools, always pass them.
+    # custom_flags should be passed even if None, so Html2Image can use its defaults or an empty list.
+    return {
+        k: v for k, v in hti_kwargs.items()
+        if v is not None or k in ['keep_temp_files', 'disable_logging', 'custom_flags']
+    }
+
+
+def serve_main(argv):
+    """ Entry point of the `html2image serve` command. """
+    parser = argparse.ArgumentParser(
+        prog='html2image serve',
+        description='Serve screenshots over HTTP with warm browsers.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    add_instance_arguments(parser, default_browser='chrome-cdp')
+
+    group_server = parser.add_argument_group('Server Options')
+    group_server.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address on which the server listens.'
+    )
+    group_server.add_argument(
+        '--port', '-p',
+        type=int, default=8000,
+        help='Port on which the server listens.'
+    )
+    group_server.add_argument(
+        '--concurrency', '-c',
+        type=int, default=4,
+        help='Maximum number of screenshots taken at the same time.'
+    )
+    group_server.add_argument(
+        '--queue-size',
+        type=int, default=64,
+        help='Maximum number of requests waiting for a free slot, per queue. Further requests are rejected (HTTP 503).'
+    )
+    group_server.add_argument(
+        '--autoscale',
+        action='store_true',
+        help='Adjust the number of screenshots taken at the same time (up to --concurrency) to the CPU usage, '
+             'available memory and render latency of the host.'
+    )
+    group_server.add_argument(
+        '--bulk-concurrency',
+        type=int, default=None,
+        help='Maximum number of screenshots of the bulk queue taken at the same time. Defaults to one less than --concurrency.'
+    )
+    group_server.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Suppress output from browsers and request logs.'
+    )
+
+    args = parser.parse_args(argv)
+
+    try:
+        hti = Html2Image(**instance_kwargs(args))
+        serve(
+            hti,
+            host=args.host,
+            port=args.port,
+            concurrency=args.concurrency,
+            queue_size=args.queue_size,
+            bulk_concurrency=args.bulk_concurrency,
+            autoscale=args.autoscale,
+            quiet=args.quiet,
+        )
+    except Exception as e:
+        print(f'Error: Could not serve screenshots: {e}')
+        return 1
+
+
+def batch_main(argv):
+    """ Entry point of the `html2image batch` command. """
+    parser = argparse.ArgumentParser(
+        prog='html2image batch',
+        description='Take screenshots described by a JSON Lines manifest, one job per line, and write one JSON result '
+                    'line per job.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        'manifest',
+        nargs='?', default='-',
+        help="JSON Lines file of jobs, or '-' to read jobs from the standard input. Each job holds the parameters "
+             "of one screenshot: a source (url, html_str, html_file or other_file), and optionally css_str, "
+             "css_file, size ([W, H]), save_as, virtual_time_budget, browser_context and id."
+    )
+    add_instance_arguments(parser)
+
+    group_batch = parser.add_argument_group('Batch Options')
+    group_batch.add_argument(
+        '--parallel', '-j',
+        type=int, default=1,
+        help='Number of jobs run at the same time.'
+    )
+    group_batch.add_argument(
+        '--plan-window',
+        type=int, default=None,
+        metavar='N',
+        help='Read jobs N at a time and reorder them, so that jobs with the same size, origin and stylesheets run '
+             'one after the other. Result lines keep the index of their job in the manifest.'
+    )
+    group_batch.add_argument(
+        '--results', '-r',
+        default='-',
+        metavar='FILE',
+        help="File in which the JSON result lines are written, or '-' for the standard output."
+    )
+    group_batch.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Suppress output from browsers and the final summary.'
+    )
+    group_batch.add_argument(
+        '--listen',
+        type=address_type, default=None,
+        metavar='HOST:PORT',
+        help='Hand the jobs out to `html2image worker` processes connecting to this address, '
+             'instead of using a local browser. Images are saved in --output-path.'
+    )
+    group_batch.add_argument(
+        '--token',
+        default=None,
+        help=f'Secret shared with the workers, with --listen. Can also be set with the {TOKEN_ENV_VAR} environment variable. '
+             'A random token is printed by default.'
+    )
+    group_batch.add_argument(
+        '--job-timeout',
+        type=float, default=300,
+        metavar='SECONDS',
+        help='With --listen, delay after which the jobs of a worker that did not finish them are handed out again.'
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.listen:
+        return distributed_batch(args)
+
+    try:
+        hti = Html2Image(**instance_kwargs(args))
+    except Exception as e:
+        print(f'Error: Could not instantiate Html2Image: {e}', file=sys.stderr)
+        return 1
+
+    # CDP browsers can take as many screenshots at once as they have tabs
+    if hasattr(hti.browser, 'max_tabs'):
+        hti.browser.max_tabs = max(hti.browser.max_tabs, args.parallel)
+
+    manifest = sys.stdin if args.manifest == '-' else open(args.manifest)
+    results = sys.stdout if args.results == '-' else open(args.results, 'w')
+
+    browser_started = False
+    try:
+        if isinstance(hti.browser, CDPBrowser):
+            hti.__enter__()
+            browser_started = True
+        succeeded, failed = run_batch(
+            hti, read_jobs(manifest), results,
+            parallelism=args.parallel, plan_window=args.plan_window,
+        )
+    except Exception as e:
+        print(f'Error: The batch could not be run: {e}', file=sys.stderr)
+        return 1
+    finally:
+        if browser_started:
+            hti.__exit__(None, None, None)
+        if manifest is not sys.stdin:
+            manifest.close()
+        if results is not sys.stdout:
+            results.close()
+
+    if not args.quiet:
+        print(f'{succeeded} job(s) succeeded, {failed} failed.', file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+def distributed_batch(args):
+    """ Runs a batch with the workers connected to a coordinator. """
+    manifest = sys.stdin if args.manifest == '-' else open(args.manifest)
+    results = sys.stdout if args.results == '-' else open(args.results, 'w')
+
+    token = args.token or os.environ.get(TOKEN_ENV_VAR)
+    try:
+        host, port = args.listen
+        with Coordinator(
+            host, port, job_timeout=args.job_timeout,
+            output_path=args.output_path, token=token,
+        ) as coordinator:
+            if not token:
+                print(f'Worker token: {coordinator.token}', file=sys.stderr)
+            if not args.quiet:
+                print(f'Waiting for workers on {host}:{coordinator.address[1]}', file=sys.stderr)
+            succeeded, failed = run_batch(
+                coordinator, read_jobs(manifest), results,
+                parallelism=args.parallel, plan_window=args.plan_window,
+            )
+    except Exception as e:
+        print(f'Error: The batch could not be run: {e}', file=sys.stderr)
+        return 1
+    finally:
+        if manifest is not sys.stdin:
+            manifest.close()
+        if results is not sys.stdout:
+            results.close()
+
+    if not args.quiet:
+        print(f'{succeeded} job(s) succeeded, {failed} failed.', file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+def worker_main(argv):
+    """ Entry point of the `html2image worker` command. """
+    parser = argparse.ArgumentParser(
+        prog='html2image worker',
+        description='Render the jobs handed out by a coordinator (`html2image batch --listen`).',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        'coordinator',
+        type=address_type,
+        metavar='HOST:PORT',
+        help='Address of the coordinator.'
+    )
+    add_instance_arguments(parser, default_browser='chrome-cdp')
+
+    group_worker = parser.add_argument_group('Worker Options')
+    group_worker.add_argument(
+        '--concurrency', '-c',
+        type=int, default=4,
+        help='Number of jobs rendered at the same time.'
+    )
+    group_worker.add_argument(
+        '--name',
+        default=None,
+        help='Name of the worker, defaults to the host name.'
+    )
+    group_worker.add_argument(
+        '--token',
+        default=None,
+        help=f'Secret shared with the coordinator. Can also be set with the {TOKEN_ENV_VAR} environment variable.'
+    )
+    group_worker.add_argument(
+        '--reconnect-delay',
+        type=float, default=5,
+        metavar='SECONDS',
+        help='Delay before connecting again when the coordinator is unreachable.'
+    )
+    group_worker.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Suppress output from browsers.'
     )
 
+    args = parser.parse_args(argv)
+    token = args.token or os.environ.get(TOKEN_ENV_VAR)
+    if not token:
+        parser.error(f'--token or the {TOKEN_ENV_VAR} environment variable is required.')
+
+    try:
+        hti = Html2Image(**instance_kwargs(args))
+    except Exception as e:
+        print(f'Error: Could not instantiate Html2Image: {e}', file=sys.stderr)
+        return 1
+
+    # CDP browsers can take as many screenshots at once as they have tabs
+    if hasattr(hti.browser, 'max_tabs'):
+        hti.browser.max_tabs = max(hti.browser.max_tabs, args.concurrency)
+
+    worker = Worker(
+        args.coordinator, screenshot_renderer(hti),
+        concurrency=args.concurrency, name=args.name, token=token,
+    )
+
+    browser_started = False
+    try:
+        if isinstance(hti.browser, CDPBrowser):
+            hti.__enter__()
+            browser_started = True
+        worker.run(reconnect_delay=args.reconnect_delay)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f'Error: The worker stopped: {e}', file=sys.stderr)
+        return 1
+    finally:
+        if browser_started:
+            hti.__exit__(None, None, None)
+
+
+def bench_main(argv):
+    """ Entry point of the `html2image bench` command. """
+    parser = argparse.ArgumentParser(
+        prog='html2image bench',
+        description='Measure screenshot latency and throughput on pages served by a local HTTP server, and compare the '
+                    'results with a baseline.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    add_instance_arguments(parser, default_browser='chrome-cdp')
+
+    group_bench = parser.add_argument_group('Benchmark Options')
+    group_bench.add_argument(
+        '--scenario', '-s',
+        action='append', choices=SCENARIOS, default=None,
+        help='Scenario to run, can be repeated. Defaults to all of them.'
+    )
+    group_bench.add_argument(
+        '--repeat', '-n',
+        type=int, default=5,
+        help='Number of measurements of each scenario.'
+    )
+    group_bench.add_argument(
+        '--concurrency', '-c',
+        type=concurrency_list_type, default=[1, 2, 4],
+        metavar='N[,N...]',
+        help='Numbers of screenshots taken at the same time by the batch scenario.'
+    )
+    group_bench.add_argument(
+        '--batch-size',
+        type=int, default=16,
+        help='Number of screenshots of each batch.'
+    )
+    group_bench.add_argument(
+        '--results', '-r',
+        default=None,
+        metavar='FILE',
+        help='JSON file in which the results are written, e.g. to be used as a baseline later.'
+    )
+    group_bench.add_argument(
+        '--baseline', '-b',
+        default=None,
+        metavar='FILE',
+        help='JSON results of a previous run. The command fails if a median duration or a throughput regressed by '
+             'more than --tolerance.'
+    )
+    group_bench.add_argument(
+        '--tolerance',
+        type=float, default=0.1,
+        help='Relative change tolerated before a metric counts as a regression, e.g. 0.1 for 10%%.'
+    )
+    group_bench.add_argument(
+        '--quiet', '-q',
+        action='store_true',
+        help='Suppress output from browsers and the results table.'
+    )
+
+    args = parser.parse_args(argv)
+
+    # screenshots are saved in a temporary directory
+    hti_kwargs = instance_kwargs(args)
+    hti_kwargs.pop('output_path', None)
+
+    try:
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+
+        results = run_benchmarks(
+            hti_kwargs,
+            scenarios=args.scenario or SCENARIOS,
+            repeat=args.repeat,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+        )
+    except Exception as e:
+        print(f'Error: The benchmarks could not be run: {e}', file=sys.stderr)
+        return 1
+
+    if args.results:
+        with open(args.results, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    if not args.quiet:
+        format_results(results, regressions)
+
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv[:1] == ['serve']:
+        return serve_main(argv[1:])
+
+    if argv[:1] == ['batch']:
+        return batch_main(argv[1:])
+
+    if argv[:1] == ['worker']:
+        return worker_main(argv[1:])
+
+    if argv[:1] == ['bench']:
+        return bench_main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description='Generate images from HTML/CSS or URLs using the html2image library.',
+        epilog='Use `html2image serve --help` to serve screenshots over HTTP, `html2image batch --help` to run a '
+               'JSON Lines manifest of jobs, `html2image worker --help` to render jobs handed out by another host, '
+               'and `html2image bench --help` to measure the performance of screenshots.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+
+    # Html2Image instantiation arguments
+    add_instance_arguments(parser)
+
     # Screenshot sources arguments
     group_sources = parser.add_argument_group('Screenshot Sources (at least one type is required)')
     group_sources.add_argument(
@@ -127,7 +639,16 @@ def main():
         nargs='*', default=[],
         type=size_type,
         metavar='W,H',
-        help="Size(s) for screenshots as W,H. If one W,H pair is given, it applies to all. If multiple, they apply to corresponding screenshots; if fewer pairs than items, the last is repeated. If omitted, (1920,1080) is used."
+        help="Size(s) for screenshots as W,H. If one W,H pair is given, it applies to all. If multiple, they apply "
+             "to corresponding screenshots; if fewer pairs than items, the last is repeated. If omitted, "
+             "(1920,1080) is used."
+    )
+    group_output_ctrl.add_argument(
+        '--virtual-time-budget',
+        type=int, default=None,
+        metavar='MS',
+        help='Virtual time (in milliseconds) given to each page before the screenshot. Animations and timers are '
+             'fast-forwarded instead of waited for.'
     )
 
     # General arguments
@@ -143,49 +664,56 @@ def main():
         help='Enable verbose output, including browser commands if supported by the browser handler.'
     )
 
-    args = parser.parse_args()
-
-    # Prepare Html2Image()
-    hti_kwargs = {
-        'output_path': args.output_path,
-        'browser': args.browser,
-        'browser_executable': args.browser_executable,
-        'custom_flags': [cf.replace("'", '') for cf in args.custom_flags],
-        'disable_logging': args.quiet,
-        'temp_path': args.temp_path,
-        'keep_temp_files': args.keep_temp_files,
-    }
+    # Daemon arguments
+    group_daemon = parser.add_argument_group('Daemon Options')
+    group_daemon.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Start a background render daemon. Later invocations are transparently run by the daemon, which keeps '
+             'browsers warm.'
+    )
+    group_daemon.add_argument(
+        '--daemon-stop',
+        action='store_true',
+        help='Stop the background render daemon.'
+    )
+    group_daemon.add_argument(
+        '--daemon-socket',
+        default=daemon.default_socket_path(),
+        metavar='PATH',
+        help=f'Unix socket of the daemon. Can also be set with the {daemon.SOCKET_ENV_VAR} environment variable.'
+    )
+    group_daemon.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Do not use the daemon, even if one is running.'
+    )
+    group_daemon.add_argument(
+        '--daemon-foreground',
+        action='store_true',
+        help=argparse.SUPPRESS,  # used to run the daemon process itself
+    )
 
-    # Only pass cdp_port if a CDP browser is likely selected and port is given
-    if args.cdp_port and 'cdp' in args.browser.lower():
-        hti_kwargs['browser_cdp_port'] = args.cdp_port
-    elif args.cdp_port:
-        print(
-            f"Warning: --cdp-port ({args.cdp_port}) was specified, but the selected browser ('{args.browser}') might not be a CDP browser."
-        )
+    args = parser.parse_args(argv)
 
-    try:
-        # Filter out None values so defaults are used for those specific kwargs
-        # keep_temp_files and disable_logging are bools, always pass them.
-        # custom_flags should be passed even if None, so Html2Image can use its defaults or an empty list.
-        active_hti_kwargs = {
-            k: v for k, v in hti_kwargs.items()
-            if v is not None or k in ['keep_temp_files', 'disable_logging', 'custom_flags']
-        }
-        hti = Html2Image(**active_hti_kwargs)
+    if args.daemon_foreground:
+        return run_daemon(args.daemon_socket)
 
-    except Exception as e:
-        print(f'Error: Could not instantiate Html2Image: {e}')
-        exit(1)
+    if args.daemon:
+        try:
+            daemon.start_daemon(args.daemon_socket)
+        except (OSError, TimeoutError) as e:
+            print(f'Error: Could not start the daemon: {e}')
+            return 1
+        if not args.quiet:
+            print(f'Daemon listening on {args.daemon_socket}')
+        return 0
 
-    if args.verbose:
-        # The `print_command` attribute is specific to ChromiumHeadless.
-        # CDP browsers print logs internally.
-        if hasattr(hti.browser, 'print_command'):
-            hti.browser.print_command = True
-            print('Verbose mode: Browser commands will be printed for compatible handlers.')
-        else:
-            print('Verbose mode enabled. Note: Detailed browser command printing depends on the selected browser handler.')
+    if args.daemon_stop:
+        if not daemon.stop_daemon(args.daemon_socket):
+            print(f'No daemon is listening on {args.daemon_socket}')
+            return 1
+        return 0
 
     has_sources = any([
         args.url, args.html_file, args.html_string, args.other_file
@@ -195,9 +723,62 @@ def main():
     if not has_sources:
         print('Error: No screenshot sources (URL, HTML file/string, other file) provided.')
         parser.print_usage()
-        exit(1)
+        return 1
 
-    # Perform screenshot
+    if not args.no_daemon:
+        response = daemon.send_request(
+            args.daemon_socket,
+            {'args': vars(args), 'cwd': os.getcwd()},
+        )
+        if response is not None:
+            sys.stdout.write(response['output'])
+            return response['code']
+
+    return run(args)
+
+
+def run_daemon(socket_path):
+    """ Runs the render daemon until it is stopped.
+
+    Html2Image instances are kept between invocations (one per instance
+    configuration), so that browsers are only found and started once.
+    """
+    instances = {}
+
+    def run_request(parsed_args):
+        args = argparse.Namespace(**parsed_args)
+        # JSON turned the (width, height) tuples into lists
+        args.size = [tuple(size) for size in args.size]
+        return run(args, instances=instances)
+
+    try:
+        daemon.DaemonServer(socket_path, run_request).serve_until_stopped()
+    finally:
+        for hti in instances.values():
+            if isinstance(hti.browser, CDPBrowser):
+                hti.__exit__(None, None, None)
+    return 0
+
+
+def get_instance(hti_kwargs, instances=None):
+    """ Returns an Html2Image instance, from `instances` if given.
+
+    Instances created for the cache have their CDP browser started.
+    """
+    if instances is None:
+        return Html2Image(**hti_kwargs)
+
+    key = json.dumps(hti_kwargs, sort_keys=True, default=vars)
+    if key not in instances:
+        hti = Html2Image(**hti_kwargs)
+        if isinstance(hti.browser, CDPBrowser):
+            hti.__enter__()
+        instances[key] = hti
+    return instances[key]
+
+
+def cli_screenshot_kwargs(args):
+    """ Returns the `screenshot()` arguments given by parsed CLI arguments. """
     screenshot_kwargs = {
         'url': args.url,
         'html_file': args.html_file,
@@ -211,38 +792,103 @@ def main():
     if args.save_as is not None:
         screenshot_kwargs['save_as'] = args.save_as
 
+    if args.virtual_time_budget is not None:
+        screenshot_kwargs['virtual_time_budget'] = args.virtual_time_budget
+
+    return screenshot_kwargs
+
+
+@contextlib.contextmanager
+def printed_browser_commands(hti, verbose):
+    """ Makes the browser of `hti` print its commands if `verbose`.
+
+    The previous setting is restored on exit, as the instances of the
+    daemon are reused by later invocations.
+    """
+    # The `print_command` attribute is specific to ChromiumHeadless.
+    # CDP browsers print logs internally.
+    if not verbose or not hasattr(hti.browser, 'print_command'):
+        yield
+        return
+
+    previous = hti.browser.print_command
+    hti.browser.print_command = True
     try:
-        if args.verbose:
-            print('--- Html2Image Instance Configuration ---')
-            for k, v in active_hti_kwargs.items():
-                print(f'  {k}: {v}')
-            print('--- Screenshot Call Arguments ---')
-            for k, v in screenshot_kwargs.items():
-                if v or k == 'size':  # print if list not empty, or always for size
-                    print(f'  {k}: {v}')
+        yield
+    finally:
+        hti.browser.print_command = previous
+
+
+def print_verbose_arguments(hti, hti_kwargs, screenshot_kwargs):
+    if hasattr(hti.browser, 'print_command'):
+        print('Verbose mode: Browser commands will be printed for compatible handlers.')
+    else:
+        print('Verbose mode enabled. Note: Detailed browser command printing depends on the selected browser handler.')
 
-        paths = hti.screenshot(**screenshot_kwargs)
+    print('--- Html2Image Instance Configuration ---')
+    for k, v in hti_kwargs.items():
+        print(f'  {k}: {v}')
+    print('--- Screenshot Call Arguments ---')
+    for k, v in screenshot_kwargs.items():
+        if v or k == 'size':  # print if list not empty, or always for size
+            print(f'  {k}: {v}')
+
+
+def run(args, instances=None):
+    """ Takes the screenshots described by parsed CLI arguments.
+
+    Parameters
+    ----------
+    - `args`: argparse.Namespace
+    - `instances`: dict, optional
+        + Cache of Html2Image instances, by instance configuration.
+        + CDP browsers of cached instances are started on creation and
+        + stay up, which is how the daemon keeps browsers warm.
+
+    Returns
+    -------
+    - int
+        + Exit code.
+    """
+    # Prepare Html2Image()
+    active_hti_kwargs = instance_kwargs(args)
+
+    try:
+        hti = get_instance(active_hti_kwargs, instances)
+    except Exception as e:
+        print(f'Error: Could not instantiate Html2Image: {e}')
+        return 1
+
+    # Perform screenshot
+    screenshot_kwargs = cli_screenshot_kwargs(args)
+    if args.verbose:
+        print_verbose_arguments(hti, active_hti_kwargs, screenshot_kwargs)
+
+    try:
+        with printed_browser_commands(hti, args.verbose):
+            paths = hti.screenshot(**screenshot_kwargs)
 
         if not args.quiet:
             print(f'Successfully created {len(paths)} image(s):')
-            for path in paths:
-                print(f'  {path}')
+            print('\n'.join(f'  {path}' for path in paths))
+
+        return 0
 
     except FileNotFoundError as e:
         print(f'Error: A required file was not found: {e}')
-        exit(1)
+        return 1
 
     except ValueError as e:  # Can be raised by browser screenshot method for bad size etc.
         print(f'Error: Invalid value encountered: {e}')
-        exit(1)
+        return 1
 
     except Exception as e:
         print(f'An unexpected error occurred during screenshotting: {e}')
         if args.verbose:
             import traceback
             traceback.print_exc()
-        exit(1)
+        return 1
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
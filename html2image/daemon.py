@@ -0,0 +1,305 @@
+"""
+Render daemon of the html2image CLI.
+
+A background process listens on a Unix socket and runs CLI invocations
+on behalf of short-lived `html2image` processes, so that browser
+discovery and startup are paid once instead of on every call.
+
+The protocol is one JSON line per connection in each direction:
+- request: `{"args": {...parsed CLI arguments...}, "cwd": "..."}`,
+  `{"command": "ping"}` or `{"command": "stop"}`;
+- response: `{"code": exit_code, "output": "...captured stdout..."}`.
+
+Requests carry HTML and file paths, so the socket is only reachable by
+the user running the daemon: it lives in a private directory, is created
+with no permissions for other users, and both sides check that the other
+one belongs to the same user.
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV_VAR = 'HTML2IMAGE_DAEMON_SOCKET'
+
+
+def is_supported():
+    """ Returns whether or not Unix sockets are available on this system.
+    """
+    return hasattr(socket, 'AF_UNIX')
+
+
+def default_socket_path():
+    """ Returns the path of the daemon socket.
+
+    The `HTML2IMAGE_DAEMON_SOCKET` environment variable is used if defined,
+    otherwise the socket is created in the runtime directory of the user
+    (`XDG_RUNTIME_DIR`), or else in a private directory of the temporary
+    directory, with one directory per user.
+    """
+    if os.environ.get(SOCKET_ENV_VAR):
+        return os.environ[SOCKET_ENV_VAR]
+
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'html2image.sock')
+
+    user = _current_uid()
+    return os.path.join(
+        tempfile.gettempdir(), f'html2image-{"user" if user is None else user}',
+        'daemon.sock',
+    )
+
+
+def _current_uid():
+    return os.getuid() if hasattr(os, 'getuid') else None
+
+
+def _is_own_socket(socket_path):
+    """ Returns whether `socket_path` is a socket of the current user. """
+    status = os.lstat(socket_path)
+    uid = _current_uid()
+    return stat.S_ISSOCK(status.st_mode) and uid in (None, status.st_uid)
+
+
+def _check_directory(directory):
+    """ Checks that other users cannot replace the files of a directory:
+        it belongs to the current user (or root), and is only writable by
+        others if it is sticky, like `/tmp`.
+
+    Raises
+    ------
+    - `PermissionError`
+    """
+    status = os.stat(directory)
+    uid = _current_uid()
+    if uid is None:
+        return
+    if (
+        status.st_uid not in (uid, 0)
+        or (status.st_mode & 0o022 and not status.st_mode & stat.S_ISVTX)
+    ):
+        raise PermissionError(
+            f'The daemon socket directory {directory} can be modified by '
+            'other users.'
+        )
+
+
+def send_request(socket_path, request, timeout=None):
+    """ Sends a request to the daemon and returns its response.
+
+    Parameters
+    ----------
+    - `socket_path`: str
+    - `request`: dict
+        + JSON serializable request.
+    - `timeout`: float, optional
+        + Timeout in seconds, None to wait as long as needed.
+
+    Returns
+    -------
+    - dict or None
+        + The response, or None if no daemon is listening on `socket_path`.
+    """
+    if not is_supported() or not os.path.exists(socket_path):
+        return None
+
+    if not _is_own_socket(socket_path):
+        logger.warning(
+            'Ignoring the daemon socket %s, which does not belong to the '
+            'current user.', socket_path,
+        )
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                response = f.readline()
+    except (ConnectionRefusedError, FileNotFoundError):
+        # stale socket file, the daemon is gone
+        return None
+
+    if not response:
+        return None
+    return json.loads(response)
+
+
+def start_daemon(socket_path, timeout=10):
+    """ Starts the daemon in a detached background process.
+
+    Returns once the daemon accepts connections.
+
+    Raises
+    ------
+    - `OSError`
+        + If Unix sockets are not supported on this system.
+    - `FileExistsError`
+        + If a daemon is already listening on `socket_path`.
+    - `TimeoutError`
+        + If the daemon did not start listening within `timeout` seconds.
+    """
+    if not is_supported():
+        raise OSError('The daemon requires Unix sockets.')
+    if send_request(socket_path, {'command': 'ping'}, timeout=1) is not None:
+        raise FileExistsError(f'A daemon is already listening on {socket_path}.')
+
+    subprocess.Popen(
+        [
+            sys.executable, '-m', 'html2image',
+            '--daemon-foreground', '--daemon-socket', socket_path,
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,  # survive the end of the calling shell
+    )
+
+    deadline = time.monotonic() + timeout
+    while send_request(socket_path, {'command': 'ping'}, timeout=1) is None:
+        if time.monotonic() > deadline:
+            raise TimeoutError(
+                f'The daemon did not start listening on {socket_path}.'
+            )
+        time.sleep(0.05)
+
+
+def stop_daemon(socket_path):
+    """ Stops the daemon listening on `socket_path`.
+
+    Returns
+    -------
+    - bool
+        + False if no daemon was listening.
+    """
+    return send_request(socket_path, {'command': 'stop'}) is not None
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """
+        Handles one request sent to a `DaemonServer`.
+    """
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        command = request.get('command')
+
+        if command == 'stop':
+            self._respond(0, '')
+            self.server.stopping = True
+            return
+
+        if command == 'ping':
+            self._respond(0, '')
+            return
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                os.chdir(request['cwd'])
+                code = self.server.run(request['args'])
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                print(f'Error: The daemon could not run the command: {e}')
+                code = 1
+
+        self._respond(code or 0, output.getvalue())
+
+    def _respond(self, code, output):
+        self.wfile.write(
+            json.dumps({'code': code, 'output': output}).encode('utf-8')
+            + b'\n'
+        )
+
+
+# Unix sockets are not available on every platform
+_UnixStreamServer = getattr(socketserver, 'UnixStreamServer', object)
+
+
+class DaemonServer(_UnixStreamServer):
+    """
+        Unix socket server running CLI invocations one at a time.
+
+        Requests are handled sequentially, as each of them changes the
+        working directory and captures the standard output of the process.
+        Connections of other users are refused, where the system tells who
+        is connecting (`SO_PEERCRED`).
+
+        Parameters
+        ----------
+        - `socket_path` : str
+        - `run` : callable
+            + Called with the parsed CLI arguments (as a dict) of each
+            + request, returns an exit code and prints the CLI output.
+
+        Raises
+        ------
+        - `FileExistsError`
+            + If a daemon is already listening on `socket_path`.
+        - `PermissionError`
+            + If `socket_path` belongs to another user, or its directory
+            + can be modified by other users.
+    """
+
+    def __init__(self, socket_path, run):
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_directory(directory)
+
+        if os.path.lexists(socket_path):
+            if send_request(socket_path, {'command': 'ping'}, timeout=1) is not None:
+                raise FileExistsError(
+                    f'A daemon is already listening on {socket_path}.'
+                )
+            if not _is_own_socket(socket_path):
+                raise PermissionError(
+                    f'{socket_path} does not belong to the current user.'
+                )
+            os.remove(socket_path)  # stale socket of a dead daemon
+
+        # only the current user may connect, from the moment it is bound
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(umask)
+
+        self.socket_path = socket_path
+        self.run = run
+        self.stopping = False
+
+    def verify_request(self, request, client_address):
+        if not hasattr(socket, 'SO_PEERCRED') or _current_uid() is None:
+            return True
+
+        credentials = request.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'),
+        )
+        _, uid, _ = struct.unpack('3i', credentials)
+        if uid != _current_uid():
+            logger.warning('Refused a daemon connection of the user %s', uid)
+            return False
+        return True
+
+    def serve_until_stopped(self):
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
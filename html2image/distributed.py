@@ -0,0 +1,567 @@
+"""
+Distributed mode of the html2image package.
+
+A `Coordinator` hands out render jobs over TCP to any number of `Worker`
+processes, each of them running its own `Html2Image` instance and
+browser, and streaming the resulting images back. Jobs held by a worker
+that dies (closed connection or missed heartbeats) or that does not
+finish them within `job_timeout` seconds are handed out again, up to
+`max_attempts` times: heartbeats only tell that a worker is connected,
+not that its renders make progress.
+
+The protocol is one JSON object per line in each direction:
+- coordinator: `{"type": "challenge", "nonce": ...}` once the worker is
+  connected;
+- worker: `{"type": "hello", "name": ..., "slots": n, "nonce": ...,
+  "proof": ...}` once, then `{"type": "result", "job_id": ...,
+  "image": base64 or null, "error": str or null}` and
+  `{"type": "heartbeat"}`;
+- coordinator: `{"type": "welcome", "proof": ...}` or
+  `{"type": "rejected"}`, then `{"type": "job", "job_id": ...,
+  "params": {...}}`, where `params` are the `screenshot()` parameters
+  of a single screenshot.
+
+Both sides prove that they know the shared token with an HMAC of the
+nonce of the other side, so that the token is never sent: workers only
+get jobs from, and only read their local source files (`html_file`,
+`css_file`, `other_file`) for, a coordinator knowing the token. The
+connection itself is not encrypted.
+"""
+
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from html2image.server import render_to_bytes, screenshot_kwargs
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENV_VAR = 'HTML2IMAGE_WORKER_TOKEN'
+
+
+def _send_message(wfile, lock, message):
+    data = json.dumps(message).encode('utf-8') + b'\n'
+    with lock:
+        wfile.write(data)
+        wfile.flush()
+
+
+def _read_message(rfile):
+    line = rfile.readline()
+    if not line:
+        raise ConnectionError('The connection was closed.')
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise ConnectionError('Invalid message.')
+    if not isinstance(message, dict):
+        raise ConnectionError('Invalid message.')
+    return message
+
+
+def _proof(token, role, nonce):
+    """ Returns the proof that the `role` side of a connection knows the
+        token, for the nonce sent by the other side.
+    """
+    return hmac.new(
+        token.encode('utf-8'), f'{role}:{nonce}'.encode('utf-8'),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+class _Job():
+    def __init__(self, job_id, params):
+        self.job_id = job_id
+        self.params = params
+        self.future = Future()
+        self.attempts = 0
+        self.deadline = None
+
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    """
+        Serves one worker connection of a `Coordinator`.
+    """
+
+    def handle(self):
+        self.server.coordinator._serve_worker(self)
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator):
+        super().__init__(address, _WorkerHandler)
+        self.coordinator = coordinator
+
+
+class Coordinator():
+    """
+        Hands out render jobs to the workers connected to it.
+
+        The coordinator can be used in place of an `Html2Image` instance
+        by `html2image.batch.run_batch()`, as it provides a `screenshot()`
+        method for single screenshots.
+
+        Parameters
+        ----------
+        - `host` : str, optional
+            + Address on which the coordinator listens for workers.
+        - `port` : int, optional
+            + 0 to pick a free port, see `address`.
+        - `max_attempts` : int, optional
+            + Number of times a job is handed out before being failed,
+            + when the workers holding it die.
+        - `heartbeat_timeout` : float, optional
+            + Number of seconds without any message after which a worker
+            + is considered dead.
+        - `job_timeout` : float, optional
+            + Number of seconds after which a worker that did not send
+            + the result of a job is considered stuck: it is disconnected
+            + and its jobs are handed out again. None for no deadline.
+        - `output_path` : str, optional
+            + Directory in which `screenshot()` saves images.
+            + Default is the current working directory.
+        - `token` : str, optional
+            + Secret shared with the workers, see the module documentation.
+            + By default, a random token is generated, see `token`.
+    """
+
+    def __init__(self, host='127.0.0.1', port=9300, max_attempts=3,
+                 heartbeat_timeout=30, job_timeout=300, output_path=None,
+                 token=None):
+        if max_attempts < 1:
+            raise ValueError('`max_attempts` should be greater than 0.')
+        if job_timeout is not None and job_timeout <= 0:
+            raise ValueError('`job_timeout` should be greater than 0.')
+
+        self.max_attempts = max_attempts
+        self.heartbeat_timeout = heartbeat_timeout
+        self.job_timeout = job_timeout
+        self.output_path = output_path or os.getcwd()
+        self.token = token or secrets.token_urlsafe(24)
+
+        self._jobs = deque()
+        self._job_ids = itertools.count()
+        self._workers = {}
+        self._condition = threading.Condition()
+        self._closing = False
+
+        self._server = _CoordinatorServer((host, port), self)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def address(self):
+        """ (host, port) on which the coordinator listens. """
+        return self._server.server_address[:2]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, params):
+        """ Queues a render job.
+
+            Parameters
+            ----------
+            - `params` : dict
+                + `screenshot()` parameters, for a single screenshot.
+
+            Returns
+            -------
+            - concurrent.futures.Future
+                + Future of the image (bytes). Raises `RuntimeError` if the
+                + job failed on a worker or could not be rendered at all.
+
+            Raises
+            ------
+            - `ValueError`
+                + If the parameters are invalid.
+        """
+        screenshot_kwargs(params, extra_parameters=('save_as',))
+
+        with self._condition:
+            if self._closing:
+                raise RuntimeError('The coordinator is closed.')
+            job = _Job(next(self._job_ids), params)
+            self._jobs.append(job)
+            self._condition.notify_all()
+
+        return job.future
+
+    def screenshot(self, save_as='screenshot.png', size=None, **kwargs):
+        """ Renders one screenshot on a worker and saves it.
+
+            Parameters
+            ----------
+            - `save_as` : str, optional
+                + Name of the image in `output_path`. Its extension
+                + defines the format of the image.
+            - `size` : (int, int), optional
+            - `kwargs`
+                + Other `screenshot()` parameters, with a single source.
+
+            Returns
+            -------
+            - list of str
+                + The path of the image, as returned by
+                + `Html2Image.screenshot()`.
+        """
+        params = dict(kwargs, save_as=save_as)
+        if size is not None:
+            params['size'] = list(size)
+
+        image = self.submit(params).result()
+
+        path = os.path.join(self.output_path, save_as)
+        with open(path, 'wb') as f:
+            f.write(image)
+        return [path]
+
+    def stats(self):
+        """ Returns the number of queued jobs and the connected workers.
+        """
+        with self._condition:
+            return {
+                'queued': len(self._jobs),
+                'workers': {
+                    name: {'slots': worker['slots'],
+                           'in_flight': len(worker['jobs'])}
+                    for name, worker in self._workers.items()
+                },
+            }
+
+    def close(self):
+        """ Stops the coordinator, failing the jobs that are still queued.
+        """
+        with self._condition:
+            self._closing = True
+            while self._jobs:
+                self._jobs.popleft().future.set_exception(
+                    RuntimeError('The coordinator was closed.')
+                )
+            self._condition.notify_all()
+
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _serve_worker(self, handler):
+        handler.connection.settimeout(self.heartbeat_timeout)
+        write_lock = threading.Lock()
+        host, port = handler.client_address[:2]
+
+        try:
+            nonce = secrets.token_hex(16)
+            _send_message(handler.wfile, write_lock, {
+                'type': 'challenge', 'nonce': nonce,
+            })
+            hello = _read_message(handler.rfile)
+            if not hmac.compare_digest(
+                str(hello.get('proof')).encode('utf-8'),
+                _proof(self.token, 'worker', nonce).encode('utf-8'),
+            ):
+                logger.warning('Rejected a worker from %s: invalid token.', host)
+                _send_message(handler.wfile, write_lock, {'type': 'rejected'})
+                return
+
+            slots = max(int(hello['slots']), 1)
+            name = f'{hello.get("name")}@{host}:{port}'
+            _send_message(handler.wfile, write_lock, {
+                'type': 'welcome',
+                'proof': _proof(self.token, 'coordinator', str(hello['nonce'])),
+            })
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+
+        worker = {'slots': slots, 'jobs': {}, 'alive': True}
+
+        with self._condition:
+            self._workers[name] = worker
+
+        reader = threading.Thread(
+            target=self._read_results, args=(handler.rfile, worker),
+            daemon=True,
+        )
+        reader.start()
+
+        try:
+            while True:
+                with self._condition:
+                    job = self._next_job(name, worker)
+                if job is None:
+                    break
+
+                _send_message(handler.wfile, write_lock, {
+                    'type': 'job', 'job_id': job.job_id, 'params': job.params,
+                })
+        except OSError:
+            pass
+        finally:
+            # unblocks the reader, which holds `rfile` until then
+            try:
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            reader.join()
+
+            with self._condition:
+                worker['alive'] = False
+                del self._workers[name]
+                self._requeue(worker['jobs'].values())
+                worker['jobs'].clear()
+                self._condition.notify_all()
+
+    def _next_job(self, name, worker):
+        """ Waits for a job to hand out to a worker and returns it, or
+            returns None once the worker should be disconnected: closed
+            coordinator, dead worker, or job not done within `job_timeout`.
+            `self._condition` must be held by the caller.
+        """
+        while not self._closing and worker['alive']:
+            timeout = None
+            if self.job_timeout is not None and worker['jobs']:
+                timeout = min(
+                    job.deadline for job in worker['jobs'].values()
+                ) - time.monotonic()
+                if timeout <= 0:
+                    logger.warning(
+                        'Worker %s is stuck: no result within %s seconds.',
+                        name, self.job_timeout,
+                    )
+                    return None
+
+            if self._jobs and len(worker['jobs']) < worker['slots']:
+                job = self._jobs.popleft()
+                job.attempts += 1
+                if self.job_timeout is not None:
+                    job.deadline = time.monotonic() + self.job_timeout
+                worker['jobs'][job.job_id] = job
+                return job
+
+            self._condition.wait(timeout)
+        return None
+
+    def _read_results(self, rfile, worker):
+        try:
+            for line in rfile:
+                message = json.loads(line)
+                if message.get('type') != 'result':
+                    continue  # heartbeat
+
+                with self._condition:
+                    job = worker['jobs'].pop(message['job_id'], None)
+                    self._condition.notify_all()
+
+                if job is None:
+                    continue
+                if message.get('error'):
+                    job.future.set_exception(RuntimeError(message['error']))
+                else:
+                    job.future.set_result(base64.b64decode(message['image']))
+        except (OSError, ValueError):
+            # a timeout (missed heartbeats) is an OSError
+            pass
+        finally:
+            with self._condition:
+                worker['alive'] = False
+                self._condition.notify_all()
+
+    def _requeue(self, jobs):
+        """ Hands out again the jobs of a dead worker, or fails them.
+            `self._condition` must be held by the caller.
+        """
+        for job in sorted(jobs, key=lambda job: job.job_id, reverse=True):
+            if self._closing or job.attempts >= self.max_attempts:
+                job.future.set_exception(RuntimeError(
+                    f'The job was lost by {job.attempts} worker(s).'
+                ))
+            else:
+                self._jobs.appendleft(job)  # keeps the submission order
+
+
+class Worker():
+    """
+        Connects to a `Coordinator` and renders the jobs it hands out.
+
+        Parameters
+        ----------
+        - `address` : (str, int)
+            + Address of the coordinator.
+        - `render` : callable
+            + Called with the `screenshot()` parameters of a job,
+            + returns the image as bytes. See `screenshot_renderer()`.
+        - `concurrency` : int, optional
+            + Number of jobs rendered at the same time.
+        - `name` : str, optional
+            + Name of the worker, reported by the coordinator.
+        - `heartbeat_interval` : float, optional
+            + Number of seconds between two heartbeats, should be well
+            + under the `heartbeat_timeout` of the coordinator.
+        - `token` : str
+            + Secret shared with the coordinator, see its `token`.
+
+        Raises
+        ------
+        - `PermissionError`
+            + From `run()`, if the coordinator and the worker do not
+            + share the same token.
+    """
+
+    def __init__(self, address, render, concurrency=1, name=None,
+                 heartbeat_interval=10, token=None):
+        if concurrency < 1:
+            raise ValueError('`concurrency` should be greater than 0.')
+        if not token:
+            raise ValueError('`token` is required, see `Coordinator.token`.')
+
+        self.address = address
+        self.token = token
+        self.render = render
+        self.concurrency = concurrency
+        self.name = name or socket.gethostname()
+        self.heartbeat_interval = heartbeat_interval
+
+        self._stopping = threading.Event()
+        self._sock = None
+
+    def run(self, reconnect_delay=None):
+        """ Renders jobs until the connection to the coordinator is lost,
+            or until `stop()` is called.
+
+            Parameters
+            ----------
+            - `reconnect_delay` : float, optional
+                + If given, the worker connects again after this number
+                + of seconds instead of returning when the connection is
+                + lost or cannot be made.
+        """
+        while not self._stopping.is_set():
+            try:
+                self._run_connection()
+            except PermissionError:
+                raise  # connecting again would not help
+            except OSError:
+                if reconnect_delay is None:
+                    raise
+
+            if reconnect_delay is None:
+                return
+            self._stopping.wait(reconnect_delay)
+
+    def stop(self):
+        """ Makes `run()` return. Jobs being rendered are handed out to
+            other workers by the coordinator.
+        """
+        self._stopping.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run_connection(self):
+        with socket.create_connection(self.address) as sock:
+            self._sock = sock
+            rfile = sock.makefile('rb')
+            wfile = sock.makefile('wb')
+            write_lock = threading.Lock()
+            connected = threading.Event()
+            connected.set()
+
+            self._authenticate(rfile, wfile, write_lock)
+
+            heartbeat = threading.Thread(
+                target=self._send_heartbeats,
+                args=(wfile, write_lock, connected), daemon=True,
+            )
+            heartbeat.start()
+
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            try:
+                for line in rfile:
+                    message = json.loads(line)
+                    if message.get('type') == 'job':
+                        executor.submit(
+                            self._render_job,
+                            wfile, write_lock, connected, message,
+                        )
+            finally:
+                connected.clear()
+                executor.shutdown(wait=False)
+                self._sock = None
+
+    def _authenticate(self, rfile, wfile, write_lock):
+        challenge = _read_message(rfile)
+        nonce = secrets.token_hex(16)
+        _send_message(wfile, write_lock, {
+            'type': 'hello', 'name': self.name, 'slots': self.concurrency,
+            'nonce': nonce,
+            'proof': _proof(self.token, 'worker', str(challenge.get('nonce'))),
+        })
+
+        welcome = _read_message(rfile)
+        if welcome.get('type') == 'rejected':
+            raise PermissionError('The coordinator rejected the token.')
+        if not hmac.compare_digest(
+            str(welcome.get('proof')).encode('utf-8'),
+            _proof(self.token, 'coordinator', nonce).encode('utf-8'),
+        ):
+            raise PermissionError(
+                'The coordinator did not prove that it knows the token.'
+            )
+
+    def _render_job(self, wfile, write_lock, connected, message):
+        if not connected.is_set():
+            return  # queued job of a lost connection, handed out again
+
+        result = {
+            'type': 'result', 'job_id': message['job_id'],
+            'image': None, 'error': None,
+        }
+        try:
+            image = self.render(message['params'])
+            result['image'] = base64.b64encode(image).decode('ascii')
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+
+        try:
+            _send_message(wfile, write_lock, result)
+        except (OSError, ValueError):
+            pass  # connection lost, the coordinator hands the job out again
+
+    def _send_heartbeats(self, wfile, write_lock, connected):
+        while connected.is_set() and not self._stopping.wait(
+            self.heartbeat_interval
+        ):
+            try:
+                _send_message(wfile, write_lock, {'type': 'heartbeat'})
+            except (OSError, ValueError):
+                return
+
+
+def screenshot_renderer(hti):
+    """ Returns a `render` function for a `Worker`, taking screenshots
+        with an `Html2Image` instance.
+    """
+    def render(params):
+        kwargs = screenshot_kwargs(params, extra_parameters=('save_as',))
+        save_as = kwargs.pop('save_as', None) or 'screenshot.png'
+        extension = os.path.splitext(save_as)[1] or '.png'
+        return render_to_bytes(hti, kwargs, extension=extension)
+
+    return render
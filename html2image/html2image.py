@@ -10,11 +10,21 @@ For feedback, usage and to learn more, see https://github.com/vgalin/html2image
 
 import os
 import shutil
+import tempfile
 
 from textwrap import dedent
 
-from html2image.browsers import chrome, chrome_cdp, edge  # , firefox, firefox_cdp
+from html2image import sprite
+from html2image.jobs import RenderJob
+from html2image.naming import (
+    DEFAULT_TEMPLATE, NameTemplate, ShardedDirectories, relative_name,
+)
+from html2image.planner import plan, source_origin, viewport_key
+from html2image.results import RenderResult, ScreenshotPaths
+from html2image.tracing import span
+from html2image.browsers import chrome, chrome_cdp, edge, fake_cdp  # , firefox, firefox_cdp
 from html2image.browsers.browser import Browser, CDPBrowser
+from html2image.browsers.trace_capture import trace_file_name
 
 
 browser_map = {
@@ -26,6 +36,7 @@ browser_map = {
     'edge': edge.EdgeHeadless,
     'chrome-cdp': chrome_cdp.ChromeCDP,
     'chromium-cdp': chrome_cdp.ChromeCDP,
+    'fake-cdp': fake_cdp.FakeCDP,
     # 'firefox': firefox.FirefoxHeadless,
     # 'mozilla-firefox': firefox.FirefoxHeadless,
     # 'firefox-cdp': firefox_cdp.FirefoxCDP,
@@ -63,11 +74,34 @@ class Html2Image():
         - `custom_flags`: list of str or str, optional
             + Additional custom flags for the headless browser.
 
+        - `resource_limits`: ResourceLimits, optional
+            + Memory, CPU and process limits applied to the browser
+            + processes (Linux only, Chrome and Edge browsers).
+            + See `html2image.browsers.limits.ResourceLimits`.
+
+        - `timing_hooks`: list of callable, optional
+            + Called with the `RenderTimings` of every screenshot: the
+            + durations of its phases (launch, navigation, load, capture...)
+            + See `html2image.browsers.timings`.
+
+        - `tracer`: Tracer, optional
+            + Tracer emitting a span for each screenshot and its steps
+            + (preparing the HTML, staging files, then the phases of the
+            + browser). See `html2image.tracing`.
+
+        - `trace_capture`: TraceCapture, optional
+            + Records Chrome performance traces of a sample of the
+            + screenshots, next to their images (CDP browsers only).
+            + See `html2image.browsers.trace_capture.TraceCapture`.
+
         Raises
         ------
         - `FileNotFoundError`
             + If an executable of the browser specified in the `browser`
             parameter was not found.
+        - `ValueError`
+            + If `resource_limits`, `timing_hooks` or `trace_capture` are
+            given for a browser that does not support them.
     """
 
     def __init__(
@@ -81,6 +115,10 @@ class Html2Image():
         keep_temp_files=False,
         custom_flags=None,
         disable_logging=False,
+        resource_limits=None,
+        timing_hooks=None,
+        tracer=None,
+        trace_capture=None,
     ):
 
         if browser.lower() not in browser_map:
@@ -96,7 +134,7 @@ class Html2Image():
 
         browser_class = browser_map[browser.lower()]
 
-        if isinstance(browser_class, CDPBrowser):
+        if issubclass(browser_class, CDPBrowser) and browser_cdp_port:
             self.browser = browser_class(
                 executable=browser_executable,
                 flags=custom_flags,
@@ -110,6 +148,42 @@ class Html2Image():
                 disable_logging=disable_logging,
             )
 
+        if resource_limits is not None:
+            if not hasattr(self.browser, 'resource_limits'):
+                raise ValueError(
+                    f'The "{browser}" browser does not support resource limits.'
+                )
+            self.browser.resource_limits = resource_limits
+
+        if timing_hooks:
+            if not hasattr(self.browser, 'timing_hooks'):
+                raise ValueError(
+                    f'The "{browser}" browser does not support timing hooks.'
+                )
+            self.browser.timing_hooks.extend(timing_hooks)
+
+        if trace_capture is not None:
+            if not hasattr(self.browser, 'trace_capture'):
+                raise ValueError(
+                    f'The "{browser}" browser does not support Chrome traces, '
+                    'use a CDP browser such as "chrome-cdp".'
+                )
+            self.browser.trace_capture = trace_capture
+
+        self.tracer = tracer
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, value):
+        self._tracer = value
+
+        # browsers trace the phases of their screenshots themselves
+        if hasattr(self.browser, 'tracer'):
+            self.browser.tracer = value
+
     @property
     def temp_path(self):
         return self._temp_path
@@ -201,7 +275,8 @@ class Html2Image():
         os.remove(os.path.join(self.temp_path, filename))
 
     def screenshot_loaded_file(
-        self, file, output_file='screenshot.png', size=None
+        self, file, output_file='screenshot.png', size=None,
+        virtual_time_budget=None, browser_context=None,
     ):
         """ Takes a screenshot of a *previously loaded* file or string.
 
@@ -218,6 +293,19 @@ class Html2Image():
         - `size`: (int, int), optional
             + Size of the screenshot that will be taken when the
             method is called.
+
+        - `virtual_time_budget`: int, optional
+            + Amount of virtual time (in milliseconds) given to the page
+            before it is screenshotted.
+
+        - `browser_context`: str, optional
+            + Name of the isolated browser context in which the
+            screenshot is taken (CDP browsers).
+
+        Returns
+        -------
+        - `RenderTimings`
+            + Durations of the phases of the screenshot.
         """
 
         file = os.path.join(self.temp_path, file)
@@ -229,14 +317,19 @@ class Html2Image():
                 "modifying the output_path attribute."
             )
 
-        self.browser.screenshot(
+        return self.browser.screenshot(
             output_path=self.output_path,
             output_file=output_file,
             input=file,
             size=size,
+            virtual_time_budget=virtual_time_budget,
+            browser_context=browser_context,
         )
 
-    def screenshot_url(self, url, output_file='screenshot.png', size=None):
+    def screenshot_url(
+        self, url, output_file='screenshot.png', size=None,
+        virtual_time_budget=None, browser_context=None,
+    ):
         """ Takes a screenshot of a given URL.
 
         The given URL should be well formed or it may result in undefined
@@ -258,6 +351,19 @@ class Html2Image():
         - `size`: (int, int), optional
             + Size of the screenshot that will be taken when the
             + method is called.
+
+        - `virtual_time_budget`: int, optional
+            + Amount of virtual time (in milliseconds) given to the page
+            + before it is screenshotted.
+
+        - `browser_context`: str, optional
+            + Name of the isolated browser context in which the
+            + screenshot is taken (CDP browsers).
+
+        Returns
+        -------
+        - `RenderTimings`
+            + Durations of the phases of the screenshot.
         """
 
         if os.path.dirname(output_file) != '':
@@ -267,11 +373,13 @@ class Html2Image():
                 "modifying the output_path attribute."
             )
 
-        self.browser.screenshot(
+        return self.browser.screenshot(
             output_path=self.output_path,
             output_file=output_file,
             input=url,
-            size=size
+            size=size,
+            virtual_time_budget=virtual_time_budget,
+            browser_context=browser_context,
         )
 
     @staticmethod
@@ -305,6 +413,9 @@ class Html2Image():
 
         >>> _extend_save_as_param(['a.png', 'b.png', None, 65], 2)
         ['a.png', 'b.png']
+
+        >>> _extend_save_as_param(['report.v2.png'], 2)
+        ['report.v2_0.png', 'report.v2_1.png']
         """
 
         # get rid of anything that is not a string
@@ -314,14 +425,14 @@ class Html2Image():
             return save_as
 
         missing_name_count = desired_length - len(save_as)
-        filename, extention = save_as[-1].split('.')
+        filename, extention = os.path.splitext(save_as[-1])
 
         # remove last object as it will be replaced
         # from filename.extention to filename_0.extention
         save_as.pop()
 
         save_as.extend([
-            f'{filename}_{i}.{extention}'
+            f'{filename}_{i}{extention}'
             for i in range(missing_name_count + 1)
         ])
 
@@ -456,6 +567,9 @@ class Html2Image():
         url=[],
         save_as='screenshot.png',
         size=[],
+        virtual_time_budget=None,
+        browser_context=None,
+        raise_errors=True,
     ):
         """ Takes a screenshot using different resources.
 
@@ -487,11 +601,32 @@ class Html2Image():
         - `size`: list of (int, int) or (int, int) tuple
             + Size(s) of the screenshot(s) that will be taken when the
             + method is called.
+        - `virtual_time_budget`: int, optional
+            + Amount of virtual time, in milliseconds, given to each page
+            + before it is screenshotted. Timers, animations and lazy
+            + loading are fast-forwarded to a settled state instead of
+            + being waited for in real time.
+        - `browser_context`: str, optional
+            + Name of an isolated, incognito-like browser context in which
+            + the screenshots are taken, e.g. the name of a tenant.
+            + With CDP browsers, cookies and storage are not shared between
+            + browser contexts, which all live in the same browser process.
+        - `raise_errors`: bool, optional
+            + If False, a failed screenshot does not raise its error nor
+            + stop the following ones, its error is reported by its
+            + result instead. Default is True.
 
         Returns
         -------
         - list of str
-            + A list of the file path(s) of the generated image(s)
+            + A list of the file path(s) of the generated image(s), in the
+            + order of the given sources: HTML strings, HTML files, other
+            + files, then URLs. Screenshots themselves are taken grouped
+            + by size and origin, see `html2image.planner`.
+            + The list is a `ScreenshotPaths`, whose `results` attribute
+            + holds the `RenderResult` of each image, in the same order:
+            + its dimensions, format, size, hash, timings and error (e.g.
+            + an image that the browser did not write).
 
         Raises
         ------
@@ -502,8 +637,6 @@ class Html2Image():
         # mutables (here empty lists) as default arguments of a function
         # can cause unwanted behaviours.
 
-        screenshot_paths = []
-
         # convert each parameter into list
         # e.g: param=value becomes param=[value]
         html_strings = [html_str] if isinstance(html_str, str) else html_str
@@ -524,70 +657,501 @@ class Html2Image():
         )
         sizes = self._extend_size_param(sizes, planned_screenshot_count)
 
-        css_style_string = '\n'.join(css_strings) + '\n'
+        # screenshots are rendered in the order planned to reuse the
+        # viewport and caches of the browser, paths keep the given order
+        sources = (
+            [('html_str', html) for html in html_strings]
+            + [('html_file', path) for path in html_files]
+            + [('other_file', path) for path in other_files]
+            + [('url', target_url) for target_url in urls]
+        )
+        options = {
+            'virtual_time_budget': virtual_time_budget,
+            'browser_context': browser_context,
+        }
+        jobs = [
+            RenderJob(source, kind, size=job_size, output=name, options=options)
+            for (kind, source), job_size, name
+            in zip(sources, sizes, save_as_filenames)
+        ]
+        order = plan(
+            range(len(jobs)),
+            lambda index: viewport_key(jobs[index].size),
+            lambda index: source_origin(jobs[index].source),
+        )
 
-        if css_files:
-            # add content from css_files, regardless of whether css_strings was present
-            css_style_string += Html2Image._prepare_css_string(css_files)
+        with span(self.tracer, 'html2image.screenshot', screenshots=len(jobs)):
+            with span(self.tracer, 'html2image.prepare_css'):
+                css_style_string = '\n'.join(css_strings) + '\n'
 
+                if css_files:
+                    # add content from css_files, regardless of whether css_strings was present
+                    css_style_string += Html2Image._prepare_css_string(css_files)
 
-        for css in css_files:
-            if os.path.isfile(css):
-                self.load_file(src=css)
-            else:
-                raise FileNotFoundError(css)
+                for css in css_files:
+                    if os.path.isfile(css):
+                        self.load_file(src=css)
+                    else:
+                        raise FileNotFoundError(css)
+
+            results = [None] * len(jobs)
+            for index in order:
+                results[index] = self._render_job(
+                    jobs[index], jobs[index].output, css_style_string, raise_errors,
+                )
+
+        return ScreenshotPaths(results)
+
+    def render(self, jobs, raise_errors=False, name_template=None):
+        """ Takes the screenshots of render jobs, one at a time.
+
+        Unlike `screenshot()`, jobs are neither gathered nor reordered:
+        each job is rendered when it is taken from `jobs`, and its result
+        is yielded before the next job is taken, so that batches of any
+        size, including lazily generated ones, are rendered in linear time
+        and constant memory.
 
-        for html in html_strings:
-            name = save_as_filenames.pop(0)
-            current_size = sizes.pop(0)
+        Parameters
+        ----------
+        - `jobs`: iterable of `RenderJob`
+        - `raise_errors`: bool, optional
+            + If True, a failed screenshot raises its error and stops the
+            + batch. Default is False: its error is reported by its result.
+        - `name_template`: str, optional
+            + Names of the images of the jobs without an `output` name,
+            + relative to the output path, e.g. `{index:08d}.png` or
+            + `{hash[:2]}/{hash}.webp`, see `html2image.naming`.
+            + Subdirectories are created as needed.
+            + Default is `screenshot_{index}.png`.
+
+        Yields
+        ------
+        - `RenderResult`
+            + The result of each job, in the order of the jobs.
+
+        Raises
+        ------
+        - `FileNotFoundError`
+            + If a CSS file of a job does not exist.
+        - `ValueError`
+            + If the name template is invalid.
+
+        Examples
+        --------
+        >>> jobs = (RenderJob(f'<h1>{i}</h1>') for i in range(100000))
+        >>> for result in hti.render(jobs):
+        ...     print(result.path, result.content_hash)
+        """
+        template = NameTemplate(name_template or DEFAULT_TEMPLATE)
+        directories = ShardedDirectories(self.output_path)
+
+        # consecutive jobs usually share their CSS, which is only read
+        # and staged again when it changes
+        css = css_style_string = None
+
+        for index, job in enumerate(jobs):
+            if job.css() != css:
+                css = job.css()
+                css_strings, css_files = css
+                with span(self.tracer, 'html2image.prepare_css'):
+                    css_style_string = '\n'.join(css_strings) + '\n'
+                    for css_file in css_files:
+                        if not os.path.isfile(css_file):
+                            raise FileNotFoundError(css_file)
+                        self.load_file(src=css_file)
+                    css_style_string += Html2Image._prepare_css_string(css_files)
+
+            yield self._render_named_job(
+                job, index, template, directories, css_style_string, raise_errors,
+            )
 
+    def _render_named_job(
+        self, job, index, template, directories, css_style_string, raise_errors,
+    ):
+        """ Takes the screenshot of a job of `render()`, under a unique
+            temporary name if its name is in a subdirectory or made of its
+            hash, then moves it to its name.
+        """
+        if job.output:
+            name = relative_name(job.output)
+        elif template.needs_hash:
+            name = None
+        else:
+            name = template.format(index)
+
+        if name is not None and os.path.dirname(name) == '':
+            flat_name = name
+        else:
+            # a flat name shared with another job would be overwritten
+            flat_name = template.temporary_name(
+                index, extension=None if name is None else os.path.splitext(name)[1],
+            )
+        result = self._render_job(job, flat_name, css_style_string, raise_errors)
+        if not result.ok:
+            return result
+
+        try:
+            if name is None:
+                name = template.format(index, hash=result.content_hash)
+            if name != flat_name:
+                result.path = directories.place(flat_name, name)
+                timings = result.timings
+                if timings is not None and timings.trace_file is not None:
+                    timings.trace_file = directories.place(
+                        os.path.basename(timings.trace_file), trace_file_name(name),
+                    )
+        except OSError as e:
+            if raise_errors:
+                raise
+            result.error = e
+        return result
+
+    def _render_job(self, job, name, css_style_string, raise_errors):
+        """ Takes the screenshot of a job, and returns its `RenderResult`.
+        """
+        path = os.path.join(self.output_path, name)
+
+        with span(
+            self.tracer, 'html2image.image',
+            source=job.kind, output_file=name,
+            url=job.source if job.kind == 'url' else None,
+        ) as render_span:
+            try:
+                timings = self._screenshot_target(
+                    job.kind, job.source, name, job.size or self.size,
+                    css_style_string,
+                    job.options.get('virtual_time_budget'),
+                    job.options.get('browser_context'),
+                )
+            except Exception as e:
+                if raise_errors:
+                    raise
+                render_span.record_exception(e)
+                return RenderResult(path=path, error=e)
+
+            if timings is not None:
+                render_span.set_attribute('attempts', timings.attempts)
+                render_span.set_attribute('bytes_written', timings.bytes_written)
+            return Html2Image._render_result(path, timings)
+
+    @staticmethod
+    def _render_result(path, timings):
+        """ Returns the `RenderResult` of an image written by the browser.
+        """
+        description = None if timings is None else timings.images.get(path)
+        if description is not None:
+            return RenderResult(path=path, timings=timings, **description)
+
+        # browsers writing images themselves (e.g. Chrome's --screenshot):
+        # the image is only read if it is described, see `RenderResult`
+        try:
+            byte_length = os.stat(path).st_size
+        except OSError as e:
+            return RenderResult(path=path, timings=timings, error=e)
+        return RenderResult(path=path, timings=timings, byte_length=byte_length)
+
+    def _screenshot_target(
+        self, kind, screenshot_target, name, size, css_style_string,
+        virtual_time_budget, browser_context,
+    ):
+        """ Takes the screenshot of one source of `screenshot()`.
+
+        Returns
+        -------
+        - `RenderTimings` or None
+            + None for browsers that do not time their screenshots.
+        """
+        if kind == 'html_str':
             base_name, _ = os.path.splitext(name)
             html_filename = base_name + '.html'
 
-            content = Html2Image._prepare_html_string(html, css_style_string)
+            with span(self.tracer, 'html2image.prepare_html'):
+                content = Html2Image._prepare_html_string(
+                    screenshot_target, css_style_string
+                )
+            with span(self.tracer, 'html2image.stage_file'):
+                self.load_str(content=content, as_filename=html_filename)
+
+        elif kind in ('html_file', 'other_file'):
+            if not os.path.isfile(screenshot_target):
+                raise FileNotFoundError(screenshot_target)
+
+            html_filename = os.path.basename(screenshot_target)
+            with span(self.tracer, 'html2image.stage_file'):
+                self.load_file(src=screenshot_target)
 
-            self.load_str(content=content, as_filename=html_filename)
-            self.screenshot_loaded_file(
-                file=html_filename,
+        else:
+            return self.screenshot_url(
+                url=screenshot_target,
                 output_file=name,
-                size=current_size,
+                size=size,
+                virtual_time_budget=virtual_time_budget,
+                browser_context=browser_context,
             )
-            if not self.keep_temp_files:
-                self._remove_temp_file(html_filename)
 
-            screenshot_paths.append(os.path.join(self.output_path, name))
+        timings = self.screenshot_loaded_file(
+            file=html_filename,
+            output_file=name,
+            size=size,
+            virtual_time_budget=virtual_time_budget,
+            browser_context=browser_context,
+        )
+        if not self.keep_temp_files:
+            self._remove_temp_file(html_filename)
+        return timings
 
-        for screenshot_target in html_files + other_files:
+    def screenshot_sprite(
+        self,
+        html_str=[],
+        css_str=[],
+        css_file=[],
+        save_as='screenshot.png',
+        size=None,
+        max_sheet_size=(4096, 4096),
+        virtual_time_budget=None,
+    ):
+        """ Takes screenshots of many small HTML strings in a single render.
 
-            name = save_as_filenames.pop(0)
-            current_size = sizes.pop(0)
+        The HTML strings are laid out in a grid inside one document (a
+        sprite sheet), which is screenshotted once and then sliced into one
+        image per HTML string. The cost of a page load is thus shared
+        between every string of a sheet, which makes this method much
+        faster than `screenshot()` for large amounts of small snippets
+        such as badges or labels.
 
-            if os.path.isfile(screenshot_target):
-                self.load_file(src=screenshot_target)
-                self.screenshot_loaded_file(
-                    file=os.path.basename(screenshot_target),
-                    output_file=name,
-                    size=current_size,
+        Requires Pillow (`pip install html2image[sprite]`).
+
+        Parameters
+        ----------
+        - `html_str`: list of str or str
+            + HTML string(s) that will be screenshotted.
+        - `css_str`: list of str or str
+            + CSS string(s) that will be applied to every HTML string.
+        - `css_file`: list of str or str
+            + Filepath(s) of CSS file(s) that will be applied to every
+            + HTML string.
+        - `save_as`: list of str or str
+            + Name(s) as which the screenshots will be saved, following
+            + the same rules as in the `screenshot()` method.
+        - `size`: (int, int), optional
+            + Size of every screenshot, default is the `size` attribute.
+        - `max_sheet_size`: (int, int), optional
+            + Maximum size of a sprite sheet. If the snippets do not fit
+            + on one sheet, more sheets are rendered.
+        - `virtual_time_budget`: int, optional
+            + Amount of virtual time (in milliseconds) given to each sheet
+            + before it is screenshotted.
+
+        Returns
+        -------
+        - list of str
+            + A list of the file path(s) of the generated image(s)
+
+        Raises
+        ------
+        - `FileNotFoundError`
+        - `ImportError`
+            + If Pillow is not installed.
+        """
+        html_strings = [html_str] if isinstance(html_str, str) else html_str
+        css_strings = [css_str] if isinstance(css_str, str) else css_str
+        css_files = [css_file] if isinstance(css_file, str) else css_file
+        save_as_filenames = [save_as] if isinstance(save_as, str) else save_as
+        cell_size = self.size if size is None else size
+
+        save_as_filenames = Html2Image._extend_save_as_param(
+            save_as_filenames,
+            len(html_strings),
+        )
+
+        css_style_string = '\n'.join(css_strings) + '\n'
+
+        for css in css_files:
+            if not os.path.isfile(css):
+                raise FileNotFoundError(css)
+
+        if css_files:
+            css_style_string += Html2Image._prepare_css_string(css_files)
+
+        columns, cells_per_sheet = sprite.compute_grid(
+            len(html_strings), cell_size, max_sheet_size,
+        )
+
+        # sheets are staged in a directory of their own, as concurrent
+        # calls (e.g. of a server) share `temp_path`
+        staging_path = tempfile.mkdtemp(prefix='sprite-', dir=self.temp_path)
+        screenshot_paths = []
+        try:
+            for sheet_start in range(0, len(html_strings), cells_per_sheet):
+                sheet_end = sheet_start + cells_per_sheet
+                documents = [
+                    Html2Image._prepare_html_string(html, css_style_string)
+                    for html in html_strings[sheet_start:sheet_end]
+                ]
+                output_files = [
+                    os.path.join(self.output_path, name)
+                    for name in save_as_filenames[sheet_start:sheet_end]
+                ]
+
+                rows = -(-len(documents) // columns)  # ceil division
+                sheet_size = (columns * cell_size[0], rows * cell_size[1])
+
+                sheet_name = f'sheet_{sheet_start}'
+                with open(os.path.join(staging_path, sheet_name + '.html'), 'wb') as f:
+                    f.write(sprite.prepare_sprite_html(
+                        documents, cell_size, columns,
+                    ).encode('utf-8'))
+                self.browser.screenshot(
+                    input=os.path.join(staging_path, sheet_name + '.html'),
+                    output_path=staging_path,
+                    output_file=sheet_name + '.png',
+                    size=sheet_size,
+                    virtual_time_budget=virtual_time_budget,
                 )
-                if not self.keep_temp_files:
-                    self._remove_temp_file(os.path.basename(screenshot_target))                
-            else:
-                raise FileNotFoundError(screenshot_target)
 
-            screenshot_paths.append(os.path.join(self.output_path, name))
+                sprite.slice_sprite_sheet(
+                    os.path.join(staging_path, sheet_name + '.png'),
+                    cell_size,
+                    columns,
+                    output_files,
+                )
 
-        for target_url in urls:
-            name = save_as_filenames.pop(0)
-            current_size = sizes.pop(0)
+                screenshot_paths.extend(output_files)
+        finally:
+            if not self.keep_temp_files:
+                shutil.rmtree(staging_path, ignore_errors=True)
 
-            self.screenshot_url(
-                url=target_url,
-                output_file=name,
-                size=current_size,
+        return screenshot_paths
+
+    def screenshot_template(
+        self,
+        data,
+        html_str=None,
+        html_file=None,
+        css_str=[],
+        css_file=[],
+        save_as='screenshot.png',
+        size=None,
+        update_js=None,
+        browser_context=None,
+    ):
+        """ Takes one screenshot per data record using a single template.
+
+        The template is loaded only once in the browser, each record is
+        then applied to it through an in-page DOM update before taking a
+        screenshot. This is much faster than building and loading a new
+        document for each record with `screenshot()`.
+
+        Only available with CDP browsers (e.g. `chrome-cdp`), inside of a
+        `with` block.
+
+        Parameters
+        ----------
+        - `data`: list of dict
+            + JSON serializable records, one per screenshot.
+        - `html_str`: str
+            + HTML string of the template.
+        - `html_file`: str
+            + Filepath of an HTML template, used if `html_str` is not given.
+        - `css_str`: list of str or str
+            + CSS string(s) applied to `html_str`.
+        - `css_file`: list of str or str
+            + Filepath(s) of CSS file(s) applied to `html_str`, and made
+            + available to `html_file`.
+        - `save_as`: list of str or str
+            + Name(s) as which the screenshots will be saved, following
+            + the same rules as in the `screenshot()` method.
+        - `size`: (int, int), optional
+            + Size of every screenshot, default is the `size` attribute.
+        - `update_js`: str, optional
+            + Source of a JavaScript function receiving a record and
+            + updating the page, e.g.
+            + `"(data) => { document.title = data.title; }"`.
+            + By default, the value of each key of a record is set as the
+            + text content of elements with a matching `data-hti-field`
+            + attribute (`<h1 data-hti-field="title"></h1>`).
+        - `browser_context`: str, optional
+            + Name of the isolated browser context in which the template
+            + is loaded.
+
+        Returns
+        -------
+        - list of str
+            + A list of the file path(s) of the generated image(s)
+
+        Raises
+        ------
+        - `ValueError`
+            + If the browser does not support templates.
+            + If neither `html_str` or `html_file` are given.
+        - `FileNotFoundError`
+        """
+        if not hasattr(self.browser, 'screenshot_template'):
+            raise ValueError(
+                'Templates are only supported by CDP browsers, '
+                'such as "chrome-cdp".'
             )
-            screenshot_paths.append(os.path.join(self.output_path, name))
 
-        return screenshot_paths
+        if html_str is None and html_file is None:
+            raise ValueError('A template is required: give either '
+                             '`html_str` or `html_file`.')
+
+        records = list(data)
+        css_strings = [css_str] if isinstance(css_str, str) else css_str
+        css_files = [css_file] if isinstance(css_file, str) else css_file
+        save_as_filenames = [save_as] if isinstance(save_as, str) else save_as
+
+        save_as_filenames = Html2Image._extend_save_as_param(
+            save_as_filenames,
+            len(records),
+        )
+
+        for css in css_files:
+            if not os.path.isfile(css):
+                raise FileNotFoundError(css)
+        if html_str is None and not os.path.isfile(html_file):
+            raise FileNotFoundError(html_file)
+
+        # the template and its stylesheets are staged in a directory of
+        # their own, as concurrent calls (e.g. of a server) share `temp_path`
+        staging_path = tempfile.mkdtemp(prefix='template-', dir=self.temp_path)
+        try:
+            for css in css_files:
+                shutil.copyfile(
+                    css, os.path.join(staging_path, os.path.basename(css)),
+                )
+
+            if html_str is not None:
+                css_style_string = '\n'.join(css_strings) + '\n'
+                if css_files:
+                    css_style_string += Html2Image._prepare_css_string(css_files)
+
+                template = os.path.join(staging_path, 'template.html')
+                with open(template, 'wb') as f:
+                    f.write(Html2Image._prepare_html_string(
+                        html_str, css_style_string,
+                    ).encode('utf-8'))
+            else:
+                template = os.path.join(staging_path, os.path.basename(html_file))
+                shutil.copyfile(html_file, template)
+
+            self.browser.screenshot_template(
+                template=template,
+                records=records,
+                output_path=self.output_path,
+                output_files=save_as_filenames,
+                size=self.size if size is None else size,
+                update_script=update_js,
+                browser_context=browser_context,
+            )
+        finally:
+            if not self.keep_temp_files:
+                shutil.rmtree(staging_path, ignore_errors=True)
+
+        return [
+            os.path.join(self.output_path, name)
+            for name in save_as_filenames[:len(records)]
+        ]
 
     def __enter__(self):
         self.browser.__enter__()
@@ -0,0 +1,96 @@
+"""
+Render jobs of the html2image package.
+
+A `RenderJob` describes one screenshot: its source and the kind of the
+source, its size, the name of its image, and its options. Jobs are given
+to `Html2Image.render()`, which takes their screenshots one at a time
+and yields their results, so that batches of any size, e.g. generated
+lazily, are rendered in linear time and constant memory:
+
+    jobs = (
+        RenderJob(f'<h1>{title}</h1>', output=f'title_{index}.png')
+        for index, title in enumerate(titles)
+    )
+    for result in hti.render(jobs):
+        print(result.path, result.error)
+"""
+
+from urllib.parse import urlsplit
+
+KINDS = ('html_str', 'html_file', 'other_file', 'url')
+
+# options of a job, as accepted by `screenshot()`
+OPTIONS = ('css_str', 'css_file', 'virtual_time_budget', 'browser_context')
+
+
+def guess_kind(source):
+    """ Returns `url` for sources that look like URLs (with a scheme and
+        a host, or `data:`, `file:` and `about:` URLs), `html_str`
+        otherwise. Files have to be given an explicit kind.
+    """
+    parts = urlsplit(source)
+    if (parts.scheme and parts.netloc) or parts.scheme in ('data', 'file', 'about'):
+        return 'url'
+    return 'html_str'
+
+
+class RenderJob():
+    """
+        One screenshot to render.
+
+        Parameters
+        ----------
+        - `source` : str
+            + HTML string, file path or URL to screenshot.
+        - `kind` : str, optional
+            + `html_str`, `html_file`, `other_file` or `url`. Default is
+            + guessed from the source, see `guess_kind()`.
+        - `size` : (int, int), optional
+            + Size of the screenshot, default is the `size` of the
+            + `Html2Image` instance.
+        - `output` : str, optional
+            + Name as which the screenshot is saved, relative to the output
+            + path, e.g. `pages/home.png`. Default is given by the name
+            + template of `Html2Image.render()`.
+        - `options` : dict, optional
+            + `css_str`, `css_file` (str or list of str),
+            + `virtual_time_budget` and `browser_context`, as accepted by
+            + `Html2Image.screenshot()`.
+
+        Raises
+        ------
+        - `ValueError`
+            + If the kind or an option is unknown.
+    """
+
+    __slots__ = ('source', 'kind', 'size', 'output', 'options')
+
+    def __init__(self, source, kind=None, size=None, output=None, options=None):
+        if kind is None:
+            kind = guess_kind(source)
+        if kind not in KINDS:
+            raise ValueError(f'Unknown kind {kind!r}, expected one of {KINDS}.')
+
+        options = dict(options or {})
+        unknown = [name for name in options if name not in OPTIONS]
+        if unknown:
+            raise ValueError(
+                f'Unknown option(s) {unknown}, expected some of {OPTIONS}.'
+            )
+
+        self.source = source
+        self.kind = kind
+        self.size = size
+        self.output = output
+        self.options = options
+
+    def css(self):
+        """ Returns the CSS strings and CSS files of the job, as tuples. """
+        return tuple(
+            (value,) if isinstance(value, str) else tuple(value or ())
+            for value in (self.options.get('css_str'), self.options.get('css_file'))
+        )
+
+    def __repr__(self):
+        source = self.source if len(self.source) <= 40 else self.source[:37] + '...'
+        return f'RenderJob({source!r}, kind={self.kind!r}, output={self.output!r})'
@@ -0,0 +1,365 @@
+"""
+Metrics of the html2image package.
+
+A `MetricsRegistry` holds counters, gauges and histograms, which can be
+read in-process with `snapshot()`, or exported in the Prometheus text
+exposition format with `exposition()` (served on `GET /metrics` by
+`html2image serve`). No metrics library is needed.
+
+`instrument_browser()` and `instrument_scheduler()` register the
+metrics of the render engine: renders by status, latency by phase,
+bytes written, live browsers, browser restarts, tab reuse, and jobs and
+queue depth by queue.
+
+    registry = MetricsRegistry()
+    instrument_browser(registry, hti.browser)
+    ...
+    print(registry.snapshot()['html2image_renders_total'])
+"""
+
+import math
+import threading
+
+# seconds, from a fast tab reuse to a slow page load
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+         .replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class _Metric():
+    type = None
+
+    def __init__(self, name, help, labels=(), function=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f'{self.name} has the labels {self.labels}, got {tuple(labels)}.'
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        """ Returns the current values, as a list of
+            (suffix, labels, value), labels being (name, value) pairs.
+        """
+        if self.function is not None:
+            values = self.function()
+            if values is None:
+                return []
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+
+        return [
+            ('', tuple(zip(self.labels, key)), value)
+            for key, value in sorted(values.items())
+        ]
+
+
+class Counter(_Metric):
+    """
+        Value that only goes up, e.g. a number of renders.
+
+        Parameters
+        ----------
+        - `name` : str
+        - `help` : str
+        - `labels` : tuple of str, optional
+            + Names of the labels given to `inc()`.
+        - `function` : callable, optional
+            + Called when the counter is read instead of counting with
+            + `inc()`. Returns a number or, with labels, a dict mapping
+            + tuples of label values to numbers, or None.
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+        Value that goes up and down, e.g. a number of queued jobs.
+        See `Counter` for the parameters.
+    """
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+        Distribution of observed values, e.g. durations, counted in
+        cumulative buckets.
+
+        Parameters
+        ----------
+        - `name` : str
+        - `help` : str
+        - `labels` : tuple of str, optional
+        - `buckets` : tuple of float, optional
+            + Upper bounds of the buckets, `+Inf` is always added.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = counts, total + value
+
+    def samples(self):
+        with self._lock:
+            values = {
+                key: (list(counts), total)
+                for key, (counts, total) in self._values.items()
+            }
+
+        samples = []
+        for key, (counts, total) in sorted(values.items()):
+            labels = tuple(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((
+                    '_bucket', labels + (('le', _format_value(bound)),),
+                    cumulative,
+                ))
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry():
+    """
+        Set of metrics, read with `snapshot()` or `exposition()`.
+
+        `counter()`, `gauge()` and `histogram()` return the metric
+        already registered under a name, if any.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labels=(), function=None):
+        return self._register(Counter, name, help, labels, function=function)
+
+    def gauge(self, name, help, labels=(), function=None):
+        return self._register(Gauge, name, help, labels, function=function)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labels, buckets=buckets)
+
+    def _register(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'{name} is already registered as a {metric.type}.')
+            return metric
+
+    def snapshot(self):
+        """ Returns the current value of every metric.
+
+            Returns
+            -------
+            - dict
+                + `{name: {'type': str, 'help': str, 'samples': list}}`,
+                + samples being `{'name': str, 'labels': dict, 'value': n}`.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        return {
+            metric.name: {
+                'type': metric.type,
+                'help': metric.help,
+                'samples': [
+                    {'name': metric.name + suffix, 'labels': dict(labels),
+                     'value': value}
+                    for suffix, labels, value in metric.samples()
+                ],
+            }
+            for metric in metrics
+        }
+
+    def exposition(self):
+        """ Returns every metric in the Prometheus text exposition format
+            (version 0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            help = metric.help.replace('\\', '\\\\').replace('\n', '\\n')
+            lines.append(f'# HELP {metric.name} {help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for suffix, labels, value in metric.samples():
+                lines.append(
+                    f'{metric.name}{suffix}{_format_labels(labels)} '
+                    f'{_format_value(value)}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_browser(registry, browser):
+    """ Registers the metrics of the renders of a browser.
+
+        Renders are counted through the `timing_hooks` of the browser,
+        see `html2image.browsers.timings`.
+
+        Parameters
+        ----------
+        - `registry` : MetricsRegistry
+        - `browser` : Browser
+            + E.g. `hti.browser`.
+
+        Raises
+        ------
+        - `ValueError`
+            + If the browser does not support timing hooks.
+    """
+    if not hasattr(browser, 'timing_hooks'):
+        raise ValueError('The browser does not support timing hooks.')
+
+    renders = registry.counter(
+        'html2image_renders_total', 'Renders, by status.', ('status',),
+    )
+    render_seconds = registry.histogram(
+        'html2image_render_seconds', 'Duration of renders.',
+    )
+    phase_seconds = registry.histogram(
+        'html2image_render_phase_seconds',
+        'Duration of the phases of renders.', ('phase',),
+    )
+    retries = registry.counter(
+        'html2image_render_retries_total',
+        'Renders attempted again after a browser crash or hang.',
+    )
+    bytes_written = registry.counter(
+        'html2image_bytes_written_total', 'Bytes of images written.',
+    )
+
+    def record(timings):
+        renders.inc(status='success' if timings.error is None else 'error')
+        render_seconds.observe(timings.total)
+        for phase, seconds in timings.phases.items():
+            phase_seconds.observe(seconds, phase=phase)
+        retries.inc(timings.attempts - 1)
+        bytes_written.inc(timings.bytes_written)
+
+    browser.timing_hooks.append(record)
+
+    # only browsers living across renders (CDP browsers) have a process
+    if hasattr(browser, 'proc'):
+        registry.gauge(
+            'html2image_browsers_alive', 'Running browser processes.',
+            function=lambda: int(
+                browser.proc is not None and browser.proc.poll() is None
+            ),
+        )
+    if hasattr(browser, 'restarts'):
+        registry.counter(
+            'html2image_browser_restarts_total',
+            'Browser processes replaced after a crash or when recycled.',
+            function=lambda: browser.restarts,
+        )
+    if hasattr(browser, 'tab_counters'):
+        registry.counter(
+            'html2image_tabs_acquired_total',
+            'Tabs handed out to renders, by whether they were reused from '
+            'the pool (a hit) or opened.', ('result',),
+            function=lambda: {
+                (result,): count
+                for result, count in browser.tab_counters.items()
+            },
+        )
+
+
+def instrument_scheduler(registry, scheduler):
+    """ Registers the metrics of the jobs of a `Scheduler`: jobs by queue
+        and status, their duration, and the depth of the queues.
+    """
+    jobs = registry.counter(
+        'html2image_jobs_total', 'Finished jobs, by queue and status.',
+        ('queue', 'status'),
+    )
+    job_seconds = registry.histogram(
+        'html2image_job_seconds', 'Duration of jobs, by queue.', ('queue',),
+    )
+
+    def record(queue_name, elapsed, error):
+        jobs.inc(queue=queue_name, status='success' if error is None else 'error')
+        job_seconds.observe(elapsed, queue=queue_name)
+
+    scheduler.add_done_callback(record)
+
+    registry.gauge(
+        'html2image_queue_jobs', 'Jobs of each queue, by state.',
+        ('queue', 'state'),
+        function=lambda: {
+            (name, state): stats[state]
+            for name, stats in scheduler.stats().items()
+            for state in ('queued', 'active')
+        },
+    )
+    registry.counter(
+        'html2image_queue_rejected_total',
+        'Jobs rejected because their queue was full.', ('queue',),
+        function=lambda: {
+            (name,): stats['rejected']
+            for name, stats in scheduler.stats().items()
+        },
+    )
+    registry.gauge(
+        'html2image_concurrency', 'Maximum number of jobs run at once.',
+        function=lambda: scheduler.concurrency,
+    )
@@ -0,0 +1,162 @@
+"""
+Output name templates of the html2image package.
+
+Past a few hundred thousand files, a single flat output directory gets
+slow to write to and to list. `Html2Image.render()` can be given a name
+template which spreads the images over sharded subdirectories, created
+as they are needed:
+
+    hti.render(jobs, name_template='{hash[:2]}/{hash}.webp')
+    hti.render(jobs, name_template='{index:08d}.png')
+
+Templates use the syntax of `str.format()`, plus slices of fields such
+as `{hash[:2]}`, with the fields:
+
+- `index` : the position of the job in its batch.
+- `hash` : the SHA-256 of the image, in hexadecimal. Identical images
+  end up in the same file.
+
+Images named after their hash or in subdirectories are taken under a
+unique temporary name first, then moved in place. CDP browsers encode
+images after their extension (see `ChromeCDP`), e.g. `.webp` as WebP.
+"""
+
+import os
+import re
+import string
+import uuid
+
+DEFAULT_TEMPLATE = 'screenshot_{index}.png'
+
+# fields of the templates, with sample values used to validate them
+FIELDS = {'index': 0, 'hash': '0' * 64}
+
+# at most that many created directories are remembered, to spare a
+# system call per image without growing with the batch
+MAX_KNOWN_DIRECTORIES = 65536
+
+_SLICE = re.compile(r'(\w+)\[(-?\d*):(-?\d*)\]')
+
+
+class _Formatter(string.Formatter):
+    """ `str.format()` which also supports slices, e.g. `{hash[:2]}`. """
+
+    def get_field(self, field_name, args, kwargs):
+        match = _SLICE.fullmatch(field_name)
+        if match is None:
+            return super().get_field(field_name, args, kwargs)
+
+        name, start, stop = match.groups()
+        value = self.get_value(name, args, kwargs)
+        return value[int(start) if start else None:int(stop) if stop else None], name
+
+
+_formatter = _Formatter()
+
+
+def relative_name(name):
+    """ Returns a normalized output name, which may contain directories.
+
+    Raises
+    ------
+    - `ValueError`
+        + If the name is absolute or points outside of the output
+        + directory.
+    """
+    normalized = os.path.normpath(name)
+    if (
+        os.path.isabs(normalized) or normalized == os.curdir
+        or normalized.split(os.sep)[0] == os.pardir
+    ):
+        raise ValueError(
+            f'Output names should be relative to the output path, got {name!r}.'
+        )
+    return normalized
+
+
+class NameTemplate():
+    """
+        Template of the names of the images of a batch.
+
+        Parameters
+        ----------
+        - `template` : str
+            + e.g. `{hash[:2]}/{hash}.webp` or `{index:08d}.png`, see
+            + the documentation of `html2image.naming`.
+
+        Raises
+        ------
+        - `ValueError`
+            + If the template uses unknown fields, is malformed, or names
+            + files outside of the output directory.
+    """
+
+    def __init__(self, template=DEFAULT_TEMPLATE):
+        try:
+            fields = [
+                re.match(r'\w*', field_name).group()
+                for _, field_name, _, _ in _formatter.parse(template)
+                if field_name is not None
+            ]
+            sample = _formatter.format(template, **FIELDS)
+        except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+            raise ValueError(
+                f'Invalid name template {template!r} ({e!r}), its fields '
+                f'should be some of {list(FIELDS)}.'
+            ) from None
+        relative_name(sample)
+
+        self.template = template
+        self.needs_hash = 'hash' in fields
+        extension = os.path.splitext(template)[1]
+        self.extension = extension if extension and '{' not in extension else '.png'
+
+    def format(self, index, hash=None):
+        """ Returns the name of an image, relative to the output path. """
+        return relative_name(_formatter.format(self.template, index=index, hash=hash))
+
+    def temporary_name(self, index, extension=None):
+        """ Returns a unique name under which an image is taken in the
+            output path, before it is moved to its name, e.g. one made of
+            its hash or in a subdirectory.
+        """
+        return f'.hti_render_{index}_{uuid.uuid4().hex}{extension or self.extension}'
+
+    def __repr__(self):
+        return f'NameTemplate({self.template!r})'
+
+
+class ShardedDirectories():
+    """
+        Moves images from the output path to their sharded subdirectories,
+        creating the subdirectories as they are needed.
+
+        Parameters
+        ----------
+        - `output_path` : str
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self._known = set()
+
+    def place(self, name, destination):
+        """ Moves the file `name` of the output path to `destination`,
+            relative to the output path, replacing any existing file.
+
+            Returns
+            -------
+            - str
+                + The new path of the file.
+        """
+        path = os.path.join(self.output_path, destination)
+        directory = os.path.dirname(path)
+
+        if directory not in self._known:
+            os.makedirs(directory, exist_ok=True)
+            if len(self._known) >= MAX_KNOWN_DIRECTORIES:
+                self._known.clear()
+            self._known.add(directory)
+
+        os.replace(os.path.join(self.output_path, name), path)
+        return path
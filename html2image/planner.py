@@ -0,0 +1,130 @@
+"""
+Render planning of the html2image package.
+
+Rendering screenshots in the order in which they are given is rarely
+the cheapest order: a browser changes its viewport for every new size,
+and its HTTP, font and stylesheet caches are warmest for the origin and
+stylesheets it just rendered. `plan()` reorders jobs so that jobs with
+the same viewport size, then with the same origin and stylesheets, are
+rendered one after the other.
+
+Groups keep the order in which they first appear, and jobs keep their
+order within a group, so a plan stays close to the given order. Callers
+render jobs in the planned order, but return or report their results
+in the original one.
+"""
+
+from urllib.parse import urlsplit
+
+
+def plan(items, *keys):
+    """ Returns the order in which items should be rendered.
+
+    Parameters
+    ----------
+    - `items`: sequence
+    - `keys`: callables
+        + Functions returning a hashable group key for an item. Items are
+        + grouped by the first key, then within each group by the second
+        + key, and so on.
+
+    Returns
+    -------
+    - list of int
+        + Indices of `items`, in rendering order.
+
+    Examples
+    --------
+    >>> plan(['a1', 'b1', 'a2', 'b2'], lambda item: item[0])
+    [0, 2, 1, 3]
+    """
+    return _group(list(range(len(items))), items, keys)
+
+
+def _group(indices, items, keys):
+    if not keys or len(indices) < 2:
+        return indices
+
+    groups = {}  # keeps the order of first appearance
+    for index in indices:
+        groups.setdefault(keys[0](items[index]), []).append(index)
+
+    return [
+        index
+        for group in groups.values()
+        for index in _group(group, items, keys[1:])
+    ]
+
+
+def source_origin(source):
+    """ Returns the origin (`scheme://host:port`) of a url, or `file://`
+        for anything else, e.g. file paths and HTML strings, which are
+        all rendered as local files.
+    """
+    if isinstance(source, str):
+        parts = urlsplit(source)
+        if parts.scheme and parts.netloc:
+            return f'{parts.scheme.lower()}://{parts.netloc.lower()}'
+    return 'file://'
+
+
+def viewport_key(size):
+    """ Returns a hashable key of a screenshot size, e.g. `[800, 600]`.
+    """
+    return tuple(size) if isinstance(size, (list, tuple)) else size
+
+
+def _hashable(key):
+    """ Returns `key`, or its representation if it is not hashable
+        (e.g. invalid parameters, which fail when the job is run).
+    """
+    try:
+        hash(key)
+    except TypeError:
+        return repr(key)
+    return key
+
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    return tuple(value) if isinstance(value, (list, tuple)) else (value,)
+
+
+def plan_jobs(jobs):
+    """ Returns the order in which batch jobs should be rendered.
+
+    Parameters
+    ----------
+    - `jobs`: list of dict
+        + `screenshot()` parameters of single screenshots, as read by
+        + `html2image.batch.read_jobs()`. Anything else (e.g. a job that
+        + could not be decoded) is planned last.
+
+    Returns
+    -------
+    - list of int
+        + Indices of `jobs`, in rendering order.
+    """
+    def viewport(job):
+        return _hashable(viewport_key(job.get('size')))
+
+    def affinity(job):
+        sources = (
+            _as_tuple(job.get('url')) + _as_tuple(job.get('html_str'))
+            + _as_tuple(job.get('html_file')) + _as_tuple(job.get('other_file'))
+        )
+        return _hashable((
+            source_origin(sources[0]) if sources else None,
+            _as_tuple(job.get('css_file')),
+            _as_tuple(job.get('css_str')),
+            job.get('browser_context'),
+        ))
+
+    valid = [index for index, job in enumerate(jobs) if isinstance(job, dict)]
+    order = plan([jobs[index] for index in valid], viewport, affinity)
+
+    # invalid jobs fail immediately, their position does not matter
+    return [valid[index] for index in order] + [
+        index for index, job in enumerate(jobs) if not isinstance(job, dict)
+    ]
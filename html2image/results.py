@@ -0,0 +1,270 @@
+"""
+Results of the screenshots of the html2image package.
+
+`Html2Image.screenshot()` returns a list of paths, as it always did, which
+also carries a `RenderResult` per image in its `results` attribute: the
+dimensions, format, size and content hash of the image, the timings of
+its render, and its error, if any. What the browser does not tell about
+the image (e.g. its hash) is only computed, from the image file, when
+it is first asked for, so that callers only wanting paths pay nothing.
+
+    paths = hti.screenshot(url=['https://www.python.org', 'https://pypi.org'])
+    for result in paths.results:
+        print(result.path, result.width, result.height, result.content_hash)
+"""
+
+import hashlib
+import struct
+
+# JPEG start of frame markers, which hold the dimensions of the image
+_JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF,
+}
+
+
+def image_dimensions(data):
+    """ Returns the format and dimensions of a PNG, JPEG or WebP image,
+        read from its header.
+
+    Parameters
+    ----------
+    - `data`: bytes
+        + The image, or at least its first bytes.
+
+    Returns
+    -------
+    - (str, int, int)
+        + Format (`png`, `jpeg` or `webp`), width and height, or
+        + (None, None, None) for other or truncated images.
+    """
+    try:
+        if data[:8] == b'\x89PNG\r\n\x1a\n':
+            width, height = struct.unpack('>II', data[16:24])
+            return 'png', width, height
+
+        if data[:2] == b'\xff\xd8':
+            index = 2
+            while index + 9 <= len(data) and data[index] == 0xFF:
+                marker = data[index + 1]
+                if marker in _JPEG_SOF_MARKERS:
+                    height, width = struct.unpack('>HH', data[index + 5:index + 9])
+                    return 'jpeg', width, height
+                length, = struct.unpack('>H', data[index + 2:index + 4])
+                index += 2 + length
+
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            chunk = data[12:16]
+            if chunk == b'VP8 ':
+                width, height = struct.unpack('<HH', data[26:30])
+                return 'webp', width & 0x3fff, height & 0x3fff
+            if chunk == b'VP8L':
+                bits = int.from_bytes(data[21:25], 'little')
+                return 'webp', (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+            if chunk == b'VP8X':
+                return (
+                    'webp',
+                    int.from_bytes(data[24:27], 'little') + 1,
+                    int.from_bytes(data[27:30], 'little') + 1,
+                )
+    except struct.error:
+        pass  # truncated header
+
+    return None, None, None
+
+
+def describe_image(data, content_hash=True):
+    """ Returns the description of an image, as given to `RenderResult`.
+
+    Parameters
+    ----------
+    - `data`: bytes
+    - `content_hash`: bool, optional
+        + Whether to hash the image, which costs much more than reading
+        + its header.
+
+    Returns
+    -------
+    - dict
+        + `format`, `width`, `height`, `byte_length` and, if asked for,
+        + `content_hash` (SHA-256, hexadecimal).
+    """
+    image_format, width, height = image_dimensions(data)
+    description = {
+        'format': image_format,
+        'width': width,
+        'height': height,
+        'byte_length': len(data),
+    }
+    if content_hash:
+        description['content_hash'] = hashlib.sha256(data).hexdigest()
+    return description
+
+
+def _described(name, doc):
+    """ Returns the property of an attribute of `RenderResult`, which is
+        computed from the image on first access if it is not known yet.
+    """
+    def get(self):
+        value = getattr(self, '_' + name)
+        if value is None and not self._described:
+            self._describe()
+            value = getattr(self, '_' + name)
+        return value
+
+    def set(self, value):
+        setattr(self, '_' + name, value)
+
+    return property(get, set, doc=doc)
+
+
+class RenderResult():
+    """
+        Result of one screenshot.
+
+        Attributes
+        ----------
+        - `path` : str or None
+            + Path of the image file.
+        - `data` : bytes or None
+            + The image itself, when it is kept in memory.
+        - `width`, `height` : int or None
+            + Actual dimensions of the image, in pixels.
+        - `format` : str or None
+            + `png`, `jpeg` or `webp`.
+        - `byte_length` : int or None
+            + Size of the image, in bytes.
+        - `content_hash` : str or None
+            + SHA-256 of the image, in hexadecimal, e.g. to deduplicate
+            + images or to use them as cache keys.
+        - `timings` : RenderTimings or None
+            + Durations of the phases of the render, for browsers which
+            + time their screenshots.
+        - `cache_hit` : bool
+            + Whether the image was reused instead of rendered. Always
+            + False for images rendered by html2image, for use by caches
+            + layered on top of it.
+        - `error` : Exception or None
+            + Error which made the screenshot fail, if any. The attributes
+            + describing the image are then None.
+
+        The attributes describing the image which are not given are read
+        from the image (in memory, or else from its file) the first time
+        one of them is accessed. They are None if it cannot be read.
+
+        Results can be used where paths are expected, e.g. `open(result)`.
+    """
+
+    __slots__ = (
+        'path', 'data', '_width', '_height', '_format', '_byte_length',
+        '_content_hash', 'timings', 'cache_hit', 'error', '_described',
+    )
+
+    width = _described('width', 'Width of the image, in pixels.')
+    height = _described('height', 'Height of the image, in pixels.')
+    format = _described('format', '`png`, `jpeg` or `webp`.')
+    byte_length = _described('byte_length', 'Size of the image, in bytes.')
+    content_hash = _described('content_hash', 'SHA-256 of the image.')
+
+    def __init__(self, path=None, data=None, width=None, height=None,
+                 format=None, byte_length=None, content_hash=None,
+                 timings=None, cache_hit=False, error=None):
+        self.path = path
+        self.data = data
+        self._width = width
+        self._height = height
+        self._format = format
+        self._byte_length = byte_length
+        self._content_hash = content_hash
+        self.timings = timings
+        self.cache_hit = cache_hit
+        self.error = error
+        # images of unknown formats have no dimensions, even once read
+        self._described = content_hash is not None or error is not None
+
+    def _describe(self):
+        self._described = True
+        if self.data is None and self.path is None:
+            return
+        try:
+            data = self.read()
+        except OSError:
+            return
+        for name, value in describe_image(data).items():
+            if getattr(self, '_' + name) is None:
+                setattr(self, '_' + name, value)
+
+    @classmethod
+    def from_image(cls, data, path=None, keep_data=False, **kwargs):
+        """ Returns the result of an image, described from its bytes. """
+        return cls(
+            path=path, data=data if keep_data else None,
+            **describe_image(data), **kwargs
+        )
+
+    @classmethod
+    def from_file(cls, path, keep_data=False, **kwargs):
+        """ Returns the result of an image file, described from its bytes.
+        """
+        with open(path, 'rb') as f:
+            return cls.from_image(f.read(), path, keep_data=keep_data, **kwargs)
+
+    @property
+    def ok(self):
+        """ Whether the screenshot succeeded. """
+        return self.error is None
+
+    @property
+    def size(self):
+        """ (width, height) of the image. """
+        return self.width, self.height
+
+    def read(self):
+        """ Returns the image, from memory or from its file. """
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def as_dict(self):
+        """ Returns the result as a JSON serializable dict, without the
+            image itself.
+        """
+        return {
+            'path': self.path,
+            'width': self.width,
+            'height': self.height,
+            'format': self.format,
+            'byte_length': self.byte_length,
+            'content_hash': self.content_hash,
+            'timings': None if self.timings is None else self.timings.as_dict(),
+            'cache_hit': self.cache_hit,
+            'error': None if self.error is None else repr(self.error),
+        }
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'RenderResult({self.path!r}, error={self.error!r})'
+        return (
+            f'RenderResult({self.path!r}, {self.format}, '
+            f'{self.width}x{self.height}, {self.byte_length} bytes)'
+        )
+
+
+class ScreenshotPaths(list):
+    """
+        List of the paths of the images of a `screenshot()` call, which
+        also holds their `RenderResult`, in the same order, in `results`.
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        super().__init__(result.path for result in self.results)
+
+    @property
+    def errors(self):
+        """ Errors of the screenshots which failed. """
+        return [result.error for result in self.results if result.error is not None]
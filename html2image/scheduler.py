@@ -0,0 +1,333 @@
+"""
+Priority scheduler of the html2image package.
+
+Jobs are submitted to named queues. Each queue has a priority, an
+optional limit on the number of its jobs running at the same time, and a
+bounded size: submitting to a full queue blocks or is rejected with
+`queue.Full`. Free workers always take the oldest job of the queue with
+the highest priority (lowest number) that is under its concurrency limit.
+
+Latency-sensitive jobs (e.g. previews) can hence be given a high priority
+queue, while bulk jobs are given a low priority queue whose concurrency
+limit is lower than the number of workers, keeping some capacity free
+for the former:
+
+    scheduler = Scheduler(concurrency=4, queues=[
+        JobQueue('interactive', priority=0),
+        JobQueue('bulk', priority=10, concurrency=3),
+    ])
+    future = scheduler.submit(hti.screenshot, url=url, queue='interactive')
+    paths = future.result()
+"""
+
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+from queue import Full
+
+
+class JobQueue():
+    """
+        Configuration and state of one queue of a `Scheduler`.
+
+        Parameters
+        ----------
+        - `name` : str
+        - `priority` : int, optional
+            + Queues with a lower number are served first.
+        - `concurrency` : int, optional
+            + Maximum number of jobs of this queue running at the same time.
+            + None for no other limit than the one of the scheduler.
+        - `max_size` : int, optional
+            + Maximum number of jobs waiting in this queue, not counting
+            + jobs that can start right away. None for an unbounded queue.
+    """
+
+    def __init__(self, name, priority=0, concurrency=None, max_size=64):
+        if concurrency is not None and concurrency < 1:
+            raise ValueError('`concurrency` should be greater than 0.')
+        if max_size is not None and max_size < 0:
+            raise ValueError('`max_size` should not be negative.')
+
+        self.name = name
+        self.priority = priority
+        self.concurrency = concurrency
+        self.max_size = max_size
+
+        self.jobs = deque()
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def is_full(self):
+        return self.max_size is not None and len(self.jobs) >= self.max_size
+
+    def is_runnable(self):
+        return bool(self.jobs) and (
+            self.concurrency is None or self.active < self.concurrency
+        )
+
+    def stats(self):
+        return {
+            'priority': self.priority,
+            'concurrency': self.concurrency,
+            'max_size': self.max_size,
+            'queued': len(self.jobs),
+            'active': self.active,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+class Scheduler():
+    """
+        Runs jobs with a pool of worker threads, taking them from
+        prioritized and bounded queues.
+
+        Parameters
+        ----------
+        - `concurrency` : int, optional
+            + Number of jobs running at the same time.
+            + Can be changed later with `set_concurrency()`.
+        - `queues` : list of JobQueue, optional
+            + Queues to which jobs can be submitted.
+            + By default, a single queue named `default`.
+    """
+
+    def __init__(self, concurrency=4, queues=None):
+        if concurrency < 1:
+            raise ValueError('`concurrency` should be greater than 0.')
+
+        if queues is None:
+            queues = [JobQueue('default')]
+
+        self.concurrency = concurrency
+        self.queues = {job_queue.name: job_queue for job_queue in queues}
+        if len(self.queues) != len(queues):
+            raise ValueError('Queue names should be unique.')
+
+        # stable sort: queues of equal priority are served in given order
+        self._by_priority = sorted(queues, key=lambda q: q.priority)
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._done_callbacks = []
+
+        self._workers = []
+        self._start_workers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, fn, *args, queue='default', block=True, timeout=None,
+               **kwargs):
+        """ Schedules `fn(*args, **kwargs)`.
+
+            Parameters
+            ----------
+            - `fn` : callable
+            - `queue` : str, optional
+                + Name of the queue to which the job is submitted.
+            - `block` : bool, optional
+                + Whether to wait for room in the queue if it is full,
+                + or to reject the job right away.
+            - `timeout` : float, optional
+                + Maximum number of seconds to wait for room in the queue,
+                + None to wait as long as needed.
+
+            Returns
+            -------
+            - concurrent.futures.Future
+                + Future of the result of the job.
+
+            Raises
+            ------
+            - `queue.Full`
+                + If the queue is full and the job could not be queued.
+            - `ValueError`
+                + If there is no queue named `queue`.
+            - `RuntimeError`
+                + If the scheduler was shut down.
+        """
+        job_queue = self.queues.get(queue)
+        if job_queue is None:
+            raise ValueError(
+                f'Unknown queue {queue!r}, available queues are: '
+                f'{", ".join(self.queues)}.'
+            )
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                if self._shutdown:
+                    raise RuntimeError(
+                        'Cannot schedule new jobs after shutdown.'
+                    )
+
+                if not job_queue.is_full() or self._can_start(job_queue):
+                    break
+
+                remaining = (
+                    None if deadline is None else deadline - time.monotonic()
+                )
+                if not block or (remaining is not None and remaining <= 0):
+                    job_queue.rejected += 1
+                    raise Full(f'The {queue!r} queue is full.')
+
+                self._condition.wait(remaining)
+
+            future = Future()
+            job_queue.jobs.append((future, fn, args, kwargs))
+            self._condition.notify_all()
+
+        return future
+
+    def set_concurrency(self, concurrency):
+        """ Changes the number of jobs running at the same time.
+
+            When lowered, running jobs are not interrupted: fewer jobs
+            are started until the new limit is respected, and the workers
+            in excess stop once their job is done.
+        """
+        if concurrency < 1:
+            raise ValueError('`concurrency` should be greater than 0.')
+
+        with self._condition:
+            self.concurrency = concurrency
+            self._start_workers()
+            self._condition.notify_all()
+
+    def set_queue_concurrency(self, queue, concurrency):
+        """ Changes the maximum number of jobs of a queue running at the
+            same time, None for no other limit than the one of the
+            scheduler.
+        """
+        if concurrency is not None and concurrency < 1:
+            raise ValueError('`concurrency` should be greater than 0.')
+
+        with self._condition:
+            self.queues[queue].concurrency = concurrency
+            self._condition.notify_all()
+
+    def add_done_callback(self, fn):
+        """ Registers a function called after each job, with the name of
+            its queue, its duration in seconds, and its exception or None.
+        """
+        self._done_callbacks.append(fn)
+
+    def stats(self):
+        """ Returns the number of queued, active, completed and rejected
+            jobs of each queue.
+        """
+        with self._condition:
+            return {
+                name: job_queue.stats()
+                for name, job_queue in self.queues.items()
+            }
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """ Stops accepting jobs and stops the workers once the queued
+            jobs are done.
+
+            Parameters
+            ----------
+            - `wait` : bool, optional
+                + Whether to wait for the workers to stop.
+            - `cancel_pending` : bool, optional
+                + Whether to cancel the jobs that did not start yet.
+        """
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending:
+                for job_queue in self._by_priority:
+                    while job_queue.jobs:
+                        job_queue.jobs.popleft()[0].cancel()
+            self._condition.notify_all()
+
+        if wait:
+            with self._condition:
+                workers = list(self._workers)
+            for worker in workers:
+                worker.join()
+
+    def _start_workers(self):
+        while len(self._workers) < self.concurrency:
+            worker = threading.Thread(target=self._work, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _can_start(self, job_queue):
+        """ Returns whether a job submitted to `job_queue` would start
+            right away, in which case it is accepted even by a full queue.
+            `self._condition` must be held by the caller.
+        """
+        busy = sum(len(q.jobs) + q.active for q in self._by_priority)
+        if busy >= self.concurrency:
+            return False
+        return (
+            job_queue.concurrency is None
+            or len(job_queue.jobs) + job_queue.active < job_queue.concurrency
+        )
+
+    def _next_queue(self):
+        """ Returns the queue of the next job to run, or None.
+            `self._condition` must be held by the caller.
+        """
+        if sum(q.active for q in self._by_priority) >= self.concurrency:
+            return None
+
+        for job_queue in self._by_priority:
+            if job_queue.is_runnable():
+                return job_queue
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if len(self._workers) > self.concurrency:
+                        # the concurrency was lowered
+                        self._workers.remove(threading.current_thread())
+                        return
+                    job_queue = self._next_queue()
+                    if job_queue is not None:
+                        break
+                    if self._shutdown and not any(
+                        q.jobs for q in self._by_priority
+                    ):
+                        return
+                    self._condition.wait()
+
+                future, fn, args, kwargs = job_queue.jobs.popleft()
+                job_queue.active += 1
+                self._condition.notify_all()  # room for blocked submitters
+
+            error = None
+            start = time.perf_counter()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        error = e
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._condition:
+                    job_queue.active -= 1
+                    job_queue.completed += 1
+                    self._condition.notify_all()
+
+            if not future.cancelled():
+                for callback in self._done_callbacks:
+                    try:
+                        callback(job_queue.name, elapsed, error)
+                    except Exception:
+                        pass  # a faulty callback must not stop the worker
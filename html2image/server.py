@@ -0,0 +1,444 @@
+"""
+Render server of the html2image package.
+
+Keeps an `Html2Image` instance (and its browser) warm, and exposes the
+parameters of its `screenshot()` method over a local HTTP endpoint, so
+that many short-lived clients can share one render engine.
+
+Endpoints
+---------
+- `POST /screenshot`
+    + JSON body holding `screenshot()` parameters, for one screenshot:
+    + `url`, `html_str`, `html_file`, `other_file` (one of them),
+    + `css_str`, `css_file`, `size` ([width, height]),
+    + `virtual_time_budget` and `browser_context`, and optionally the
+    + `queue` of the render: `interactive` (default) or `bulk`.
+    + Responds with the PNG image. With a tracer (see `Html2Image`),
+    + the spans of the render are children of the span propagated by
+    + the request headers (e.g. `traceparent`), if any.
+- `GET /health`
+    + Responds with the number of active and queued renders.
+- `GET /metrics`
+    + Responds with the metrics of the server in the Prometheus text
+    + exposition format, see `html2image.metrics`.
+"""
+
+import contextlib
+import json
+import os
+import pathlib
+import queue
+import shutil
+import tempfile
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from html2image.autoscale import AdaptiveConcurrency
+from html2image.browsers.browser import CDPBrowser
+from html2image.metrics import (
+    MetricsRegistry, instrument_browser, instrument_scheduler,
+)
+from html2image.scheduler import JobQueue, Scheduler
+from html2image.tracing import attach
+
+SOURCE_PARAMETERS = ('url', 'html_str', 'html_file', 'other_file')
+
+SCREENSHOT_PARAMETERS = SOURCE_PARAMETERS + (
+    'css_str', 'css_file', 'size', 'virtual_time_budget', 'browser_context',
+)
+
+
+def screenshot_kwargs(params, extra_parameters=()):
+    """ Validates JSON parameters describing one screenshot and turns
+        them into `screenshot()` keyword arguments.
+
+    Parameters
+    ----------
+    - `params`: dict
+        + Decoded JSON object.
+    - `extra_parameters`: tuple of str, optional
+        + Other accepted parameters, e.g. `save_as`.
+
+    Raises
+    ------
+    - `ValueError`
+        + If the parameters are invalid.
+    """
+    if not isinstance(params, dict):
+        raise ValueError('Parameters should be a JSON object.')
+
+    unknown = set(params) - set(SCREENSHOT_PARAMETERS) - set(extra_parameters)
+    if unknown:
+        raise ValueError(f'Unknown parameter(s): {", ".join(sorted(unknown))}.')
+
+    sources = [name for name in SOURCE_PARAMETERS if params.get(name)]
+    if len(sources) != 1:
+        raise ValueError(
+            'Exactly one source is required, among: '
+            f'{", ".join(SOURCE_PARAMETERS)}.'
+        )
+
+    for name in sources:
+        if not isinstance(params[name], str):
+            raise ValueError(f'`{name}` should be a string.')
+
+    kwargs = dict(params)
+    if 'size' in kwargs:
+        size = kwargs['size']
+        if (
+            not isinstance(size, list) or len(size) != 2
+            or not all(isinstance(value, int) for value in size)
+        ):
+            raise ValueError('`size` should be a [width, height] list.')
+        kwargs['size'] = tuple(size)
+
+    return kwargs
+
+
+@contextlib.contextmanager
+def staged_sources(hti, kwargs):
+    """ Stages the files of `screenshot()` parameters in a directory of
+        their own, and yields the parameters rendering the staged copies.
+
+        Concurrent screenshots of one instance may be given the same file,
+        or different files of the same name, which would overwrite and
+        remove each other's copy in the shared `temp_path`. The staging
+        directory is removed on exit.
+    """
+    kwargs = dict(kwargs)
+    css_files = kwargs.pop('css_file', None) or []
+    css_files = [css_files] if isinstance(css_files, str) else list(css_files)
+    staging_path = None
+
+    try:
+        source = kwargs.pop('html_file', None) or kwargs.pop('other_file', None)
+        if source is not None:
+            # the HTML file may link to the CSS files, by their name
+            staging_path = tempfile.mkdtemp(prefix='request-', dir=hti.temp_path)
+            for path in css_files + [source]:
+                shutil.copyfile(
+                    path, os.path.join(staging_path, os.path.basename(path)),
+                )
+            kwargs['url'] = pathlib.Path(
+                staging_path, os.path.basename(source),
+            ).resolve().as_uri()
+        elif css_files:
+            css_strings = kwargs.get('css_str') or []
+            css_strings = [css_strings] if isinstance(css_strings, str) else list(css_strings)
+            for path in css_files:
+                with open(path) as f:
+                    css_strings.append(f.read())
+            kwargs['css_str'] = css_strings
+
+        yield kwargs
+    finally:
+        if staging_path is not None:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def render_to_bytes(hti, kwargs, extension='.png'):
+    """ Takes one screenshot and returns the image, without leaving
+        any file behind.
+
+    Parameters
+    ----------
+    - `hti`: Html2Image
+    - `kwargs`: dict
+        + `screenshot()` parameters, as returned by `screenshot_kwargs()`.
+    - `extension`: str, optional
+        + Extension of the image, which defines its format.
+
+    Returns
+    -------
+    - bytes
+
+    Raises
+    ------
+    - `FileNotFoundError`
+        + If a file of the parameters does not exist.
+    - `RuntimeError`
+        + If the browser did not write the screenshot.
+    """
+    # screenshots and HTML strings get unique names, see `staged_sources()`
+    # for files
+    with staged_sources(hti, kwargs) as kwargs:
+        paths = hti.screenshot(save_as=f'{uuid.uuid4().hex}{extension}', **kwargs)
+
+    try:
+        with open(paths[0], 'rb') as f:
+            return f.read()
+    except OSError as e:
+        raise RuntimeError(f'The browser did not write the screenshot: {e}')
+    finally:
+        for path in paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+
+class RenderService():
+    """
+        Renders screenshots with a shared `Html2Image` instance, with a
+        limit on the number of concurrent and queued renders.
+
+        Renders go through two queues of a `Scheduler`: `interactive`
+        renders are always served first, while `bulk` renders only use
+        up to `bulk_concurrency` slots, so that some slots stay free for
+        interactive renders.
+
+        Parameters
+        ----------
+        - `hti` : Html2Image
+            + Instance used to take the screenshots.
+        - `concurrency` : int, optional
+            + Maximum number of screenshots taken at the same time.
+        - `queue_size` : int, optional
+            + Maximum number of renders waiting for a free slot, per queue.
+            + Renders are rejected when their queue is full.
+        - `bulk_concurrency` : int, optional
+            + Maximum number of bulk screenshots taken at the same time.
+            + Default is `concurrency - 1` (at least 1). It is lowered
+            + with the concurrency, see `concurrency_changed()`.
+
+        Attributes
+        ----------
+        - `metrics` : MetricsRegistry
+            + Metrics of the renders, the browser and the queues.
+    """
+
+    def __init__(self, hti, concurrency=4, queue_size=64,
+                 bulk_concurrency=None):
+        if concurrency < 1 or queue_size < 0:
+            raise ValueError(
+                '`concurrency` should be greater than 0 and '
+                '`queue_size` should not be negative.'
+            )
+
+        self.hti = hti
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.bulk_concurrency = bulk_concurrency
+
+        self.scheduler = Scheduler(concurrency, queues=[
+            JobQueue('interactive', priority=0, max_size=queue_size),
+            JobQueue(
+                'bulk', priority=1,
+                concurrency=self._bulk_limit(concurrency), max_size=queue_size,
+            ),
+        ])
+
+        self.metrics = MetricsRegistry()
+        instrument_scheduler(self.metrics, self.scheduler)
+        if hasattr(hti.browser, 'timing_hooks'):
+            instrument_browser(self.metrics, hti.browser)
+
+    def concurrency_changed(self, concurrency):
+        """ Adjusts the bulk queue to a new concurrency of the scheduler,
+            e.g. as set by an `AdaptiveConcurrency` controller.
+        """
+        self.scheduler.set_queue_concurrency('bulk', self._bulk_limit(concurrency))
+
+    def _bulk_limit(self, concurrency):
+        limit = max(concurrency - 1, 1)
+        if self.bulk_concurrency is not None:
+            limit = min(limit, self.bulk_concurrency)
+        return limit
+
+    def stats(self):
+        """ Returns the number of active and queued renders.
+        """
+        queues = self.scheduler.stats()
+        return {
+            'active': sum(q['active'] for q in queues.values()),
+            'queued': sum(q['queued'] for q in queues.values()),
+            'concurrency': self.scheduler.concurrency,
+            'queue_size': self.queue_size,
+            'queues': queues,
+        }
+
+    def render(self, params, trace_parent=None):
+        """ Takes a screenshot and returns the image.
+
+            Parameters
+            ----------
+            - `params` : dict
+                + `screenshot()` parameters, for a single screenshot, and
+                + optionally the `queue` of the render (`interactive`,
+                + the default, or `bulk`).
+            - `trace_parent` : optional
+                + Context of the parent span of the render, see
+                + `html2image.tracing`.
+
+            Returns
+            -------
+            - bytes
+                + The PNG image.
+
+            Raises
+            ------
+            - `queue.Full`
+                + If too many renders are already queued.
+            - `ValueError`
+                + If the parameters are invalid.
+            - `FileNotFoundError`
+                + If a file of the parameters does not exist.
+            - `RuntimeError`
+                + If the screenshot failed.
+        """
+        kwargs = screenshot_kwargs(params, extra_parameters=('queue',))
+        queue_name = kwargs.pop('queue', 'interactive')
+        if not isinstance(queue_name, str):
+            raise ValueError('`queue` should be a string.')
+
+        return self.scheduler.submit(
+            self._render, kwargs, trace_parent,
+            queue=queue_name, block=False,
+        ).result()
+
+    def _render(self, kwargs, trace_parent):
+        # renders run in the threads of the scheduler
+        with attach(trace_parent):
+            return render_to_bytes(self.hti, kwargs)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+        Handles the HTTP requests of a `RenderServer`.
+    """
+
+    server_version = 'html2image'
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.server.service.stats())
+        elif self.path == '/metrics':
+            body = self.server.service.metrics.exposition().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}.'})
+
+    def do_POST(self):
+        if self.path != '/screenshot':
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}.'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+            tracer = self.server.service.hti.tracer
+            image = self.server.service.render(
+                params,
+                trace_parent=tracer.extract(self.headers) if tracer else None,
+            )
+        except queue.Full:
+            self._send_json(503, {'error': 'Too many queued renders.'})
+        except (ValueError, FileNotFoundError) as e:
+            # json.JSONDecodeError is a ValueError
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': f'Could not render: {e}'})
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(image)))
+            self.end_headers()
+            self.wfile.write(image)
+
+    def _send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class RenderServer(ThreadingHTTPServer):
+    """
+        HTTP server exposing a `RenderService`.
+
+        Parameters
+        ----------
+        - `address` : (str, int)
+            + Host and port on which the server listens.
+        - `service` : RenderService
+        - `quiet` : bool, optional
+            + Whether or not to disable the logging of requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, service, quiet=False):
+        super().__init__(address, RenderRequestHandler)
+        self.service = service
+        self.quiet = quiet
+
+
+def serve(hti, host='127.0.0.1', port=8000, concurrency=4, queue_size=64,
+          bulk_concurrency=None, autoscale=False, quiet=False):
+    """ Serves screenshots over HTTP until interrupted.
+
+    The browser of `hti` is started once (for CDP browsers) and stays
+    warm for the whole lifetime of the server.
+
+    Parameters
+    ----------
+    - `hti` : Html2Image
+        + Instance used to take the screenshots.
+    - `host` : str, optional
+        + Default is 127.0.0.1, the server is only reachable locally.
+    - `port` : int, optional
+    - `concurrency` : int, optional
+        + Maximum number of screenshots taken at the same time.
+    - `queue_size` : int, optional
+        + Maximum number of requests waiting for a free slot, per queue.
+    - `bulk_concurrency` : int, optional
+        + Maximum number of bulk screenshots taken at the same time.
+    - `autoscale` : bool, optional
+        + Whether to adjust the number of screenshots taken at the same
+        + time to the load of the host, `concurrency` being the maximum.
+        + See `html2image.autoscale.AdaptiveConcurrency`.
+    - `quiet` : bool, optional
+        + Whether or not to disable the logging of requests.
+    """
+    # CDP browsers can take as many screenshots at once as they have tabs
+    if hasattr(hti.browser, 'max_tabs'):
+        hti.browser.max_tabs = max(hti.browser.max_tabs, concurrency)
+
+    service = RenderService(
+        hti, concurrency=concurrency, queue_size=queue_size,
+        bulk_concurrency=bulk_concurrency,
+    )
+
+    # only CDP browsers run a browser for the lifetime of a `with` block
+    if isinstance(hti.browser, CDPBrowser):
+        warm_browser = hti
+    else:
+        warm_browser = contextlib.nullcontext()
+
+    if autoscale:
+        controller = AdaptiveConcurrency(
+            service.scheduler, max_concurrency=concurrency,
+            on_change=service.concurrency_changed,
+        )
+    else:
+        controller = contextlib.nullcontext()
+
+    with warm_browser, controller:
+        with RenderServer((host, port), service, quiet=quiet) as server:
+            if not quiet:
+                print(f'Serving screenshots on http://{host}:{server.server_port}/')
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                service.scheduler.shutdown(cancel_pending=True)
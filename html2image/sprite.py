@@ -0,0 +1,148 @@
+"""
+Sprite sheet helpers of the html2image package.
+
+Many small HTML snippets are laid out in a grid inside a single document
+(a "sprite sheet"), the sheet is screenshotted once, and the resulting
+bitmap is then sliced into one image per snippet.
+"""
+
+import html
+import math
+
+from textwrap import dedent
+
+try:
+    from PIL import Image
+except ImportError:
+    # Pillow is an optional dependency, only needed to slice sprite sheets
+    Image = None
+
+
+def compute_grid(count, cell_size, max_sheet_size):
+    """ Computes how snippets are laid out on one or more sprite sheets.
+
+    Parameters
+    ----------
+    - `count`: int
+        + Number of snippets to lay out.
+    - `cell_size`: (int, int)
+        + Size of each snippet (and of each output image).
+    - `max_sheet_size`: (int, int)
+        + Maximum size of a sheet, a cell bigger than this
+        + will be alone on its sheet.
+
+    Returns
+    -------
+    - (int, int)
+        + Number of columns of a sheet, and number of cells per sheet.
+
+    Examples
+    --------
+    >>> compute_grid(10, (100, 50), (400, 100))
+    (4, 8)
+
+    >>> compute_grid(3, (100, 50), (4096, 4096))
+    (3, 3)
+    """
+    width, height = cell_size
+    max_width, max_height = max_sheet_size
+
+    columns = max(1, min(count, max_width // width))
+    rows = max(1, min(math.ceil(count / columns), max_height // height))
+
+    return columns, columns * rows
+
+
+def prepare_sprite_html(documents, cell_size, columns):
+    """ Creates an HTML sprite sheet out of complete HTML documents.
+
+    Each document is embedded in its own `<iframe>`, so that it is rendered
+    exactly as it would have been on its own (styles of one snippet do not
+    leak into the others), while the whole sheet only needs one page load.
+
+    Parameters
+    ----------
+    - `documents`: list of str
+        + Complete HTML documents, one per cell.
+    - `cell_size`: (int, int)
+        + Size of each cell.
+    - `columns`: int
+        + Number of cells per row.
+
+    Returns
+    -------
+    - str
+        + The HTML sprite sheet.
+    """
+    width, height = cell_size
+
+    cells = '\n'.join(
+        f'<iframe scrolling="no" srcdoc="{html.escape(document)}"></iframe>'
+        for document in documents
+    )
+
+    prepared_html = f"""\
+    <html>
+    <head>
+      <meta charset="UTF-8">
+        <style>
+            html, body {{ margin: 0; padding: 0; overflow: hidden; }}
+            body {{
+                display: grid;
+                grid-template-columns: repeat({columns}, {width}px);
+                grid-auto-rows: {height}px;
+            }}
+            iframe {{
+                width: {width}px;
+                height: {height}px;
+                border: 0;
+                display: block;
+            }}
+        </style>
+    </head>
+    <body>
+    """
+
+    return dedent(prepared_html) + cells + '\n</body>\n</html>\n'
+
+
+def slice_sprite_sheet(sheet_file, cell_size, columns, output_files):
+    """ Slices a screenshotted sprite sheet into individual images.
+
+    Parameters
+    ----------
+    - `sheet_file`: str
+        + Path of the sprite sheet screenshot.
+    - `cell_size`: (int, int)
+        + Size of each cell.
+    - `columns`: int
+        + Number of cells per row.
+    - `output_files`: list of str
+        + Paths of the images, in the same order as the cells.
+        + The image format is deduced from the file extension.
+
+    Raises
+    ------
+    - `ImportError`
+        + If Pillow is not installed.
+    """
+    if Image is None:
+        raise ImportError(
+            'Pillow is required to slice sprite sheets, '
+            'install it with `pip install html2image[sprite]`.'
+        )
+
+    width, height = cell_size
+
+    with Image.open(sheet_file) as sheet:
+        sheet.load()
+        for i, output_file in enumerate(output_files):
+            x = (i % columns) * width
+            y = (i // columns) * height
+            cell = sheet.crop((x, y, x + width, y + height))
+
+            # formats such as JPEG do not support transparency
+            if output_file.lower().endswith(('.jpg', '.jpeg')):
+                cell = cell.convert('RGB')
+
+            cell.save(output_file)
@@ -0,0 +1,194 @@
+"""
+Tracing of the render pipeline of the html2image package.
+
+With a tracer, each screenshot emits a span, and its steps emit child
+spans: preparing the HTML, staging files in the temporary directory,
+then the phases timed by the browser (see `html2image.browsers.timings`)
+such as launching the browser or acquiring a tab, navigating, waiting
+for the load, capturing and writing the image.
+
+Tracers implement the small `Tracer` interface, and `OpenTelemetryTracer`
+adapts an OpenTelemetry tracer to it (`pip install opentelemetry-api`).
+The parent of the spans of a screenshot is, in this order, the context
+given to `attach()`, the span which is current in the calling thread,
+or the current OpenTelemetry span:
+
+    hti = Html2Image(tracer=OpenTelemetryTracer())
+
+    with attach(parent_context):
+        hti.screenshot(url='https://www.python.org')
+"""
+
+import threading
+
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    # OpenTelemetry is an optional dependency, only needed by its adapter
+    otel_propagate = otel_trace = None
+
+# context of the current span of each thread
+_current = threading.local()
+
+
+class Span():
+    """
+        Span started by a `Tracer`, this base class does nothing.
+
+        Attributes
+        ----------
+        - `context`
+            + Opaque context of the span, given as `parent` to start
+            + child spans.
+    """
+
+    context = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+class Tracer():
+    """
+        Interface of the tracers of html2image, this base class does
+        nothing.
+    """
+
+    def start_span(self, name, parent=None, attributes=None):
+        """ Starts a span, which is ended by calling its `end()` method.
+
+            Parameters
+            ----------
+            - `name` : str
+            - `parent` : optional
+                + Context of the parent span, as given by `Span.context`,
+                + `extract()` or `current_context()`. None for the
+                + default parent of the tracer.
+            - `attributes` : dict, optional
+
+            Returns
+            -------
+            - `Span`
+        """
+        return Span()
+
+    def extract(self, carrier):
+        """ Returns the context propagated by a dict-like carrier,
+            e.g. HTTP headers (`traceparent`), or None.
+        """
+        return None
+
+
+def current_context():
+    """ Returns the context of the current span of the calling thread,
+        or None.
+    """
+    return getattr(_current, 'context', None)
+
+
+@contextmanager
+def attach(context):
+    """ Makes `context` the parent of the spans started in the calling
+        thread within the `with` block.
+    """
+    previous = current_context()
+    _current.context = context
+    try:
+        yield
+    finally:
+        _current.context = previous
+
+
+@contextmanager
+def span(tracer, name, **attributes):
+    """ Context manager running its block in a span, child of the current
+        span of the calling thread. Does nothing if `tracer` is None.
+
+        Yields
+        ------
+        - `Span`
+    """
+    if tracer is None:
+        yield Span()
+        return
+
+    current = tracer.start_span(
+        name, parent=current_context(), attributes=attributes,
+    )
+    try:
+        with attach(current.context):
+            yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        current.end()
+
+
+class _OpenTelemetrySpan(Span):
+    def __init__(self, span, parent):
+        self.span = span
+        self.context = otel_trace.set_span_in_context(span, parent)
+
+    def set_attribute(self, key, value):
+        self.span.set_attribute(key, value)
+
+    def record_exception(self, exception):
+        self.span.record_exception(exception)
+        self.span.set_status(otel_trace.Status(
+            otel_trace.StatusCode.ERROR, f'{type(exception).__name__}: {exception}',
+        ))
+
+    def end(self):
+        self.span.end()
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+        Emits the spans of html2image with OpenTelemetry.
+
+        Contexts are OpenTelemetry `Context` objects. Without a parent,
+        spans are children of the current OpenTelemetry span.
+
+        Parameters
+        ----------
+        - `tracer` : opentelemetry.trace.Tracer, optional
+            + Default is the `html2image` tracer of the global tracer
+            + provider.
+
+        Raises
+        ------
+        - `ImportError`
+            + If OpenTelemetry is not installed.
+    """
+
+    def __init__(self, tracer=None):
+        if otel_trace is None:
+            raise ImportError(
+                'The OpenTelemetry adapter requires the opentelemetry-api '
+                'package: pip install html2image[otel]'
+            )
+        self.tracer = tracer or otel_trace.get_tracer('html2image')
+
+    def start_span(self, name, parent=None, attributes=None):
+        # OpenTelemetry does not accept None values
+        attributes = {
+            key: value for key, value in (attributes or {}).items()
+            if value is not None
+        }
+        return _OpenTelemetrySpan(
+            self.tracer.start_span(name, context=parent, attributes=attributes),
+            parent,
+        )
+
+    def extract(self, carrier):
+        return otel_propagate.extract(carrier)
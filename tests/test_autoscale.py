@@ -0,0 +1,83 @@
+from html2image import Html2Image, autoscale
+from html2image.autoscale import AdaptiveConcurrency
+from html2image.scheduler import Scheduler
+from html2image.server import RenderService
+
+import threading
+import time
+
+
+def wait_for_active_jobs(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()['default']['active'] != count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_adaptive_concurrency(monkeypatch):
+    monkeypatch.setattr(autoscale, 'read_cpu_times', lambda: None)
+    monkeypatch.setattr(autoscale, 'read_load_per_cpu', lambda: 0.1)
+    monkeypatch.setattr(autoscale, 'read_available_memory', lambda: 2 ** 40)
+
+    gate = threading.Event()
+    scheduler = Scheduler(concurrency=2)
+
+    try:
+        controller = AdaptiveConcurrency(
+            scheduler, max_concurrency=4, target_latency=60,
+        )
+
+        # additive increase while jobs are waiting for a slot
+        for _ in range(8):
+            scheduler.submit(gate.wait)
+        wait_for_active_jobs(scheduler, 2)
+        assert controller.adjust() == 3
+        wait_for_active_jobs(scheduler, 3)
+        assert controller.adjust() == 4
+        wait_for_active_jobs(scheduler, 4)
+        assert controller.adjust() == 4  # max_concurrency
+
+        # multiplicative decrease when the host is overloaded
+        monkeypatch.setattr(autoscale, 'read_load_per_cpu', lambda: 2.0)
+        assert controller.adjust() == 3
+        assert controller.last_reason.startswith('cpu')
+
+        monkeypatch.setattr(autoscale, 'read_load_per_cpu', lambda: 0.1)
+        monkeypatch.setattr(autoscale, 'read_available_memory', lambda: 0)
+        assert controller.adjust() == 2
+        assert controller.last_reason.startswith('available memory')
+
+        monkeypatch.setattr(
+            autoscale, 'read_available_memory', lambda: 2 ** 40
+        )
+        controller.target_latency = 0
+        gate.set()
+        scheduler.shutdown()
+        assert controller.adjust() == 1
+        assert controller.last_reason.startswith('latency')
+        assert controller.adjust() == 1  # min_concurrency
+    finally:
+        gate.set()
+        scheduler.shutdown()
+
+
+def test_autoscaled_server_keeps_a_slot_for_interactive_renders(monkeypatch):
+    monkeypatch.setattr(autoscale, 'read_cpu_times', lambda: None)
+    monkeypatch.setattr(autoscale, 'read_load_per_cpu', lambda: 1.0)
+    monkeypatch.setattr(autoscale, 'read_available_memory', lambda: 2 ** 40)
+
+    service = RenderService(Html2Image(browser='fake-cdp'), concurrency=8)
+    try:
+        controller = AdaptiveConcurrency(
+            service.scheduler, max_concurrency=8,
+            on_change=service.concurrency_changed,
+        )
+        assert service.scheduler.queues['bulk'].concurrency == 7
+
+        # the host is overloaded: 8 -> 6 -> 4
+        controller.adjust()
+        controller.adjust()
+        assert service.scheduler.concurrency == 4
+        assert service.scheduler.queues['bulk'].concurrency == 3
+    finally:
+        service.scheduler.shutdown()
@@ -0,0 +1,112 @@
+from html2image import Html2Image
+from html2image.batch import read_jobs, run_batch
+from PIL import Image
+
+import io
+import json
+import os
+import threading
+import urllib.request
+
+import pytest
+
+OUTPUT_PATH = "tests_output"
+
+
+def test_batch():
+    hti = Html2Image(output_path=OUTPUT_PATH, disable_logging=True)
+
+    manifest = io.StringIO(
+        '{"html_str": "A", "css_str": "body {background: blue;}", "size": [100, 50], "id": "a"}\n'
+        '\n'
+        '{"html_str": "B", "save_as": "batch_b.png"}\n'
+        '{"html_file": "./does/not/exist.html"}\n'
+        'this is not json\n'
+    )
+    results = io.StringIO()
+
+    succeeded, failed = run_batch(
+        hti, read_jobs(manifest), results, parallelism=2,
+    )
+    assert (succeeded, failed) == (2, 2)
+
+    results = sorted(
+        (json.loads(line) for line in results.getvalue().splitlines()),
+        key=lambda result: result['index'],
+    )
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+
+    assert results[0]['id'] == 'a'
+    assert results[0]['error'] is None
+    img = Image.open(results[0]['path'])
+    assert (100, 50) == img.size
+    assert img.load()[0, 0][:3] == (0, 0, 255)
+
+    assert results[1]['path'].endswith('batch_b.png')
+
+    assert results[2]['error'].startswith('FileNotFoundError')
+    assert results[3]['error'].startswith('ValueError')
+
+
+def test_batch_output_error():
+    class Renderer():
+        def screenshot(self, save_as, **kwargs):
+            return [save_as]
+
+    class BrokenOutput():
+        def write(self, data):
+            raise OSError('No space left on device')
+
+    jobs = ({'html_str': str(i)} for i in range(100))
+    with pytest.raises(OSError, match='No space left'):
+        run_batch(Renderer(), jobs, BrokenOutput(), parallelism=2)
+
+
+def test_batch_image_not_written(tmp_path, monkeypatch):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    # a browser exiting without writing its screenshot
+    monkeypatch.setattr(hti.browser, 'screenshot', lambda *args, **kwargs: None)
+
+    results = io.StringIO()
+    succeeded, failed = run_batch(
+        hti, read_jobs(io.StringIO('{"html_str": "A"}\n')), results,
+    )
+
+    assert (succeeded, failed) == (0, 1)
+    result = json.loads(results.getvalue())
+    assert result['path'] is None
+    assert result['error'].startswith('FileNotFoundError')
+
+
+def test_batch_stages_files_per_job(tmp_path, monkeypatch):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'page.html').write_text(f'<p>{name}</p>')
+
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path), temp_path=str(tmp_path / 'temp'),
+    )
+    both_staged = threading.Barrier(2)
+
+    def screenshot(input, output_path, output_file, **kwargs):
+        both_staged.wait(timeout=5)
+        with urllib.request.urlopen(input) as f:
+            content = f.read().decode()
+        with open(os.path.join(output_path, output_file), 'w') as f:
+            f.write(content)
+
+    monkeypatch.setattr(hti.browser, 'screenshot', screenshot)
+
+    # two files of the same name, rendered at the same time
+    manifest = io.StringIO(''.join(
+        json.dumps({'html_file': str(tmp_path / name / 'page.html'), 'id': name}) + '\n'
+        for name in ('a', 'b')
+    ))
+    results = io.StringIO()
+    assert run_batch(hti, read_jobs(manifest), results, parallelism=2) == (2, 0)
+
+    for line in results.getvalue().splitlines():
+        result = json.loads(line)
+        with open(result['path']) as f:
+            assert f.read() == f'<p>{result["id"]}</p>'
+    assert not os.listdir(hti.temp_path)
@@ -0,0 +1,36 @@
+from urllib.request import urlopen
+
+from html2image.bench import FixtureServer, compare, summarize
+
+
+def test_fixture_server():
+    with FixtureServer() as server:
+        with urlopen(server.url('/simple.html')) as response:
+            assert b'/style.css' in response.read()
+        with urlopen(server.url('/big.html')) as response:
+            assert response.headers['Content-Type'].startswith('text/html')
+
+
+def test_summarize():
+    stats = summarize([0.3, 0.1, 0.2, 0.4])
+    assert stats['samples'] == [0.3, 0.1, 0.2, 0.4]
+    assert (stats['min'], stats['median'], stats['p95'], stats['max']) == (
+        0.1, 0.25, 0.4, 0.4,
+    )
+
+
+def test_compare():
+    baseline = {'scenarios': {
+        'warm_single': {'median': 0.1},
+        'batch_c4': {'median': 1.0, 'throughput': 16.0},
+        'big_page': {'median': 0.5},
+    }}
+    results = {'scenarios': {
+        'warm_single': {'median': 0.105},  # within the tolerance
+        'batch_c4': {'median': 0.9, 'throughput': 12.0},
+        'css_heavy': {'median': 0.2},  # not in the baseline
+    }}
+    assert compare(results, baseline, tolerance=0.1) == [{
+        'scenario': 'batch_c4', 'metric': 'throughput',
+        'baseline': 16.0, 'current': 12.0, 'change': -0.25,
+    }]
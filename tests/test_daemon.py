@@ -0,0 +1,94 @@
+import os
+import stat
+import threading
+
+import pytest
+
+from html2image import cli, daemon
+
+pytestmark = pytest.mark.skipif(not daemon.is_supported(), reason='requires Unix sockets')
+
+
+def test_daemon_socket(tmp_path):
+    socket_path = str(tmp_path / 'private' / 'daemon.sock')
+    server = daemon.DaemonServer(socket_path, lambda args: 0)
+    thread = threading.Thread(target=server.serve_until_stopped)
+    thread.start()
+
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(tmp_path / 'private').st_mode) & 0o077 == 0
+        assert daemon.send_request(socket_path, {'command': 'ping'}) == {'code': 0, 'output': ''}
+
+        # a live daemon is not replaced
+        with pytest.raises(FileExistsError):
+            daemon.DaemonServer(socket_path, lambda args: 0)
+    finally:
+        assert daemon.stop_daemon(socket_path)
+        thread.join()
+
+    assert not os.path.exists(socket_path)
+
+
+def test_daemon_runs_requests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # restored after the daemon changed it
+    work = tmp_path / 'work'
+    work.mkdir()
+
+    def run(args):
+        print(f'{args["name"]} in {os.getcwd()}')
+        if args['name'] == 'broken':
+            raise ValueError('Cannot run.')
+        return 3
+
+    socket_path = str(tmp_path / 'private' / 'daemon.sock')
+    server = daemon.DaemonServer(socket_path, run)
+    thread = threading.Thread(target=server.serve_until_stopped)
+    thread.start()
+
+    try:
+        request = {'args': {'name': 'a'}, 'cwd': str(work)}
+        assert daemon.send_request(socket_path, request) == {
+            'code': 3, 'output': f'a in {work}\n',
+        }
+
+        request = {'args': {'name': 'broken'}, 'cwd': str(work)}
+        response = daemon.send_request(socket_path, request)
+        assert response['code'] == 1
+        assert 'Cannot run.' in response['output']
+    finally:
+        assert daemon.stop_daemon(socket_path)
+        thread.join()
+
+
+def test_daemon_socket_directory(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    with pytest.raises(PermissionError):
+        daemon.DaemonServer(str(shared / 'daemon.sock'), lambda args: 0)
+
+
+def test_daemon_instances_are_not_left_verbose(tmp_path, monkeypatch):
+    parsed = []
+    monkeypatch.setattr(cli, 'run', lambda args: parsed.append(args) or 0)
+    for verbose in (['--verbose'], []):
+        cli.main([
+            '--browser', 'fake-cdp', '--url', 'https://example.com',
+            '--output-path', str(tmp_path), '--no-daemon', *verbose,
+        ])
+    monkeypatch.undo()
+
+    # as run by the daemon, which reuses its instances
+    instances = {}
+    try:
+        assert cli.run(parsed[0], instances=instances) == 0
+        hti, = instances.values()
+        assert not hti.browser.print_command
+
+        assert cli.run(parsed[1], instances=instances) == 0
+        assert list(instances.values()) == [hti]
+    finally:
+        for hti in instances.values():
+            hti.__exit__(None, None, None)
@@ -0,0 +1,91 @@
+from html2image.distributed import Coordinator, Worker
+
+import threading
+
+import pytest
+
+
+def start_worker(coordinator, render, **kwargs):
+    kwargs.setdefault('token', coordinator.token)
+    worker = Worker(coordinator.address, render, heartbeat_interval=0.1, **kwargs)
+    threading.Thread(target=worker.run, daemon=True).start()
+    return worker
+
+
+def test_distributed_jobs():
+    def render(params):
+        if params['html_str'] == 'fail':
+            raise ValueError('Cannot render.')
+        return params['html_str'].encode()
+
+    with Coordinator(port=0) as coordinator:
+        for _ in range(3):
+            start_worker(coordinator, render, concurrency=2)
+
+        futures = [
+            coordinator.submit({'html_str': f'job {i}'}) for i in range(20)
+        ]
+        failing = coordinator.submit({'html_str': 'fail'})
+
+        for i, future in enumerate(futures):
+            assert future.result(timeout=5) == f'job {i}'.encode()
+
+        with pytest.raises(RuntimeError, match='Cannot render'):
+            failing.result(timeout=5)
+
+        with pytest.raises(ValueError):
+            coordinator.submit({})
+
+
+def test_distributed_dead_worker():
+    received = threading.Event()
+    release = threading.Event()
+
+    def stuck_render(params):
+        received.set()
+        release.wait()
+        return b'too late'
+
+    with Coordinator(port=0, heartbeat_timeout=5) as coordinator:
+        stuck_worker = start_worker(coordinator, stuck_render)
+        future = coordinator.submit({'html_str': 'Hello'})
+        assert received.wait(timeout=5)
+
+        # the job held by the dead worker is handed out to the next one
+        stuck_worker.stop()
+        start_worker(coordinator, lambda params: b'Hello')
+        assert future.result(timeout=5) == b'Hello'
+
+        release.set()
+
+
+def test_distributed_stuck_worker():
+    received = threading.Event()
+    release = threading.Event()
+
+    def stuck_render(params):
+        received.set()
+        release.wait()
+        return b'too late'
+
+    with Coordinator(port=0, job_timeout=0.5) as coordinator:
+        # the worker keeps sending heartbeats, but its render never ends
+        start_worker(coordinator, stuck_render)
+        future = coordinator.submit({'html_str': 'Hello'})
+        assert received.wait(timeout=5)
+
+        start_worker(coordinator, lambda params: b'Hello')
+        assert future.result(timeout=5) == b'Hello'
+
+        release.set()
+
+
+def test_distributed_wrong_token():
+    with Coordinator(port=0) as coordinator:
+        worker = Worker(coordinator.address, lambda params: b'', token='wrong')
+        with pytest.raises(PermissionError):
+            worker.run(reconnect_delay=0.1)
+        assert not coordinator.stats()['workers']
+
+    with pytest.raises(ValueError):
+        Worker(coordinator.address, lambda params: b'')
@@ -0,0 +1,204 @@
+import base64
+import io
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from html2image import Html2Image
+from html2image.browsers.cdp_pool import TabPool
+from html2image.browsers.fake_cdp import FakeCDP
+from html2image.browsers.timings import RenderTimings
+
+
+def test_screenshots(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        paths = hti.screenshot(
+            html_str=['<h1>A</h1>', '<h1>B</h1>'], url='https://example.com',
+            size=(320, 200),
+        )
+        counts = hti.browser.server.command_counts
+
+    assert len(paths) == 3
+    for path in paths:
+        with Image.open(path) as image:
+            assert image.size == (320, 200)
+    # the viewport of the reused tab is only set once
+    assert counts['Emulation.setDeviceMetricsOverride'] == 1
+    assert counts['Page.captureScreenshot'] == 3
+
+
+def test_negative_virtual_time_budget(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        with pytest.raises(ValueError, match='virtual_time_budget'):
+            hti.screenshot(html_str='<p>Hello</p>', virtual_time_budget=-1)
+        assert 'Page.navigate' not in hti.browser.server.command_counts
+
+
+def test_browser_contexts(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    hti.browser.max_tabs = 4
+
+    with hti:
+        browser, server = hti.browser, hti.browser.server
+        for name in ('a', 'b', 'a'):
+            hti.screenshot(url='https://example.com', save_as=f'{name}.png', browser_context=name)
+
+        # each browser context is created once, and its pages are only
+        # rendered in tabs of their own context
+        a, b = browser.get_browser_context_id('a'), browser.get_browser_context_id('b')
+        assert a != b
+        assert server.command_counts['Target.createBrowserContext'] == 2
+        assert sorted(server.targets.values()) == sorted([a, b])
+
+        # cookies are kept per browser context
+        for context_id in (a, b):
+            browser.cdp_call('Storage.setCookies', browserContextId=context_id, cookies=[
+                {'name': 'session', 'value': context_id, 'domain': 'example.com'},
+            ])
+        for context_id in (a, b):
+            cookies = browser.cdp_call('Storage.getCookies', browserContextId=context_id)['cookies']
+            assert [cookie['value'] for cookie in cookies] == [context_id]
+
+        # disposing of a browser context closes its tabs, and deletes its
+        # data: it is created again when next used
+        browser.dispose_browser_context('a')
+        assert server.command_counts['Target.disposeBrowserContext'] == 1
+        assert list(server.targets.values()) == [b]
+        assert not browser.cdp_call('Storage.getCookies', browserContextId=a)['cookies']
+        assert browser.cdp_call('Storage.getCookies', browserContextId=b)['cookies']
+
+        hti.screenshot(url='https://example.com', save_as='a.png', browser_context='a')
+        assert browser.get_browser_context_id('a') not in (a, b)
+        assert server.command_counts['Target.createBrowserContext'] == 3
+
+
+def test_pooled_tabs_are_isolated(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        browser = hti.browser
+        counts = browser.server.command_counts
+        pool = TabPool(browser.connection, browser.cdp_port, max_tabs=4)
+
+        # tabs of the default browser context do not share their cookies
+        first, second = pool.acquire(), pool.acquire()
+        assert first.own_context_id is not None
+        assert first.own_context_id != second.own_context_id
+        pool.release(first)
+        assert counts['Storage.clearCookies'] == 1
+        assert pool.acquire() is first
+
+        # a named browser context is only wiped once none of its tabs render
+        tenant = browser.get_browser_context_id('tenant')
+        third, fourth = pool.acquire(tenant), pool.acquire(tenant)
+        assert third.own_context_id is None
+        pool.release(third)
+        assert counts['Storage.clearCookies'] == 1
+        pool.release(fourth)
+        assert counts['Storage.clearCookies'] == 2
+        pool.close()
+
+
+def test_capture_format_follows_extension(tmp_path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, format='webp')
+    calls = []
+
+    class Tab():
+        device_metrics = (8, 8)
+
+        def call(self, method, **params):
+            calls.append(params)
+            return {'data': base64.b64encode(buffer.getvalue()).decode()}
+
+    browser = FakeCDP()
+    browser.image_quality = 90
+    timings = RenderTimings()
+    browser._capture(Tab(), str(tmp_path), 'page.webp', (8, 8), timings)
+    browser._capture(Tab(), str(tmp_path), 'page.png', (8, 8), timings)
+
+    assert calls == [{'format': 'webp', 'quality': 90}, {'format': 'png'}]
+    assert timings.images[str(tmp_path / 'page.webp')]['format'] == 'webp'
+
+
+def test_screenshot_template(tmp_path):
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path), temp_path=str(tmp_path / 'temp'),
+    )
+    records = [{'title': 'First'}, {'title': 'Second "quoted"'}]
+
+    with hti:
+        paths = hti.screenshot_template(
+            records, html_str='<h1 data-hti-field="title"></h1>',
+            css_str='h1 {color: red;}', save_as='card.png', size=(200, 100),
+        )
+        counts = hti.browser.server.command_counts
+        expressions = hti.browser.server.expressions
+
+    # the template is loaded once (then about:blank, when its tab is
+    # released), and each record is applied to it
+    assert counts['Page.navigate'] == 2
+    assert counts['Page.captureScreenshot'] == 2
+    assert paths == [str(tmp_path / 'card_0.png'), str(tmp_path / 'card_1.png')]
+    for record, path in zip(records, paths):
+        assert any(json.dumps(record) in expression for expression in expressions)
+        with Image.open(path) as image:
+            assert image.size == (200, 100)
+
+    # the staged template is removed
+    assert not os.listdir(tmp_path / 'temp')
+
+
+def test_concurrent_sprites(tmp_path):
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path), temp_path=str(tmp_path / 'temp'),
+    )
+
+    def render(name):
+        return hti.screenshot_sprite(
+            html_str=['<p>A</p>', '<p>B</p>', '<p>C</p>'], save_as=f'{name}.png',
+            size=(40, 20), max_sheet_size=(80, 20),
+        )
+
+    with hti, ThreadPoolExecutor(max_workers=2) as executor:
+        first, second = executor.map(render, ['first', 'second'])
+
+    for path in first + second:
+        with Image.open(path) as image:
+            assert image.size == (40, 20)
+    # each call staged its sheets in a directory of its own
+    assert not os.listdir(tmp_path / 'temp')
+
+
+def test_browser_is_recycled(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    hti.browser.max_pages = 2
+    hti.browser.load_latency = 0.02  # lets concurrent screenshots overlap
+
+    with hti:
+        hti.screenshot(html_str=['<p>1</p>', '<p>2</p>', '<p>3</p>'], save_as='page.png')
+        assert hti.browser.restarts == 1
+        first_server = hti.browser.server
+
+        # screenshots queued while the browser is drained proceed once
+        # it is replaced
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            timings = list(executor.map(
+                lambda i: hti.screenshot_url('https://example.com', f'url_{i}.png', size=(64, 32)),
+                range(12),
+            ))
+        assert hti.browser.restarts > 1
+        assert hti.browser.server is not first_server
+
+    assert all(timing.attempts == 1 for timing in timings)
+    for i in range(12):
+        with Image.open(tmp_path / f'url_{i}.png') as image:
+            assert image.size == (64, 32)
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from html2image import Html2Image
+from html2image.jobs import RenderJob
+from html2image.naming import NameTemplate
+from html2image.results import RenderResult
+
+
+def test_render_job():
+    assert RenderJob('https://example.com').kind == 'url'
+    assert RenderJob('data:text/html,<p>a</p>').kind == 'url'
+    assert RenderJob('<p>https://example.com</p>').kind == 'html_str'
+
+    job = RenderJob('a.css', options={'css_str': 'p {}', 'css_file': ['a.css']})
+    assert job.css() == (('p {}',), ('a.css',))
+
+    with pytest.raises(ValueError):
+        RenderJob('page.html', kind='file')
+    with pytest.raises(ValueError):
+        RenderJob('<p>a</p>', options={'save_as': 'a.png'})
+
+
+def test_render_lazily(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    taken = []
+
+    def generate_jobs():
+        for index in range(3):
+            taken.append(index)
+            yield RenderJob(f'<p>{index}</p>', size=(32, 16), output=f'page.v{index}.png')
+        yield RenderJob(str(tmp_path / 'missing.html'), kind='html_file', size=(32, 16))
+
+    with hti:
+        results = hti.render(generate_jobs())
+        first = next(results)
+        # each job is rendered before the next one is taken
+        assert taken == [0]
+        assert first.path == str(tmp_path / 'page.v0.png') and first.size == (32, 16)
+        *rendered, failed = results
+
+    assert [result.path for result in rendered] == [
+        str(tmp_path / 'page.v1.png'), str(tmp_path / 'page.v2.png'),
+    ]
+    assert failed.path == str(tmp_path / 'screenshot_3.png')
+    assert isinstance(failed.error, FileNotFoundError)
+
+
+def test_dotted_save_as():
+    assert Html2Image._extend_save_as_param(['report.v2.png'], 2) == [
+        'report.v2_0.png', 'report.v2_1.png',
+    ]
+
+
+def test_name_templates(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    jobs = [
+        RenderJob('<p>a</p>', size=(32, 16)),
+        RenderJob('<p>b</p>', size=(32, 16), output='pages/b.png'),
+        RenderJob('<p>c</p>', size=(32, 16)),
+    ]
+
+    with hti:
+        hashed = list(hti.render(jobs, name_template='{hash[:2]}/{hash}.png'))
+        indexed = list(hti.render(jobs[:1], name_template='{index:04d}/{index}.png'))
+
+    # the fake browser draws images of the same size identically
+    first, second, third = hashed
+    digest = first.content_hash
+    assert first.path == third.path == str(tmp_path / digest[:2] / f'{digest}.png')
+    assert second.path == str(tmp_path / 'pages' / 'b.png')
+    assert indexed[0].path == str(tmp_path / '0000' / '0.png')
+    assert sorted(os.listdir(tmp_path)) == ['0000', digest[:2], 'pages']
+
+    for template in ('{missing}.png', '../{index}.png', '{hash:d}.png'):
+        with pytest.raises(ValueError):
+            NameTemplate(template)
+
+
+def test_outputs_sharing_a_basename(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    jobs = [
+        RenderJob('<p>a</p>', size=(32, 16), output='b.png'),
+        RenderJob('<p>b</p>', size=(64, 16), output='pages/b.png'),
+    ]
+
+    with hti:
+        root, nested = hti.render(jobs)
+
+    assert root.ok and nested.ok
+    assert sorted(os.listdir(tmp_path)) == ['b.png', 'pages']
+    assert RenderResult.from_file(root.path).size == (32, 16)
+    assert RenderResult.from_file(nested.path).size == (64, 16)
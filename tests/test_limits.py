@@ -0,0 +1,76 @@
+from html2image.browsers.errors import (
+    ResourceLimitError, ResourceLimitsUnavailableError,
+)
+from html2image.browsers.limits import LEAF_CGROUP, ResourceLimits, current_cgroup
+
+import os
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith('linux'), reason='Linux only',
+)
+
+
+def test_cpu_time_limit():
+    limits = ResourceLimits(cpu_time=1)
+
+    proc = limits.popen([sys.executable, '-c', 'while True: pass'])
+    proc.wait()
+
+    with pytest.raises(ResourceLimitError) as e:
+        limits.check(proc)
+    assert e.value.limit == 'cpu_time'
+
+    proc = limits.popen([sys.executable, '-c', 'pass'])
+    assert proc.wait() == 0
+    limits.check(proc)
+
+
+def test_cgroup_unavailable(tmp_path):
+    limits = ResourceLimits(
+        memory=256 * 1024 * 1024, cgroup_parent=str(tmp_path / 'missing'),
+    )
+    with pytest.raises(ResourceLimitsUnavailableError):
+        limits.popen([sys.executable, '-c', 'pass'])
+
+
+def _cgroup_writable():
+    cgroup = current_cgroup()
+    if cgroup is None or not os.access(cgroup, os.W_OK):
+        return False
+    if os.path.basename(cgroup) == LEAF_CGROUP:
+        return True
+    # the current process is the only one it has to move out of its cgroup
+    with open(os.path.join(cgroup, 'cgroup.procs')) as f:
+        return f.read().split() == [str(os.getpid())]
+
+
+@pytest.mark.skipif(not _cgroup_writable(), reason='requires a writable cgroup v2')
+def test_cgroup_limits():
+    limits = ResourceLimits(memory=64 * 1024 * 1024, processes=16)
+
+    proc = limits.popen([sys.executable, '-c', 'bytearray(512 * 1024 * 1024)'])
+    cgroup = proc.cgroup
+    assert os.path.isdir(cgroup)
+    proc.wait()
+
+    with pytest.raises(ResourceLimitError) as e:
+        limits.check(proc)
+    assert e.value.limit == 'memory'
+
+    limits.cleanup(proc)
+    assert not os.path.exists(cgroup)
+
+
+def test_leave_populated_cgroup(tmp_path):
+    # cgroup v2 does not enable controllers for the children of cgroups
+    # holding processes, which the current process cannot all move away
+    (tmp_path / 'cgroup.procs').write_text(f'{os.getpid()}\n1\n')
+    with pytest.raises(ResourceLimitsUnavailableError):
+        ResourceLimits._leave_cgroup(str(tmp_path))
+
+    (tmp_path / 'cgroup.procs').write_text(f'{os.getpid()}\n')
+    ResourceLimits._leave_cgroup(str(tmp_path))
+    assert (tmp_path / LEAF_CGROUP / 'cgroup.procs').read_text() == str(os.getpid())
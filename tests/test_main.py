@@ -144,6 +144,32 @@ def test_screenshot_string_different_sizes(browser):
         img = Image.open(path)
         assert wanted_size == img.size
 
+
+@pytest.mark.parametrize("browser", TEST_BROWSERS)
+def test_screenshot_string_virtual_time_budget(browser):
+    hti = Html2Image(browser=browser, output_path=OUTPUT_PATH, disable_logging=True)
+
+    # the background only turns blue after 5 (virtual) seconds
+    html = """
+    <script>
+        setTimeout(() => { document.body.style.background = 'blue'; }, 5000);
+    </script>
+    """
+
+    paths = hti.screenshot(
+        html_str=html,
+        save_as="virtual_time_budget.png",
+        size=(100, 100),
+        virtual_time_budget=10000,
+    )
+
+    img = Image.open(paths[0])
+    pixels = img.load()
+
+    assert (100, 100) == img.size
+    assert pixels[50, 50][:3] == (0, 0, 255)
+
+
 @pytest.mark.parametrize("browser", TEST_BROWSERS)
 def test_screenshot_other_svg(browser):
     hti = Html2Image(browser=browser, output_path=OUTPUT_PATH, disable_logging=True)
@@ -343,3 +369,32 @@ def test_extend_save_as_param(browser):
 
     assert hti._extend_save_as_param(['a.png', 'b.png', None, 65], 2) == \
         ['a.png', 'b.png']
+
+
+@pytest.mark.parametrize("browser", TEST_BROWSERS)
+def test_screenshot_sprite(browser):
+    hti = Html2Image(browser=browser, output_path=OUTPUT_PATH, disable_logging=True)
+
+    colors = ['red', 'lime', 'blue', 'yellow', 'black']
+    html_strings = [
+        f'<div style="background: {color}; width: 100%; height: 100%"></div>'
+        for color in colors
+    ]
+
+    paths = hti.screenshot_sprite(
+        html_str=html_strings,
+        css_str='body {margin: 0; height: 100vh;}',
+        save_as="sprite.png",
+        size=(60, 40),
+        max_sheet_size=(120, 80),  # forces the use of two sheets
+    )
+
+    assert len(paths) == len(colors)
+
+    expected_pixels = [
+        (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 0, 0),
+    ]
+    for expected_pixel, path in zip(expected_pixels, paths):
+        img = Image.open(path)
+        assert (60, 40) == img.size
+        assert img.load()[30, 20][:3] == expected_pixel
@@ -0,0 +1,66 @@
+from html2image.browsers.timings import RenderTimings
+from html2image.metrics import MetricsRegistry, instrument_browser
+
+import pytest
+
+
+class FakeBrowser():
+    def __init__(self):
+        self.timing_hooks = []
+        self.restarts = 2
+
+
+def test_metrics_exposition():
+    registry = MetricsRegistry()
+    jobs = registry.counter('jobs_total', 'Jobs.', ('status',))
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    registry.gauge('depth', 'Queue "depth".\nNow.', function=lambda: 3)
+
+    jobs.inc(status='success')
+    jobs.inc(2, status='error')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    assert registry.counter('jobs_total', 'Jobs.', ('status',)) is jobs
+    with pytest.raises(ValueError):
+        jobs.inc(queue='bulk')
+
+    assert registry.exposition() == (
+        '# HELP jobs_total Jobs.\n'
+        '# TYPE jobs_total counter\n'
+        'jobs_total{status="error"} 2\n'
+        'jobs_total{status="success"} 1\n'
+        '# HELP latency_seconds Latency.\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 2\n'
+        'latency_seconds_sum 0.55\n'
+        'latency_seconds_count 2\n'
+        '# HELP depth Queue "depth".\\nNow.\n'
+        '# TYPE depth gauge\n'
+        'depth 3\n'
+    )
+
+
+def test_instrument_browser():
+    registry = MetricsRegistry()
+    browser = FakeBrowser()
+    instrument_browser(registry, browser)
+
+    timings = RenderTimings('a.png')
+    timings.phases = {'load': 0.2, 'capture': 0.05}
+    timings.bytes_written = 1000
+    timings.attempts = 2
+    for hook in browser.timing_hooks:
+        hook(timings)
+
+    snapshot = registry.snapshot()
+    assert snapshot['html2image_renders_total']['samples'] == [
+        {'name': 'html2image_renders_total',
+         'labels': {'status': 'success'}, 'value': 1},
+    ]
+    assert snapshot['html2image_bytes_written_total']['samples'][0]['value'] == 1000
+    assert snapshot['html2image_render_retries_total']['samples'][0]['value'] == 1
+    assert snapshot['html2image_browser_restarts_total']['samples'][0]['value'] == 2
+    assert 'html2image_render_phase_seconds_count{phase="load"} 1' in registry.exposition()
@@ -0,0 +1,33 @@
+from html2image.batch import plan_windows
+from html2image.planner import plan, plan_jobs, source_origin
+
+
+def test_plan_groups_keep_first_appearance_order():
+    items = [('a', 1), ('b', 1), ('a', 2), ('b', 2), ('a', 1)]
+    assert plan(
+        items, lambda item: item[0], lambda item: item[1],
+    ) == [0, 4, 2, 1, 3]
+
+
+def test_source_origin():
+    assert source_origin('https://Example.com:8443/a?b') == 'https://example.com:8443'
+    assert source_origin('page.html') == 'file://'
+    assert source_origin('C:\\pages\\page.html') == 'file://'
+
+
+def test_plan_jobs():
+    jobs = [
+        {'url': 'https://a.test/1', 'size': [800, 600]},
+        {'url': 'https://b.test/1', 'size': [1920, 1080]},
+        ValueError('invalid'),
+        {'url': 'https://b.test/2', 'size': [800, 600]},
+        {'url': 'https://a.test/2', 'size': (800, 600)},
+        {'html_str': '<p>', 'css_str': 'p {}', 'size': [1920, 1080]},
+        {'url': 'https://b.test/3', 'size': {'unhashable': []}},
+    ]
+    assert plan_jobs(jobs) == [0, 4, 3, 1, 5, 6, 2]
+
+
+def test_plan_windows():
+    jobs = [{'url': f'https://{host}.test/'} for host in 'abab' 'c']
+    assert [index for index, _ in plan_windows(jobs, 4)] == [0, 2, 1, 3, 4]
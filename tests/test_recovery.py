@@ -0,0 +1,69 @@
+from html2image import Html2Image
+from html2image.browsers.chrome_cdp import RetryBudget
+from html2image.browsers.errors import BrowserCrashedError
+
+import pytest
+
+
+def test_crashed_tab_is_retried(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        hti.browser.server.crash_next_navigations = 1
+        timings = hti.screenshot_url('https://example.com', 'a.png', size=(64, 64))
+
+        assert timings.attempts == 2
+        assert hti.browser.restarts == 0
+
+
+def test_hung_tab_is_retried(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    hti.browser.cdp_timeout = 0.5
+
+    with hti:
+        hti.browser.server.hang_next_navigations = 1
+        timings = hti.screenshot_url('https://example.com', 'a.png', size=(64, 64))
+
+        assert timings.attempts == 2
+        assert hti.browser.restarts == 0
+    assert (tmp_path / 'a.png').exists()
+
+
+def test_crashed_browser_is_restarted(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        hti.screenshot(html_str='<p>before</p>', save_as='before.png')
+        hti.browser.server.crash()
+        hti.screenshot(html_str='<p>after</p>', save_as='after.png')
+
+        assert hti.browser.restarts == 1
+    assert (tmp_path / 'after.png').exists()
+
+
+def test_retries_are_limited(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+    hti.browser.max_retries = 2
+
+    with hti:
+        hti.browser.server.crash_next_navigations = 3
+        with pytest.raises(BrowserCrashedError):
+            hti.screenshot_url('https://example.com', 'a.png', size=(64, 64))
+
+        # the browser itself is still healthy
+        timings = hti.screenshot_url('https://example.com', 'b.png', size=(64, 64))
+        assert timings.attempts == 1
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, reserve=2)
+
+    # a burst of retries is allowed, up to the reserve
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+
+    # then one retry every two attempts
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
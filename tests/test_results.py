@@ -0,0 +1,65 @@
+import io
+import json
+
+from PIL import Image
+
+from html2image import Html2Image
+from html2image.results import RenderResult, ScreenshotPaths, image_dimensions
+
+
+def test_image_dimensions():
+    for image_format in ('png', 'jpeg', 'webp'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (123, 45)).save(buffer, format=image_format)
+        assert image_dimensions(buffer.getvalue()) == (image_format, 123, 45)
+
+    assert image_dimensions(b'GIF89a') == (None, None, None)
+    assert image_dimensions(b'\x89PNG\r\n\x1a\n') == (None, None, None)
+
+
+def test_screenshot_results(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        paths = hti.screenshot(
+            html_str='<p>a</p>', url='https://example.com', size=[(320, 200), (64, 32)],
+            save_as='page.png',
+        )
+
+    # still a list of paths
+    assert paths == [str(tmp_path / 'page_0.png'), str(tmp_path / 'page_1.png')]
+    assert json.loads(json.dumps(paths)) == paths
+
+    result = paths.results[1]
+    assert (result.format, result.size) == ('png', (64, 32))
+    assert result.byte_length == len(result.read())
+    assert result.timings.attempts == 1 and result.ok and not result.cache_hit
+    assert RenderResult.from_file(result).content_hash == result.content_hash
+
+
+def test_screenshot_errors(tmp_path):
+    hti = Html2Image(browser='fake-cdp', output_path=str(tmp_path))
+
+    with hti:
+        paths = hti.screenshot(
+            html_str='<p>a</p>', html_file=str(tmp_path / 'missing.html'),
+            raise_errors=False,
+        )
+
+    assert isinstance(paths, ScreenshotPaths)
+    assert paths.results[0].ok
+    assert isinstance(paths.results[1].error, FileNotFoundError)
+    assert paths.errors == [paths.results[1].error]
+
+
+def test_results_are_described_lazily(tmp_path):
+    path = tmp_path / 'page.png'
+    Image.new('RGB', (12, 34)).save(path)
+
+    result = RenderResult(path=str(path), byte_length=path.stat().st_size)
+    # nothing is read until the image is described
+    path.rename(tmp_path / 'moved.png')
+    assert result.width is None and result.content_hash is None
+
+    result = RenderResult(path=str(tmp_path / 'moved.png'))
+    assert result.size == (12, 34) and len(result.content_hash) == 64
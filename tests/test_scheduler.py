@@ -0,0 +1,85 @@
+from html2image.scheduler import JobQueue, Scheduler
+
+import queue
+import threading
+import time
+
+import pytest
+
+
+def test_scheduler_priority():
+    gate = threading.Event()
+    order = []
+
+    with Scheduler(concurrency=1, queues=[
+        JobQueue('interactive', priority=0),
+        JobQueue('bulk', priority=1),
+    ]) as scheduler:
+        # keeps the only worker busy while the other jobs are queued
+        blocker = scheduler.submit(gate.wait, queue='bulk')
+
+        futures = [
+            scheduler.submit(order.append, name, queue=name)
+            for name in ['bulk', 'bulk', 'interactive']
+        ]
+        gate.set()
+
+        assert blocker.result(timeout=5)
+        for future in futures:
+            future.result(timeout=5)
+
+    assert order == ['interactive', 'bulk', 'bulk']
+
+
+def test_scheduler_queue_concurrency():
+    gate = threading.Event()
+
+    with Scheduler(concurrency=2, queues=[
+        JobQueue('interactive', priority=0),
+        JobQueue('bulk', priority=1, concurrency=1, max_size=1),
+    ]) as scheduler:
+        scheduler.submit(gate.wait, queue='bulk')
+        scheduler.submit(gate.wait, queue='bulk')
+
+        # the bulk queue is full, while a slot is kept for interactive jobs
+        with pytest.raises(queue.Full):
+            scheduler.submit(gate.wait, queue='bulk', block=False)
+        with pytest.raises(queue.Full):
+            scheduler.submit(gate.wait, queue='bulk', timeout=0.05)
+        assert scheduler.submit(sum, [1, 2], queue='interactive').result(
+            timeout=5
+        ) == 3
+
+        stats = scheduler.stats()['bulk']
+        assert (stats['active'], stats['queued'], stats['rejected']) == (1, 1, 2)
+
+        gate.set()
+
+
+def test_scheduler_errors():
+    with Scheduler(concurrency=1) as scheduler:
+        with pytest.raises(ZeroDivisionError):
+            scheduler.submit(lambda: 1 / 0).result(timeout=5)
+
+        with pytest.raises(ValueError):
+            scheduler.submit(print, queue='unknown')
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit(print)
+
+
+def test_scheduler_lowered_concurrency():
+    gate = threading.Event()
+
+    with Scheduler(concurrency=3) as scheduler:
+        futures = [scheduler.submit(gate.wait) for _ in range(3)]
+        scheduler.set_concurrency(1)
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+
+        # the workers in excess stop once their job is done
+        deadline = time.monotonic() + 5
+        while len(scheduler._workers) > 1:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
@@ -0,0 +1,93 @@
+from html2image import Html2Image
+from html2image.server import (
+    RenderService, RenderServer, render_to_bytes, screenshot_kwargs,
+)
+from PIL import Image
+
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+OUTPUT_PATH = "tests_output"
+
+
+@pytest.fixture
+def server_url():
+    hti = Html2Image(output_path=OUTPUT_PATH, disable_logging=True)
+    service = RenderService(hti, concurrency=2, queue_size=2)
+    server = RenderServer(('127.0.0.1', 0), service, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def post_screenshot(url, params):
+    request = urllib.request.Request(
+        f'{url}/screenshot', data=json.dumps(params).encode(), method='POST',
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def test_serve_html_string(server_url):
+    image = post_screenshot(server_url, {
+        'html_str': 'Hello',
+        'css_str': 'body {background: blue;}',
+        'size': [200, 100],
+    })
+
+    img = Image.open(io.BytesIO(image))
+    assert (200, 100) == img.size
+    assert img.load()[0, 0][:3] == (0, 0, 255)
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {'url': 'https://www.python.org', 'html_str': 'Hello'},
+    {'html_str': 'Hello', 'size': '100,100'},
+    {'html_str': 'Hello', 'unknown': True},
+])
+def test_serve_bad_request(server_url, params):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        post_screenshot(server_url, params)
+    assert e.value.code == 400
+
+
+def test_metrics_endpoint(server_url):
+    post_screenshot(server_url, {'html_str': 'Hello', 'size': [200, 100]})
+
+    with urllib.request.urlopen(f'{server_url}/metrics') as response:
+        assert response.headers['Content-Type'].startswith('text/plain')
+        metrics = response.read().decode()
+
+    assert 'html2image_renders_total{status="success"} 1' in metrics
+    assert 'html2image_jobs_total{queue="interactive",status="success"} 1' in metrics
+
+
+def test_render_stages_files_privately(tmp_path):
+    (tmp_path / 'page.html').write_text('<link rel="stylesheet" href="style.css">')
+    (tmp_path / 'style.css').write_text('body {background: blue;}')
+    temp_path = tmp_path / 'temp'
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path / 'out'), temp_path=str(temp_path),
+    )
+
+    with hti:
+        for params in (
+            {'html_file': str(tmp_path / 'page.html'), 'css_file': str(tmp_path / 'style.css')},
+            {'html_str': 'Hello', 'css_file': [str(tmp_path / 'style.css')]},
+        ):
+            image = render_to_bytes(hti, screenshot_kwargs(dict(params, size=[64, 32])))
+            assert Image.open(io.BytesIO(image)).size == (64, 32)
+
+        with pytest.raises(FileNotFoundError):
+            render_to_bytes(hti, {'html_file': str(tmp_path / 'missing.html')})
+
+    # nothing was staged under a name shared with concurrent renders
+    assert os.listdir(temp_path) == []
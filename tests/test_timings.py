@@ -0,0 +1,43 @@
+from html2image.browsers.chrome import ChromeHeadless
+from html2image.browsers.timings import RenderTimings
+
+import os
+import time
+
+import pytest
+
+
+def test_render_timings_phases():
+    timings = RenderTimings('a.png')
+
+    with timings.phase('load'):
+        time.sleep(0.01)
+    with pytest.raises(ZeroDivisionError):
+        with timings.phase('capture'):
+            1 / 0
+    with timings.phase('load'):
+        pass
+
+    assert list(timings.phases) == ['load', 'capture']
+    assert timings.phases['load'] >= 0.01
+    assert timings.total == sum(timings.phases.values())
+    assert timings.as_dict()['output_file'] == 'a.png'
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='uses a shell script')
+def test_chromium_timing_hooks(tmp_path):
+    # stands in for a browser, including when its version is checked
+    executable = tmp_path / 'chromium'
+    executable.write_text('#!/bin/sh\necho Chromium\n')
+    executable.chmod(0o755)
+
+    browser = ChromeHeadless(executable=str(executable))
+    received = []
+    browser.timing_hooks.append(received.append)
+    browser.timing_hooks.append(lambda timings: 1 / 0)  # ignored
+
+    timings = browser.screenshot('about:blank', str(tmp_path), 'a.png')
+
+    assert received == [timings]
+    assert list(timings.phases) == ['launch', 'render']
+    assert timings.error is None
@@ -0,0 +1,38 @@
+import json
+
+from html2image import Html2Image
+from html2image.browsers.trace_capture import TraceCapture
+
+
+def test_traces_are_written_next_to_images(tmp_path):
+    trace_capture = TraceCapture(rate=1)
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path), trace_capture=trace_capture,
+    )
+
+    with hti:
+        timings = hti.screenshot_url('https://example.com', 'page.png', size=(64, 64))
+        hti.screenshot(html_str=['<p>a</p>', '<p>b</p>'], save_as='many.png')
+
+    assert timings.trace_file == str(tmp_path / 'page.trace.json')
+    assert 'trace' in timings.phases
+    with open(timings.trace_file) as f:
+        events = json.load(f)['traceEvents']
+    assert 'Page.captureScreenshot' in [event['name'] for event in events]
+
+    assert trace_capture.traces_written == 3
+    assert (tmp_path / 'many_0.trace.json').exists()
+
+
+def test_unsampled_screenshots_are_not_traced(tmp_path):
+    hti = Html2Image(
+        browser='fake-cdp', output_path=str(tmp_path),
+        trace_capture=TraceCapture(rate=0),
+    )
+
+    with hti:
+        timings = hti.screenshot_url('https://example.com', 'page.png', size=(64, 64))
+        assert 'Tracing.start' not in hti.browser.server.command_counts
+
+    assert timings.trace_file is None
+    assert not list(tmp_path.glob('*.json'))
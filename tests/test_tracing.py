@@ -0,0 +1,79 @@
+from html2image import Html2Image
+from html2image.tracing import Span, Tracer, attach
+
+import os
+
+import pytest
+
+
+class RecordingSpan(Span):
+    def __init__(self, spans, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.ended = False
+        self.context = self
+        spans.append(self)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.error = exception
+
+    def end(self):
+        self.ended = True
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, parent=None, attributes=None):
+        return RecordingSpan(self.spans, name, parent, attributes)
+
+
+@pytest.fixture
+def hti(tmp_path):
+    if os.name != 'posix':
+        pytest.skip('uses a shell script')
+
+    # stands in for a browser, including when its version is checked
+    executable = tmp_path / 'chromium'
+    executable.write_text('#!/bin/sh\necho Chromium\n')
+    executable.chmod(0o755)
+
+    return Html2Image(
+        browser_executable=str(executable), output_path=str(tmp_path),
+        temp_path=str(tmp_path / 'temp'), tracer=RecordingTracer(),
+    )
+
+
+def test_screenshot_spans(hti):
+    tracer = hti.tracer
+    parent = object()
+
+    with attach(parent):
+        hti.screenshot(html_str='<p>Hi</p>', save_as='hi.png')
+
+    spans = {span.name: span for span in tracer.spans}
+    assert [span.name for span in tracer.spans] == [
+        'html2image.screenshot', 'html2image.prepare_css',
+        'html2image.image', 'html2image.prepare_html',
+        'html2image.stage_file', 'html2image.launch', 'html2image.render',
+    ]
+    assert tracer.spans[0].parent is parent
+    assert spans['html2image.prepare_css'].parent is tracer.spans[0]
+    assert tracer.spans[-1].parent is tracer.spans[2]
+    assert tracer.spans[2].attributes['output_file'] == 'hi.png'
+    assert all(span.ended for span in tracer.spans)
+
+
+def test_span_records_errors(hti, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        hti.screenshot(html_file=str(tmp_path / 'missing.html'))
+
+    render, screenshot = hti.tracer.spans[-1], hti.tracer.spans[0]
+    assert isinstance(render.error, FileNotFoundError)
+    assert isinstance(screenshot.error, FileNotFoundError)